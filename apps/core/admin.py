@@ -1,7 +1,10 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from django.db.models import Q, QuerySet
+from django.http import HttpRequest
 
 from .models import CustomUser, Follow, Like, Tweet
+from .search import tweet_search_query
 
 
 @admin.register(CustomUser)
@@ -15,7 +18,18 @@ class CustomUserAdmin(UserAdmin):
 class TweetAdmin(admin.ModelAdmin):
     list_display = ("user", "content", "created_at")
     list_filter = ("created_at",)
-    search_fields = ("user__username", "content")
+    search_fields = ("content", "user__username")
+
+    def get_search_results(
+        self, request: HttpRequest, queryset: QuerySet[Tweet], search_term: str
+    ) -> tuple[QuerySet[Tweet], bool]:
+        # Use the full-text index, which covers original tweets only, instead of an ILIKE scan
+        # of the tweets. Authors are matched on the much smaller users table.
+        if not search_term:
+            return queryset, False
+        authors = CustomUser.objects.filter(username__icontains=search_term)
+        matches = Q(parent=None, search_vector=tweet_search_query(search_term)) | Q(user__in=authors)
+        return queryset.filter(matches), False
 
 
 @admin.register(Like)
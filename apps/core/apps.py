@@ -6,4 +6,4 @@ class CoreConfig(AppConfig):
     name = "apps.core"
 
     def ready(self) -> None:
-        pass
+        from . import signals  # noqa: F401
@@ -0,0 +1,189 @@
+"""
+Async variants of the feed, tweet detail and like views.
+
+``urls.py`` routes to these instead of their counterparts in views.py when
+``ASYNC_VIEWS`` is enabled. Under ASGI a sync view runs in a worker thread for its whole
+duration; these views run on the event loop, await the async ORM and cache, and look up
+the data that does not depend on each other with ``asyncio.gather``.
+
+The templates, context and caching match the sync views. Django's async ORM and cache
+backends still wrap the sync ones with ``sync_to_async``, so gathered queries run one
+after another on the request's connection; Redis calls without an async API, such as
+reading the home timeline, are wrapped the same way.
+"""
+
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from collections.abc import Awaitable, Sequence
+from typing import Any, cast
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.mixins import AccessMixin
+from django.db.models import QuerySet
+from django.http import HttpRequest, HttpResponseBase
+from django.shortcuts import aget_object_or_404
+from django.views.generic import View
+from django.views.generic.base import ContextMixin, TemplateResponseMixin
+
+from . import like_buffer, trending
+from .caching import AsyncCachePolicyMixin
+from .forms import TweetForm
+from .hydration import ahydrate_tweets, with_card_relations
+from .models import CustomUser, Like, Tweet
+from .pagination import CursorPaginator
+from .replicas import AsyncReplicaReadsMixin
+from .views import (
+    ExploreModeMixin,
+    LiveUpdatesMixin,
+    ThreadMixin,
+    home_timeline_page_queryset,
+    like_button_response,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncLoginRequiredMixin(AccessMixin, View):
+    """
+    ``LoginRequiredMixin`` for views with async handlers.
+
+    The user is loaded with ``request.auser()`` and set on the request, so that neither
+    the view nor its templates load it through the sync ORM.
+    """
+
+    async def dispatch(  # type: ignore[override]
+        self, request: HttpRequest, *args: Any, **kwargs: Any
+    ) -> HttpResponseBase:
+        request.user = await request.auser()
+        if not request.user.is_authenticated:
+            return self.handle_no_permission()
+        return await cast(Awaitable[HttpResponseBase], super().dispatch(request, *args, **kwargs))
+
+
+class AsyncTweetContextMixin(ContextMixin):
+    """Hydrate tweets for the viewer and expose their state like ``TweetContextMixin``."""
+
+    async def ahydrate_context(self, page_tweets: list[Tweet], **kwargs: Any) -> dict[str, Any]:
+        tweets = await ahydrate_tweets(page_tweets, cast(CustomUser, self.request.user))
+        return self.get_context_data(
+            liked_tweets={tweet.id for tweet in tweets if tweet.liked_by_viewer},
+            retweeted_tweets={tweet.id for tweet in tweets if tweet.retweeted_by_viewer},
+            **kwargs,
+        )
+
+
+class AsyncTweetListView(LiveUpdatesMixin, AsyncTweetContextMixin, TemplateResponseMixin, View, ABC):
+    """A page of tweets paginated by cursor, with the same context as a ``CursorPaginationMixin`` list."""
+
+    paginate_by = 6
+    cursor_kwarg = "cursor"
+
+    @abstractmethod
+    async def aget_queryset(self) -> QuerySet[Tweet]:
+        """The tweets to paginate, which are ordered by ``get_cursor_ordering``."""
+
+    def get_cursor_ordering(self) -> Sequence[str]:
+        return ("-created_at", "-id")
+
+    async def get(self, request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponseBase:
+        paginator = CursorPaginator(await self.aget_queryset(), self.paginate_by, self.get_cursor_ordering())
+        page = await paginator.apage(request.GET.get(self.cursor_kwarg))
+        context = await self.ahydrate_context(
+            page.object_list,
+            tweets=page.object_list,
+            object_list=page.object_list,
+            paginator=paginator,
+            page_obj=page,
+            is_paginated=page.has_other_pages(),
+        )
+        return self.render_to_response(context)
+
+
+class HomeView(AsyncLoginRequiredMixin, AsyncReplicaReadsMixin, AsyncTweetListView):  # type: ignore[misc]
+    template_name = "core/home.html"
+    live_feed = "home"
+
+    async def aget_queryset(self) -> QuerySet[Tweet]:
+        user = cast(CustomUser, self.request.user)
+        cursor = self.request.GET.get(self.cursor_kwarg)
+        return await sync_to_async(home_timeline_page_queryset)(user, cursor, self.paginate_by)
+
+    def get_template_names(self) -> list[str]:
+        if self.request.htmx and self.request.htmx.trigger == "tweets-container":
+            return ["core/timeline.html"]
+        return [self.template_name]
+
+    def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
+        context: dict[str, Any] = super().get_context_data(**kwargs)
+        context["form"] = TweetForm()
+        return context
+
+
+class ExploreView(  # type: ignore[misc]
+    AsyncLoginRequiredMixin, AsyncCachePolicyMixin, AsyncReplicaReadsMixin, ExploreModeMixin, AsyncTweetListView
+):
+    template_name = "core/explore.html"
+    cache_timeout = 15
+    live_feed = "explore"
+
+    async def aget_queryset(self) -> QuerySet[Tweet]:
+        queryset = with_card_relations(Tweet.objects.all())
+        if self.is_top_mode():
+            return trending.ranked(queryset, await sync_to_async(trending.top_tweet_ids)())
+        return queryset
+
+    def get_template_names(self) -> list[str]:
+        if self.request.htmx:
+            return ["core/timeline.html"]
+        return [self.template_name]
+
+
+class TweetDetailView(  # type: ignore[misc]
+    AsyncLoginRequiredMixin,
+    AsyncCachePolicyMixin,
+    AsyncReplicaReadsMixin,
+    ThreadMixin,
+    AsyncTweetContextMixin,
+    TemplateResponseMixin,
+    View,
+):
+    cache_timeout = 30
+
+    async def get(self, request: HttpRequest, *args: Any, pk: int, **kwargs: Any) -> HttpResponseBase:
+        tweet = await aget_object_or_404(with_card_relations(Tweet.objects.all()), pk=pk)
+        thread_tweet = self.get_thread_tweet(tweet)
+        ancestors, replies, retweets = await asyncio.gather(
+            self.alist(self.get_ancestors_queryset(thread_tweet)),
+            self.get_replies_paginator(thread_tweet).apage(request.GET.get(self.cursor_kwarg)),
+            self.alist(self.get_retweets_queryset(tweet)),
+        )
+        context = await self.ahydrate_context(
+            [tweet, *ancestors, *replies],
+            object=tweet,
+            tweet=tweet,
+            **self.get_retweets_context(tweet, retweets),
+            **self.get_thread_context(thread_tweet, ancestors, replies),
+        )
+        return self.render_to_response(context)
+
+    @staticmethod
+    async def alist(queryset: QuerySet[Tweet]) -> list[Tweet]:
+        return [tweet async for tweet in queryset]
+
+
+class LikeTweetView(AsyncLoginRequiredMixin, View):
+    liked = True
+
+    async def post(self, request: HttpRequest, *args: Any, tweet_id: int, **kwargs: Any) -> HttpResponseBase:
+        user = cast(CustomUser, request.user)
+        tweet = await aget_object_or_404(Tweet.objects.only("user", "created_at", "likes_count"), pk=tweet_id)
+        if settings.LIKE_WRITE_BEHIND:
+            changed = await sync_to_async(like_buffer.set_liked)(user.id, tweet, self.liked)
+        elif self.liked:
+            _, changed = await Like.objects.aget_or_create(user=user, tweet=tweet, tweet_created_at=tweet.created_at)
+        else:
+            deleted, _ = await Like.objects.filter(user=user, tweet=tweet, tweet_created_at=tweet.created_at).adelete()
+            changed = deleted > 0
+        return await sync_to_async(like_button_response)(request, tweet, self.liked, changed)
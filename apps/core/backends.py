@@ -0,0 +1,43 @@
+"""
+Authentication backend caching the signed-in user.
+
+``AuthenticationMiddleware`` loads the user on every request. ``CachedModelBackend``
+serves it from the default cache instead of the database; ``invalidate_cached_user``
+drops the cached copy when the user row changes, including through the counter updates
+in signals.py.
+"""
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from .models import CustomUser
+
+
+def cached_user_key(user_id: int | str) -> str:
+    return f"auth_user:{user_id}"
+
+
+def invalidate_cached_user(user_id: int | None) -> None:
+    if user_id is not None:
+        cache.delete(cached_user_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id: int) -> CustomUser | None:
+        key = cached_user_key(user_id)
+        user: CustomUser | None = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, settings.CACHED_USER_TIMEOUT)
+        return user
+
+    async def aget_user(self, user_id: int) -> CustomUser | None:
+        key = cached_user_key(user_id)
+        user: CustomUser | None = await cache.aget(key)
+        if user is None:
+            user = await super().aget_user(user_id)
+            if user is not None:
+                await cache.aset(key, user, settings.CACHED_USER_TIMEOUT)
+        return user
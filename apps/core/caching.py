@@ -0,0 +1,143 @@
+"""
+Per-view response caching for signed-in users.
+
+Pages carry the viewer's state and CSRF token, so cached responses are private to a
+session: the key includes the session and CSRF cookies. Each user also has a cache
+generation that ``invalidate_user_views`` replaces whenever they like, retweet, tweet or
+follow, so users always see their own writes straight away. Changes made by other users
+show up once the view's ``cache_timeout`` has expired, which is why it is kept short.
+"""
+
+import hashlib
+import uuid
+from collections.abc import Awaitable
+from typing import Any, cast
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpRequest, HttpResponseBase
+from django.template.response import SimpleTemplateResponse
+from django.utils.cache import patch_vary_headers
+from django.views import View
+
+# Cached responses are dropped with the generation, so it only has to outlive them
+GENERATION_TIMEOUT = 60 * 60
+
+
+def generation_key(user_id: int | None) -> str:
+    return f"view_cache_generation:{user_id}"
+
+
+def invalidate_user_views(user_id: int | None) -> None:
+    """
+    Drop every cached response of a user.
+
+    Done right away and again once the current transaction commits, so that a response
+    rendered concurrently from the old rows cannot stay cached.
+    """
+    if user_id is None:
+        return
+    cache.delete(generation_key(user_id))
+    transaction.on_commit(lambda: cache.delete(generation_key(user_id)))
+
+
+class CachePolicyMixin(View):
+    """
+    Cache the ``GET`` responses of a view for ``cache_timeout`` seconds per session.
+
+    Requests carrying pending messages and responses setting cookies are never cached.
+    The HTMX request headers that select a partial template are part of the key.
+    """
+
+    cache_timeout = 0
+    cache_vary_on_headers = ("HX-Request", "HX-Trigger")
+
+    def should_cache(self, request: HttpRequest) -> bool:
+        return (
+            self.cache_timeout > 0
+            and request.method == "GET"
+            and request.user.is_authenticated
+            and request.session.session_key is not None
+            and not get_messages(request)
+        )
+
+    def get_cache_key(self, request: HttpRequest) -> str:
+        parts = [
+            request.get_full_path(),
+            request.session.session_key or "",
+            request.COOKIES.get(settings.CSRF_COOKIE_NAME, ""),
+            *(request.headers.get(header, "") for header in self.cache_vary_on_headers),
+        ]
+        digest = hashlib.md5("\n".join(parts).encode(), usedforsecurity=False).hexdigest()
+        return f"view_cache:{type(self).__name__}:{request.user.pk}:{digest}"
+
+    def dispatch(self, request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponseBase:
+        if not self.should_cache(request):
+            return self.vary(super().dispatch(request, *args, **kwargs))
+
+        key, gen_key = self.get_cache_key(request), generation_key(request.user.pk)
+        cached_response, generation = self.get_cached(cache.get_many([key, gen_key]), key, gen_key)
+        if cached_response is not None:
+            return cached_response
+        if generation is None:
+            generation = uuid.uuid4().hex
+            cache.set(gen_key, generation, GENERATION_TIMEOUT)
+
+        response = self.vary(super().dispatch(request, *args, **kwargs))
+        self.store_response(response, key, generation)
+        return response
+
+    def get_cached(self, cached: dict[str, Any], key: str, gen_key: str) -> tuple[HttpResponseBase | None, str | None]:
+        """Return the cached response if it belongs to the current generation, and the generation."""
+        generation = cached.get(gen_key)
+        if generation is not None and key in cached:
+            cached_generation, cached_response = cached[key]
+            if cached_generation == generation:
+                return cast(HttpResponseBase, cached_response), generation
+        return None, generation
+
+    def store_response(self, response: HttpResponseBase, key: str, generation: str) -> None:
+        if response.status_code != 200 or response.cookies:
+            return
+
+        def store(response: HttpResponseBase) -> None:
+            cache.set(key, (generation, response), self.cache_timeout)
+
+        if isinstance(response, SimpleTemplateResponse) and not response.is_rendered:
+            response.add_post_render_callback(store)
+        else:
+            store(response)
+
+    def vary(self, response: HttpResponseBase) -> HttpResponseBase:
+        patch_vary_headers(response, self.cache_vary_on_headers)
+        return response
+
+
+class AsyncCachePolicyMixin(CachePolicyMixin):
+    """``CachePolicyMixin`` for views with async handlers."""
+
+    async def dispatch(  # type: ignore[override]
+        self, request: HttpRequest, *args: Any, **kwargs: Any
+    ) -> HttpResponseBase:
+        # Looking for pending messages may load the session from the database
+        if not await sync_to_async(self.should_cache)(request):
+            return self.vary(await self.dispatch_handler(request, *args, **kwargs))
+
+        key, gen_key = self.get_cache_key(request), generation_key(request.user.pk)
+        cached_response, generation = self.get_cached(await cache.aget_many([key, gen_key]), key, gen_key)
+        if cached_response is not None:
+            return cached_response
+        if generation is None:
+            generation = uuid.uuid4().hex
+            await cache.aset(gen_key, generation, GENERATION_TIMEOUT)
+
+        response = self.vary(await self.dispatch_handler(request, *args, **kwargs))
+        self.store_response(response, key, generation)
+        return response
+
+    async def dispatch_handler(self, request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponseBase:
+        # The view's handlers are coroutines, so the dispatch below returns one
+        return await cast(Awaitable[HttpResponseBase], super(CachePolicyMixin, self).dispatch(request, *args, **kwargs))
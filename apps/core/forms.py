@@ -1,8 +1,13 @@
 from typing import Any, cast
 
 from django import forms
+from django.conf import settings
 from django.contrib.auth.forms import UserCreationForm
+from django.core.files.uploadedfile import UploadedFile
+from django.template.defaultfilters import filesizeformat
 
+from . import threads
+from .images import UPLOAD_FORMATS, is_animated
 from .models import CustomUser, Tweet
 
 
@@ -30,19 +35,50 @@ class TweetForm(forms.ModelForm):
         widget=forms.Textarea(attrs={"rows": 3, "placeholder": "What's happening?"}),
         max_length=280,
     )
-    image = forms.ImageField(required=False)
+    image = forms.ImageField(
+        required=False,
+        widget=forms.ClearableFileInput(attrs={"accept": "image/jpeg, image/png, image/gif, image/webp"}),
+    )
 
     class Meta:
         model = Tweet
         fields = ["content", "image"]
 
-    def __init__(self, *args: Any, user: CustomUser | None = None, **kwargs: Any) -> None:
+    def __init__(
+        self, *args: Any, user: CustomUser | None = None, reply_to: Tweet | None = None, **kwargs: Any
+    ) -> None:
         super().__init__(*args, **kwargs)
         self.user = user
+        self.reply_to = reply_to
+        if reply_to is not None:
+            self.fields["content"].widget.attrs["placeholder"] = "Post your reply"
+
+    def clean(self) -> dict[str, Any] | None:
+        cleaned_data = super().clean()
+        if self.reply_to is not None and not threads.can_reply_to(self.reply_to):
+            raise forms.ValidationError("This conversation is too deep to reply to.")
+        return cleaned_data
+
+    def clean_image(self) -> UploadedFile | None:
+        """Only check the image's size and format, it is resized later by the process_tweet_image task."""
+        image: UploadedFile | None = self.cleaned_data.get("image")
+        if image:
+            if image.size is not None and image.size > settings.TWEET_IMAGE_MAX_UPLOAD_SIZE:
+                raise forms.ValidationError(
+                    f"Images must be smaller than {filesizeformat(settings.TWEET_IMAGE_MAX_UPLOAD_SIZE)}."
+                )
+            # Set by ImageField to the image Pillow checked the upload with
+            decoded = getattr(image, "image", None)
+            if decoded is None or decoded.format not in UPLOAD_FORMATS:
+                raise forms.ValidationError("Upload a JPEG, PNG, GIF or WebP image.")
+            if is_animated(image):
+                raise forms.ValidationError("Animated images are not supported.")
+        return image
 
     def save(self, commit: bool = True) -> Tweet:
         tweet = cast(Tweet, super().save(commit=False))
         tweet.user = self.user
+        tweet.reply_to = self.reply_to
         if commit:
             tweet.save()
         return tweet
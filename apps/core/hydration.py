@@ -0,0 +1,170 @@
+"""
+Batched loading of everything a tweet card renders.
+
+``core/tweet_card.html`` touches the tweet's author, the retweeted parent and its author,
+the author of the tweet replied to, the denormalized counters and the viewer's
+liked/retweeted state. Rendering a page of cards through ``hydrate_tweets`` loads all of
+that in a fixed number of queries, however many tweets are on the page.
+
+The viewer-independent part of a card is cached in the ``fragments`` cache, keyed on a
+per-tweet version stamp that ``invalidate_tweet_card`` replaces whenever the card's
+content changes. The viewer's state is applied outside the cached fragment.
+"""
+
+import asyncio
+import uuid
+from collections.abc import Iterable
+from typing import Any
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import QuerySet
+
+from .models import CustomUser, Like, Tweet
+
+TWEET_CARD_RELATED = ("user", "parent", "parent__user", "reply_to__user")
+# Lifetime of cached cards and of their versions, which must match core/tweet_card.html
+TWEET_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+# Columns a card never renders, left out of the rows a feed transfers
+TWEET_CARD_DEFERRED = (
+    "search_vector",
+    "user__search_vector",
+    "parent__search_vector",
+    "parent__user__search_vector",
+    "reply_to__search_vector",
+    "reply_to__user__search_vector",
+)
+
+
+def with_card_relations(queryset: QuerySet[Tweet]) -> QuerySet[Tweet]:
+    """Join the relations rendered by a tweet card into the query loading the tweets."""
+    return queryset.select_related(*TWEET_CARD_RELATED).defer(*TWEET_CARD_DEFERRED)
+
+
+def card_version_key(tweet_id: int) -> str:
+    return f"tweet_card_version:{tweet_id}"
+
+
+def bump_card_version(tweet_id: int) -> None:
+    caches["fragments"].set(card_version_key(tweet_id), uuid.uuid4().hex, timeout=TWEET_CARD_CACHE_TIMEOUT)
+
+
+def invalidate_tweet_card(tweet_id: int | None) -> None:
+    """
+    Make the next render of a tweet's card miss the fragment cache.
+
+    The version is replaced right away, for renders later in the current transaction, and
+    again once it commits, so that a card rendered concurrently from the old rows cannot
+    stay cached under the new version.
+    """
+    if tweet_id is None:
+        return
+    bump_card_version(tweet_id)
+    transaction.on_commit(lambda: bump_card_version(tweet_id))
+
+
+def attach_card_versions(tweets: list[Tweet]) -> None:
+    """Set ``card_version`` on each tweet, assigning one to tweets that have none yet."""
+    cache = caches["fragments"]
+    missing = assign_card_versions(tweets, cache.get_many([card_version_key(tweet.id) for tweet in tweets]))
+    if missing:
+        cache.set_many(missing, timeout=TWEET_CARD_CACHE_TIMEOUT)
+
+
+async def aattach_card_versions(tweets: list[Tweet]) -> None:
+    cache = caches["fragments"]
+    missing = assign_card_versions(tweets, await cache.aget_many([card_version_key(tweet.id) for tweet in tweets]))
+    if missing:
+        await cache.aset_many(missing, timeout=TWEET_CARD_CACHE_TIMEOUT)
+
+
+def assign_card_versions(tweets: list[Tweet], versions: dict[str, str]) -> dict[str, str]:
+    """Set the cached ``versions`` on the tweets and return the new versions to cache for the others."""
+    missing = {}
+    for tweet in tweets:
+        key = card_version_key(tweet.id)
+        if key not in versions:
+            versions[key] = missing[key] = uuid.uuid4().hex
+        tweet.card_version = versions[key]
+    return missing
+
+
+def liked_tweet_ids(viewer: CustomUser, tweets: list[Tweet]) -> QuerySet[Like, int]:
+    # Bounded by the times of the tweets so that only the like partitions they span are searched
+    times = [tweet.created_at for tweet in tweets]
+    return Like.objects.filter(
+        user=viewer,
+        tweet_id__in=[tweet.id for tweet in tweets],
+        tweet_created_at__range=(min(times), max(times)),
+    ).values_list("tweet_id", flat=True)
+
+
+def retweeted_tweet_ids(viewer: CustomUser, tweet_ids: list[int]) -> QuerySet[Tweet, int]:
+    return Tweet.objects.filter(user=viewer, parent_id__in=tweet_ids).values_list("parent_id", flat=True)
+
+
+def apply_buffered_likes(tweets: list[Tweet], viewer: CustomUser, liked: set[int]) -> None:
+    """Count the likes buffered in write-behind mode, see ``like_buffer``."""
+    if not settings.LIKE_WRITE_BEHIND:
+        return
+    # Imported here, like_buffer depends on this module
+    from . import like_buffer
+
+    like_buffer.apply_buffered_likes(tweets, viewer.id if viewer.is_authenticated else None, liked)
+
+
+def apply_viewer_state(tweets: list[Tweet], liked: set[int], retweeted: set[int]) -> None:
+    for tweet in tweets:
+        tweet.liked_by_viewer = tweet.id in liked
+        tweet.retweeted_by_viewer = tweet.id in retweeted
+
+
+def hydrate_tweets(tweets: Iterable[Tweet], viewer: CustomUser) -> list[Tweet]:
+    """
+    Load a page of tweets and attach the viewer's state to each of them.
+
+    Sets ``liked_by_viewer``, ``retweeted_by_viewer`` and ``card_version`` on every tweet.
+    Querysets are loaded with ``with_card_relations``; already evaluated tweets are expected
+    to have been.
+    """
+    if isinstance(tweets, QuerySet):
+        tweets = with_card_relations(tweets)
+    tweets = list(tweets)
+    tweet_ids = [tweet.id for tweet in tweets]
+
+    liked: set[int] = set()
+    retweeted: set[int] = set()
+    if tweet_ids and viewer.is_authenticated:
+        liked = set(liked_tweet_ids(viewer, tweets))
+        retweeted = set(retweeted_tweet_ids(viewer, tweet_ids))
+
+    apply_buffered_likes(tweets, viewer, liked)
+    apply_viewer_state(tweets, liked, retweeted)
+    if tweets:
+        attach_card_versions(tweets)
+    return tweets
+
+
+async def ahydrate_tweets(tweets: list[Tweet], viewer: CustomUser) -> list[Tweet]:
+    """
+    Async variant of ``hydrate_tweets`` for a signed-in viewer and tweets already loaded
+    with ``with_card_relations``. The viewer's likes and retweets and the card versions
+    are looked up concurrently.
+    """
+    if not tweets:
+        return tweets
+    tweet_ids = [tweet.id for tweet in tweets]
+
+    async def ids(queryset: QuerySet[Any, int]) -> set[int]:
+        return {tweet_id async for tweet_id in queryset}
+
+    liked, retweeted, _ = await asyncio.gather(
+        ids(liked_tweet_ids(viewer, tweets)),
+        ids(retweeted_tweet_ids(viewer, tweet_ids)),
+        aattach_card_versions(tweets),
+    )
+    await sync_to_async(apply_buffered_likes)(tweets, viewer, liked)
+    apply_viewer_state(tweets, liked, retweeted)
+    return tweets
@@ -0,0 +1,116 @@
+"""
+Renditions of tweet images.
+
+Requests only validate uploads and store them as they are. The ``process_tweet_image``
+task then decodes each image once, in a worker, and writes WebP and JPEG copies at each
+of ``TWEET_IMAGE_WIDTHS`` up to the width of the upload. The copies carry no EXIF or XMP
+metadata, such as where a photo was taken. The largest JPEG replaces the upload, which
+is deleted, so the original file is no longer served once its tweet is processed.
+Animated images would lose their animation in the renditions, so uploads of them are
+rejected.
+
+Cards pick the rendition for the viewport with ``srcset``, and reserve the image's space
+with its ``width`` and ``height`` so timelines do not shift as images load.
+"""
+
+import io
+import logging
+import uuid
+from typing import Any
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import Storage
+from PIL import Image, ImageOps
+
+from .hydration import invalidate_tweet_card
+from .models import Tweet
+
+logger = logging.getLogger(__name__)
+
+# Formats browsers display, accepted for uploads
+UPLOAD_FORMATS = {"JPEG", "PNG", "GIF", "WEBP"}
+# Formats of the renditions, in the order browsers are offered them
+RENDITION_FORMATS: dict[str, dict[str, Any]] = {
+    "webp": {"format": "WEBP", "quality": 80},
+    "jpeg": {"format": "JPEG", "quality": 82, "optimize": True, "progressive": True},
+}
+
+
+def is_animated(file: Any) -> bool:
+    """Whether an image file has more than one frame, as animated GIFs and WebPs do."""
+    file.seek(0)
+    try:
+        with Image.open(file) as image:
+            return bool(getattr(image, "is_animated", False))
+    finally:
+        file.seek(0)
+
+
+def rendition_widths(width: int) -> list[int]:
+    """Widths to render an image ``width`` pixels wide at, never upscaling it."""
+    largest = min(width, max(settings.TWEET_IMAGE_WIDTHS))
+    return [w for w in sorted(settings.TWEET_IMAGE_WIDTHS) if w < largest] + [largest]
+
+
+def make_renditions(file: Any, storage: Storage, name_prefix: str) -> list[dict[str, Any]]:
+    """Save the renditions of an image file and return their names, formats and sizes, narrowest first."""
+    with Image.open(file) as original:
+        # JPEGs are decoded at the smallest power-of-two scale still covering the largest
+        # rendition, rather than at full resolution
+        largest = max(settings.TWEET_IMAGE_WIDTHS)
+        original.draft("RGB", (largest, largest))
+        icc_profile = original.info.get("icc_profile")
+        # Applies the EXIF orientation before the metadata is dropped
+        image = ImageOps.exif_transpose(original)
+        has_alpha = image.has_transparency_data
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+    renditions = []
+    for width in rendition_widths(image.width):
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.Resampling.LANCZOS)
+        for extension, options in RENDITION_FORMATS.items():
+            if extension == "jpeg" and has_alpha:
+                flattened = Image.new("RGB", resized.size, "white")
+                flattened.paste(resized, mask=resized.getchannel("A"))
+                output = flattened
+            else:
+                output = resized
+            buffer = io.BytesIO()
+            output.save(buffer, icc_profile=icc_profile, **options)
+            name = storage.save(f"{name_prefix}-{width}.{extension}", ContentFile(buffer.getvalue()))
+            renditions.append({"name": name, "format": extension, "width": width, "height": height})
+    return renditions
+
+
+def process_tweet_image(tweet: Tweet) -> None:
+    """
+    Replace a tweet's uploaded image with its renditions. Uploads that cannot be decoded,
+    or are animated, are left as they are.
+    """
+    upload = str(tweet.image.name)
+    storage = tweet.image.storage
+    try:
+        with storage.open(upload) as file:
+            if is_animated(file):
+                logger.warning(f"Not making renditions of the animated image of tweet {tweet.id}")
+                return
+            renditions = make_renditions(file, storage, f"tweet_images/renditions/{tweet.id}-{uuid.uuid4().hex[:8]}")
+    except (OSError, Image.DecompressionBombError):
+        logger.warning(f"Could not make renditions of the image of tweet {tweet.id}", exc_info=True)
+        return
+
+    largest_jpeg = [rendition for rendition in renditions if rendition["format"] == "jpeg"][-1]
+    if not Tweet.objects.filter(id=tweet.id, created_at=tweet.created_at, image=upload).update(
+        image=largest_jpeg["name"], image_renditions=renditions
+    ):
+        # The tweet was deleted, or its image replaced, in the meantime
+        for rendition in renditions:
+            storage.delete(rendition["name"])
+        return
+    storage.delete(upload)
+    invalidate_tweet_card(tweet.id)
+    # Retweet cards show the image of their parent
+    for retweet_id in Tweet.objects.filter(parent_id=tweet.id).values_list("id", flat=True):
+        invalidate_tweet_card(retweet_id)
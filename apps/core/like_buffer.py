@@ -0,0 +1,206 @@
+"""
+Write-behind buffering of likes, enabled with ``LIKE_WRITE_BEHIND``.
+
+Liking a popular tweet makes every like update the same counter row, and likes pile up
+waiting for its lock. In write-behind mode a like or unlike is recorded in Redis instead:
+the user's new state goes into a hash per tweet and the net change of the tweet's likes
+into ``DELTA_KEY``, in one transaction. Cards read both, so they show every like at once.
+
+The ``flush_likes`` task, run every few seconds from Celery beat, writes the buffered
+likes of each tweet with one ``bulk_create``, one ``DELETE`` and one counter update per
+batch. It first moves each tweet's hash and delta aside to be flushed, so that likes made
+meanwhile start a new batch. Buffered states are absolute, so writing a batch again after
+a crash changes nothing that was already written, and the batch stays in Redis until its
+transaction has committed.
+
+Likes are dated when they are written, a few seconds after they were made, which keeps
+them in the window ``trending.update`` scores next.
+"""
+
+from collections import defaultdict
+from typing import cast
+
+import redis
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .caching import invalidate_user_views
+from .live import publish_counter
+from .models import CustomUser, Like, Tweet
+from .redis_client import get_redis
+
+# IDs of the tweets with buffered likes, and of those being flushed
+DIRTY_KEY = "likes:dirty"
+FLUSHING_KEY = "likes:flushing"
+# Tweet ID -> net change of its likes buffered, and being flushed
+DELTA_KEY = "likes:delta"
+FLUSHING_DELTA_KEY = "likes:flushing:delta"
+# Held by the flush_likes task while it runs
+FLUSH_LOCK_KEY = "likes:flush:lock"
+
+LIKED = "1"
+UNLIKED = "0"
+
+
+def pending_key(tweet_id: int) -> str:
+    """Hash of user ID -> liked state of the likes of a tweet buffered since the last flush."""
+    return f"likes:pending:{tweet_id}"
+
+
+def flushing_key(tweet_id: int) -> str:
+    """Hash of user ID -> liked state of the likes of a tweet being flushed."""
+    return f"likes:flushing:{tweet_id}"
+
+
+def set_liked(user_id: int, tweet: Tweet, liked: bool) -> bool:
+    """Like or unlike the tweet for the user and return whether that changed anything."""
+
+    def record(pipe: redis.client.Pipeline) -> bool:
+        # Watched, so a flush or another like of the tweet in between retries this
+        state = pipe.hget(pending_key(tweet.id), str(user_id)) or pipe.hget(flushing_key(tweet.id), str(user_id))
+        if state is None:
+            state = LIKED if tweet.is_liked_by(CustomUser(id=user_id)) else UNLIKED
+        if (state == LIKED) == liked:
+            return False
+        pipe.multi()
+        pipe.hset(pending_key(tweet.id), str(user_id), LIKED if liked else UNLIKED)
+        pipe.hincrby(DELTA_KEY, str(tweet.id), 1 if liked else -1)
+        pipe.sadd(DIRTY_KEY, str(tweet.id))
+        return True
+
+    changed = cast(
+        bool,
+        get_redis().transaction(record, pending_key(tweet.id), flushing_key(tweet.id), value_from_callable=True),
+    )
+    if changed:
+        publish_counter(tweet.id, "likes_count", 1 if liked else -1)
+        invalidate_user_views(user_id)
+    return changed
+
+
+def apply_buffered_likes(tweets: list[Tweet], viewer_id: int | None, liked: set[int]) -> None:
+    """Add the buffered likes of the tweets to their ``likes_count``, and the viewer's to ``liked``."""
+    if not tweets:
+        return
+    tweet_ids = [str(tweet.id) for tweet in tweets]
+    pipe = get_redis().pipeline(transaction=False)
+    pipe.hmget(DELTA_KEY, tweet_ids)
+    pipe.hmget(FLUSHING_DELTA_KEY, tweet_ids)
+    if viewer_id is not None:
+        for tweet in tweets:
+            pipe.hget(pending_key(tweet.id), str(viewer_id))
+            pipe.hget(flushing_key(tweet.id), str(viewer_id))
+    deltas, flushing_deltas, *states = pipe.execute()
+
+    for i, tweet in enumerate(tweets):
+        tweet.likes_count = max(0, tweet.likes_count + int(deltas[i] or 0) + int(flushing_deltas[i] or 0))
+        if viewer_id is None:
+            continue
+        state = states[2 * i] or states[2 * i + 1]
+        if state == LIKED:
+            liked.add(tweet.id)
+        elif state == UNLIKED:
+            liked.discard(tweet.id)
+
+
+def start_flush(tweet_id: int) -> None:
+    """Set the buffered likes of a tweet aside to be flushed."""
+
+    def move(pipe: redis.client.Pipeline) -> None:
+        delta = int(pipe.hget(DELTA_KEY, str(tweet_id)) or 0)
+        exists = pipe.exists(pending_key(tweet_id))
+        pipe.multi()
+        if exists:
+            pipe.rename(pending_key(tweet_id), flushing_key(tweet_id))
+        pipe.hincrby(DELTA_KEY, str(tweet_id), -delta)
+        pipe.hincrby(FLUSHING_DELTA_KEY, str(tweet_id), delta)
+        pipe.sadd(FLUSHING_KEY, str(tweet_id))
+        pipe.srem(DIRTY_KEY, str(tweet_id))
+
+    get_redis().transaction(move, pending_key(tweet_id), DELTA_KEY)
+
+
+def write_likes(states: dict[int, dict[int, bool]]) -> dict[int, int]:
+    """
+    Bring the likes in the database to the given states, as tweet ID -> user ID -> liked,
+    and return the net change of each tweet's likes. States of deleted tweets or users are
+    dropped, and likes already in their state are left alone.
+    """
+    tweets = Tweet.objects.only("created_at").in_bulk(states)
+    user_ids = {user_id for users in states.values() for user_id in users}
+    existing_users = set(CustomUser.objects.filter(id__in=user_ids).values_list("id", flat=True))
+    if not tweets or not existing_users:
+        return {}
+    times = [tweet.created_at for tweet in tweets.values()]
+    existing = set(
+        Like.objects.filter(
+            tweet_id__in=tweets, user_id__in=existing_users, tweet_created_at__range=(min(times), max(times))
+        ).values_list("user_id", "tweet_id")
+    )
+
+    now = timezone.now()
+    created, deleted = [], []
+    changes: dict[int, int] = defaultdict(int)
+    for tweet_id, tweet in tweets.items():
+        for user_id, liked in states[tweet_id].items():
+            if user_id not in existing_users or liked == ((user_id, tweet_id) in existing):
+                continue
+            changes[tweet_id] += 1 if liked else -1
+            if liked:
+                created.append(Like(user_id=user_id, tweet=tweet, tweet_created_at=tweet.created_at, created_at=now))
+            else:
+                deleted.append((user_id, tweet_id, tweet.created_at))
+
+    # Bulk writes bypass the signals keeping the counters, they are updated below instead
+    Like.objects.bulk_create(created, ignore_conflicts=True)
+    if deleted:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {connection.ops.quote_name(Like._meta.db_table)} "
+                "WHERE (user_id, tweet_id, tweet_created_at) IN "
+                "(SELECT * FROM unnest(%s::bigint[], %s::bigint[], %s::timestamptz[]))",
+                [list(column) for column in zip(*deleted, strict=True)],
+            )
+    if changes := {tweet_id: change for tweet_id, change in changes.items() if change}:
+        delta = Case(*(When(pk=tweet_id, then=Value(change)) for tweet_id, change in changes.items()))
+        # With the tweets' creation times, only the partitions holding them are searched
+        changed_times = {tweets[tweet_id].created_at for tweet_id in changes}
+        Tweet.objects.filter(pk__in=changes, created_at__in=changed_times).update(
+            likes_count=Greatest(F("likes_count") + delta, 0, output_field=IntegerField())
+        )
+    return changes
+
+
+def flush(batch_size: int = 1000) -> int:
+    """
+    Write the buffered likes to the database and return the number of tweets flushed.
+
+    Tweets left aside by a flush that crashed are written again first. Callers must not
+    run concurrently, the ``flush_likes`` task holds ``FLUSH_LOCK_KEY`` with ``task_lock``.
+    """
+    client = get_redis()
+    if not client.scard(FLUSHING_KEY):
+        for tweet_id in cast(set[str], client.smembers(DIRTY_KEY)):
+            start_flush(int(tweet_id))
+
+    tweet_ids = [int(tweet_id) for tweet_id in cast(set[str], client.smembers(FLUSHING_KEY))]
+    for start in range(0, len(tweet_ids), batch_size):
+        batch = tweet_ids[start : start + batch_size]
+        pipe = client.pipeline(transaction=False)
+        for tweet_id in batch:
+            pipe.hgetall(flushing_key(tweet_id))
+        states = {
+            tweet_id: {int(user_id): state == LIKED for user_id, state in users.items()}
+            for tweet_id, users in zip(batch, pipe.execute(), strict=True)
+        }
+        with transaction.atomic():
+            write_likes(states)
+
+        pipe = client.pipeline()
+        pipe.delete(*(flushing_key(tweet_id) for tweet_id in batch))
+        pipe.hdel(FLUSHING_DELTA_KEY, *map(str, batch))
+        pipe.srem(FLUSHING_KEY, *map(str, batch))
+        pipe.execute()
+    return len(tweet_ids)
@@ -0,0 +1,225 @@
+"""
+Live timeline updates streamed to browsers as server-sent events.
+
+Writes publish small JSON messages to Redis pub/sub channels: new tweets to the channels
+of the timelines they appear on, counter changes to a channel per tweet. A stream only
+listens to the counters of the tweets on the page that opened it, so what an idle stream
+receives depends on what its client shows rather than on the traffic of the site.
+
+Each server process holds a single ``LiveHub`` subscription that dispatches messages to
+the queues of the open streams, so an idle stream costs a queue and a suspended coroutine
+rather than a Redis connection or a thread.
+
+Streams coalesce what arrives within ``LIVE_THROTTLE`` seconds into at most one event of
+each kind, so a burst of likes or tweets costs a client a single update.
+
+Streams are opened with a signed token from the page that embeds them instead of the
+session, so an open stream holds neither a cache nor a database connection. The token
+also carries the IDs of the tweets on the page.
+"""
+
+import asyncio
+import json
+import logging
+import weakref
+from collections import defaultdict
+from collections.abc import AsyncGenerator, Awaitable, Iterable
+from typing import cast
+
+import redis.asyncio as aioredis
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.template.loader import render_to_string
+
+from . import redis_client
+from .redis_client import get_redis
+from .timeline import CELEBRITIES_KEY
+
+logger = logging.getLogger(__name__)
+
+FEEDS = ("home", "explore")
+TOKEN_SALT = "apps.core.live"
+EXPLORE_CHANNEL = "live:explore"
+# Messages a stream may fall behind by before further ones are dropped for it
+QUEUE_SIZE = 100
+# Tweets whose counters a stream follows at most, more than a page of any feed
+MAX_COUNTER_TWEETS = 50
+
+
+def user_channel(user_id: int) -> str:
+    """New tweets on a user's materialized home timeline."""
+    return f"live:user:{user_id}"
+
+
+def author_channel(author_id: int) -> str:
+    """New tweets of a celebrity, whose tweets are not fanned out to followers' timelines."""
+    return f"live:author:{author_id}"
+
+
+def counter_channel(tweet_id: int) -> str:
+    """Changes of a tweet's counters."""
+    return f"live:counters:{tweet_id}"
+
+
+def stream_token(user_id: int, feed: str, tweet_ids: Iterable[int] = ()) -> str:
+    """Sign a stream of ``feed`` for the user, following the counters of the given tweets."""
+    return signing.dumps([user_id, feed, list(tweet_ids)[:MAX_COUNTER_TWEETS]], salt=TOKEN_SALT)
+
+
+def read_stream_token(token: str, feed: str) -> tuple[int, list[int]] | None:
+    """
+    Return the ID of the user a token for ``feed`` was issued to and the IDs of the tweets
+    it follows, or None if it is not valid.
+    """
+    try:
+        user_id, token_feed, tweet_ids = signing.loads(token, salt=TOKEN_SALT, max_age=settings.LIVE_TOKEN_MAX_AGE)
+    except (signing.BadSignature, ValueError):
+        return None
+    if token_feed != feed:
+        return None
+    return int(user_id), [int(tweet_id) for tweet_id in tweet_ids]
+
+
+def publish_tweet(channels: Iterable[str], tweet_id: int, author_id: int) -> None:
+    message = json.dumps({"tweet_id": tweet_id, "author_id": author_id})
+    pipe = get_redis().pipeline(transaction=False)
+    for channel in channels:
+        pipe.publish(channel, message)
+    pipe.execute()
+
+
+def publish_counter(tweet_id: int | None, field: str, delta: int) -> None:
+    """Publish a change of a tweet's counter once the transaction making it commits."""
+    if tweet_id is None:
+        return
+    message = json.dumps({"tweet_id": tweet_id, "field": field, "delta": delta})
+    transaction.on_commit(lambda: get_redis().publish(counter_channel(tweet_id), message))
+
+
+class LiveHub:
+    """
+    Share one Redis pub/sub connection between all streams of an event loop.
+
+    Channels are subscribed to while at least one stream listens to them. Messages are
+    put on the queues of the listening streams without waiting, a stream whose queue is
+    full misses them instead of holding up the others.
+    """
+
+    def __init__(self, client: aioredis.Redis) -> None:
+        self.client = client
+        self.pubsub = client.pubsub()
+        self.queues: dict[str, set[asyncio.Queue[str]]] = defaultdict(set)
+        self.reader: asyncio.Task[None] | None = None
+        # Streams opening and closing at the same time must not interleave their
+        # (un)subscriptions, nor start reading before the connection is subscribed
+        self.lock = asyncio.Lock()
+
+    async def subscribe(self, channels: list[str]) -> asyncio.Queue[str]:
+        queue: asyncio.Queue[str] = asyncio.Queue(maxsize=QUEUE_SIZE)
+        async with self.lock:
+            new = [channel for channel in channels if channel not in self.queues]
+            if new:
+                await self.pubsub.subscribe(*new)
+            for channel in channels:
+                self.queues[channel].add(queue)
+            if self.reader is None or self.reader.done():
+                self.reader = asyncio.create_task(self.read())
+        return queue
+
+    async def unsubscribe(self, queue: asyncio.Queue[str], channels: list[str]) -> None:
+        async with self.lock:
+            unused = []
+            for channel in channels:
+                self.queues[channel].discard(queue)
+                if not self.queues[channel]:
+                    del self.queues[channel]
+                    unused.append(channel)
+            if unused:
+                await self.pubsub.unsubscribe(*unused)
+
+    async def read(self) -> None:
+        """Dispatch messages to the queues of the streams until none are left."""
+        while self.queues:
+            try:
+                message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except aioredis.ConnectionError:
+                logger.warning("Lost the live updates subscription, reconnecting", exc_info=True)
+                await asyncio.sleep(1)
+                continue
+            if message is None:
+                continue
+            for queue in self.queues.get(message["channel"], ()):
+                if not queue.full():
+                    queue.put_nowait(message["data"])
+
+
+_hubs: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, LiveHub]" = weakref.WeakKeyDictionary()
+
+
+def get_hub() -> LiveHub:
+    """Return the hub of the running event loop, Redis connections cannot be shared between loops."""
+    loop = asyncio.get_running_loop()
+    if loop not in _hubs:
+        _hubs[loop] = LiveHub(redis_client.get_async_redis())
+    return _hubs[loop]
+
+
+async def home_channels(hub: LiveHub, user_id: int) -> list[str]:
+    """Channels carrying the new tweets of a user's home timeline."""
+    from .models import Follow
+
+    celebrities = [int(member) for member in await cast(Awaitable[set[str]], hub.client.smembers(CELEBRITIES_KEY))]
+    followed = Follow.objects.filter(follower_id=user_id, following_id__in=celebrities).values_list(
+        "following_id", flat=True
+    )
+    return [user_channel(user_id)] + [author_channel(author_id) async for author_id in followed]
+
+
+def format_event(event: str, data: str) -> str:
+    lines = "".join(f"data: {line}\n" for line in data.splitlines())
+    return f"event: {event}\n{lines}\n"
+
+
+async def stream_events(
+    hub: LiveHub, channels: list[str], viewer_id: int, show_url: str, tweet_ids: Iterable[int] = ()
+) -> AsyncGenerator[str, None]:
+    """
+    Yield server-sent events for the given channels until the client disconnects.
+
+    ``new-tweets`` carries a link to ``show_url`` counting the tweets by others published
+    since the stream was opened. ``counters`` carries the summed counter changes of the
+    tweets in ``tweet_ids`` as JSON, e.g. ``{"12": {"likes_count": 2}}``.
+    """
+    channels = [*channels, *(counter_channel(tweet_id) for tweet_id in tweet_ids)]
+    queue = await hub.subscribe(channels)
+    new_tweets: set[int] = set()
+    try:
+        # Sent straight away so the response starts before the first update
+        yield f"retry: {settings.LIVE_RETRY_MS}\n\n"
+        while True:
+            try:
+                first = await asyncio.wait_for(queue.get(), timeout=settings.LIVE_KEEPALIVE)
+            except TimeoutError:
+                # Keeps proxies from closing idle connections
+                yield ": keepalive\n\n"
+                continue
+            await asyncio.sleep(settings.LIVE_THROTTLE)
+            messages = [json.loads(first)]
+            while not queue.empty():
+                messages.append(json.loads(queue.get_nowait()))
+
+            counters: dict[str, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+            tweets_before = len(new_tweets)
+            for message in messages:
+                if "field" in message:
+                    counters[str(message["tweet_id"])][message["field"]] += message["delta"]
+                elif message["author_id"] != viewer_id:
+                    new_tweets.add(message["tweet_id"])
+            if len(new_tweets) > tweets_before:
+                html = render_to_string("core/new_tweets.html", {"count": len(new_tweets), "url": show_url})
+                yield format_event("new-tweets", html)
+            if counters:
+                yield format_event("counters", json.dumps(counters))
+    finally:
+        await hub.unsubscribe(queue, channels)
@@ -0,0 +1,52 @@
+import statistics
+import time
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the latency of a query on a connection opened for it, as every request does without "
+        "persistent connections or PgBouncer, and on a reused one"
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--queries", type=int, default=200, help="Number of queries of each kind")
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS, help="Database to connect to")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        connection = connections[options["database"]]
+
+        def timed(reconnect: bool) -> list[float]:
+            latencies = []
+            for _ in range(options["queries"]):
+                if reconnect:
+                    # Like the end of a request
+                    connection.close()
+                start = time.perf_counter()
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                    cursor.fetchone()
+                latencies.append(time.perf_counter() - start)
+            return latencies
+
+        self.stdout.write(
+            f"CONN_MAX_AGE={connection.settings_dict['CONN_MAX_AGE']} "
+            f"server-side cursors={not connection.settings_dict['DISABLE_SERVER_SIDE_CURSORS']}"
+        )
+        fresh = self.report("new connection", timed(reconnect=True))
+        reused = self.report("reused connection", timed(reconnect=False))
+        self.stdout.write(f"connection setup adds {(fresh - reused) * 1000:.2f}ms at p50")
+        connection.close()
+
+    def report(self, label: str, latencies: list[float]) -> float:
+        """Write the percentiles of ``latencies`` and return their median."""
+        latencies.sort()
+        percentiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        self.stdout.write(
+            f"{label} p50={percentiles[49] * 1000:.2f}ms p90={percentiles[89] * 1000:.2f}ms "
+            f"p99={percentiles[98] * 1000:.2f}ms"
+        )
+        return percentiles[49]
@@ -0,0 +1,151 @@
+import random
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+from typing import Any
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.middleware.csrf import CSRF_SECRET_LENGTH
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+from apps.core.models import CustomUser, Tweet
+
+# Share of the requests of a --mix run going to each page
+MIX = {"home": 40, "explore": 25, "profile": 25, "like_tweet": 10}
+# Likes of a --mix run like or unlike one of this many of the newest tweets
+LIKED_TWEETS = 1000
+# Pages of a --mix run sent as POST requests
+POSTED_PAGES = {"like_tweet"}
+
+
+def login_session(user: CustomUser) -> str:
+    """Create a logged in session for ``user`` and return its key."""
+    session = import_module(settings.SESSION_ENGINE).SessionStore()
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.create()
+    return str(session.session_key)
+
+
+def user_headers(user: CustomUser) -> dict[str, str]:
+    """Return the headers of requests sent as ``user``, with a CSRF token for POST requests."""
+    csrf_token = get_random_string(CSRF_SECRET_LENGTH)
+    return {
+        "Cookie": f"{settings.SESSION_COOKIE_NAME}={login_session(user)}; {settings.CSRF_COOKIE_NAME}={csrf_token}",
+        "X-CSRFToken": csrf_token,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure throughput and latency of a page, or of a mix of pages requested by many users, under "
+        "concurrent requests against a running server"
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--base-url", default="http://localhost:8000", help="Server to send requests to")
+        parser.add_argument("--path", default="/explore/", help="Path requested by every request")
+        parser.add_argument("--requests", type=int, default=200, help="Total number of requests")
+        parser.add_argument("--concurrency", type=int, default=10, help="Number of requests in flight at once")
+        parser.add_argument("--username", help="Send the requests logged in as this user")
+        parser.add_argument(
+            "--htmx", action="store_true", help="Send the headers of an infinite scroll request for the next page"
+        )
+        parser.add_argument(
+            "--mix",
+            action="store_true",
+            help="Instead of --path, request the home, explore, profile and like pages as random users",
+        )
+        parser.add_argument("--users", type=int, default=100, help="Number of users sending the requests of --mix")
+        parser.add_argument("--seed", type=int, help="Seed of the random generator, to replay the same requests")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        base_url = options["base_url"].rstrip("/")
+        if options["mix"]:
+            requests = self.mixed_requests(options["requests"], options["users"], random.Random(options["seed"]))
+        else:
+            request = (options["path"], options["path"], self.session_headers(options["username"]))
+            requests = [request] * options["requests"]
+        extra_headers = {"HX-Request": "true", "HX-Trigger": "tweets-container"} if options["htmx"] else {}
+
+        def fetch(request: tuple[str, str, dict[str, str]]) -> tuple[str, float, int]:
+            page, path, headers = request
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(
+                    urllib.request.Request(
+                        base_url + path,
+                        headers={**headers, **extra_headers},
+                        method="POST" if page in POSTED_PAGES else "GET",
+                    )
+                ) as response:
+                    response.read()
+                    status = response.status
+            except urllib.error.HTTPError as e:
+                status = e.code
+            return page, time.perf_counter() - start, status
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as executor:
+            results = list(executor.map(fetch, requests))
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(f"{len(results)} requests in {elapsed:.2f}s ({len(results) / elapsed:.1f} req/s)")
+        self.report("latency", [(latency, status) for _, latency, status in results])
+        if options["mix"]:
+            for name in MIX:
+                self.report(f"{name} latency", [(latency, status) for page, latency, status in results if page == name])
+
+    def session_headers(self, username: str | None) -> dict[str, str]:
+        if not username:
+            return {}
+        try:
+            user = CustomUser.objects.get(username=username)
+        except CustomUser.DoesNotExist as e:
+            raise CommandError(f"User {username} does not exist") from e
+        return user_headers(user)
+
+    def mixed_requests(self, count: int, users: int, rng: random.Random) -> list[tuple[str, str, dict[str, str]]]:
+        """
+        Return ``count`` requests, as (page, path, headers), for pages picked by their share in
+        ``MIX`` and each sent as one of ``users`` random users.
+        """
+        sessions = [user_headers(user) for user in CustomUser.objects.order_by("?")[:users]]
+        tweet_ids = list(Tweet.objects.filter(parent=None).values_list("id", flat=True)[:LIKED_TWEETS])
+        if not sessions or not tweet_ids:
+            raise CommandError("There are no users or tweets to send requests with, create some with seed_data")
+        # The profiles of the most followed users, visited in proportion to their followers
+        profiles = CustomUser.objects.order_by("-followers_count").values_list("username", "followers_count")[:1000]
+        usernames = [username for username, _ in profiles]
+        profile_weights = [followers + 1 for _, followers in profiles]
+
+        requests = []
+        for page in rng.choices(list(MIX), weights=list(MIX.values()), k=count):
+            if page == "profile":
+                path = reverse(page, kwargs={"username": rng.choices(usernames, weights=profile_weights)[0]})
+            elif page == "like_tweet":
+                path = reverse(rng.choice(["like_tweet", "unlike_tweet"]), kwargs={"tweet_id": rng.choice(tweet_ids)})
+            else:
+                path = reverse(page)
+            requests.append((page, path, rng.choice(sessions)))
+        return requests
+
+    def report(self, label: str, results: list[tuple[float, int]]) -> None:
+        if not results:
+            return
+        latencies = sorted(latency for latency, _ in results)
+        errors = sum(1 for _, status in results if status != 200)
+        percentiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        self.stdout.write(
+            f"{label} p50={percentiles[49] * 1000:.0f}ms p90={percentiles[89] * 1000:.0f}ms "
+            f"p99={percentiles[98] * 1000:.0f}ms ({len(results)} requests)"
+        )
+        if errors:
+            self.stdout.write(self.style.WARNING(f"{errors} of them did not return 200"))
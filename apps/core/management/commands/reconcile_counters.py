@@ -0,0 +1,49 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db.models import Count, Max, Min, Model, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from apps.core.models import CustomUser, Follow, Like, Tweet
+
+# counter field -> (related model, foreign key on that model pointing at the counted row)
+COUNTERS: dict[type[Model], dict[str, tuple[type[Model], str]]] = {
+    CustomUser: {
+        "following_count": (Follow, "follower"),
+        "followers_count": (Follow, "following"),
+        "tweets_count": (Tweet, "user"),
+    },
+    Tweet: {
+        "likes_count": (Like, "tweet"),
+        "retweets_count": (Tweet, "parent"),
+        "replies_count": (Tweet, "reply_to"),
+    },
+}
+
+
+def count_of(model: type[Model], field: str) -> Coalesce:
+    rows = model._default_manager.filter(**{field: OuterRef("pk")}).order_by().values(field).annotate(n=Count("*"))
+    return Coalesce(Subquery(rows.values("n")), 0)
+
+
+class Command(BaseCommand):
+    help = "Recompute denormalized like, retweet, reply, tweet and follow counters that have drifted"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--batch-size", type=int, default=1000, help="Number of rows checked per UPDATE")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        batch_size: int = options["batch_size"]
+        for model, counters in COUNTERS.items():
+            bounds = model._default_manager.aggregate(low=Min("pk"), high=Max("pk"))
+            if bounds["low"] is None:
+                continue
+            fixed = dict.fromkeys(counters, 0)
+            for start in range(bounds["low"], bounds["high"] + 1, batch_size):
+                batch = model._default_manager.filter(pk__gte=start, pk__lt=start + batch_size)
+                for field, (related_model, related_field) in counters.items():
+                    actual = count_of(related_model, related_field)
+                    fixed[field] += batch.filter(~Q(**{field: actual})).update(**{field: actual})
+            for field, count in fixed.items():
+                self.stdout.write(f"{model._meta.label}.{field}: fixed {count} rows")
+        self.stdout.write(self.style.SUCCESS("Counters reconciled"))
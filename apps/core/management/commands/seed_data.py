@@ -0,0 +1,258 @@
+"""
+Generate a social graph at realistic scale, for load tests and query plans.
+
+Popularity follows a power law: users are ranked at random and the user of rank ``r`` is
+followed, liked and retweeted in proportion to ``1 / r ** skew``. How much each user
+follows, tweets, likes and retweets is heavy tailed too, with the given means.
+
+Users, tweets and retweets are inserted with ``bulk_create``, follows and likes, by far the
+most numerous rows, are streamed to ``COPY``. Either way rows are written in batches, so
+memory only grows with the IDs and timestamps of the tweets, never with follows or likes.
+Signal handlers do not run, so the denormalized counters are reconciled at the end and
+timelines are materialized from the database on first read.
+"""
+
+import io
+import random
+import time
+from array import array
+from collections.abc import Callable, Iterable, Iterator
+from datetime import UTC, datetime
+from itertools import accumulate
+from typing import Any
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connection
+from django.db.models import Model
+from django.utils import timezone
+from django.utils.lorem_ipsum import words
+
+from apps.core import partitions, timeline
+from apps.core.models import CustomUser, Follow, Like, Tweet
+
+# Shape of the Pareto distribution of per-user activity. Below 2 its variance is infinite:
+# most users do little and a few do a lot.
+ACTIVITY_SHAPE = 1.5
+# No user follows, tweets, likes or retweets more than this many times their mean
+MAX_ACTIVITY_FACTOR = 100
+# Popular users are picked again and again, so picks are topped up this many times at most
+# to get the number of distinct follows, likes or retweets asked for
+MAX_PICK_ROUNDS = 5
+
+
+class Popularity:
+    """Picks users at random, in proportion to their power-law popularity."""
+
+    def __init__(self, size: int, skew: float, rng: random.Random) -> None:
+        self.rng = rng
+        self.ranked = list(range(size))
+        rng.shuffle(self.ranked)
+        self.cum_weights = list(accumulate(1 / rank**skew for rank in range(1, size + 1)))
+
+    def pick(self, count: int) -> list[int]:
+        """Indexes of ``count`` users, with repetitions."""
+        return self.rng.choices(self.ranked, cum_weights=self.cum_weights, k=count)
+
+    def pick_distinct(
+        self, count: int, exclude: int, value: Callable[[int], int | None] = lambda user: user
+    ) -> set[int]:
+        """
+        Up to ``count`` distinct ``value(user)`` of picked users other than ``exclude``. Users
+        for which it returns None are skipped.
+        """
+        picked: set[int] = set()
+        for _ in range(MAX_PICK_ROUNDS):
+            if len(picked) >= count:
+                break
+            for user in self.pick(count - len(picked)):
+                if user != exclude and (picked_value := value(user)) is not None:
+                    picked.add(picked_value)
+        return picked
+
+
+def activity(rng: random.Random, mean: float, limit: int) -> int:
+    """A heavy-tailed count averaging ``mean``, at most ``limit``."""
+    # The mean of a Pareto distribution of shape a is a / (a - 1)
+    value = mean * (ACTIVITY_SHAPE - 1) / ACTIVITY_SHAPE * rng.paretovariate(ACTIVITY_SHAPE)
+    # Rounded up or down at random so that small means are not rounded away
+    return min(limit, int(min(value, mean * MAX_ACTIVITY_FACTOR) + rng.random()))
+
+
+def copy_rows(model: type[Model], columns: list[str], rows: Iterable[tuple[Any, ...]], batch_size: int) -> int:
+    """Insert rows into ``model``'s table with one ``COPY`` per batch and return their number."""
+    quote = connection.ops.quote_name
+    sql = f"COPY {quote(model._meta.db_table)} ({', '.join(map(quote, columns))}) FROM STDIN"
+    count = 0
+    buffer = io.StringIO()
+    with connection.cursor() as cursor:
+        for count, row in enumerate(rows, 1):
+            buffer.write("\t".join(map(str, row)) + "\n")
+            if count % batch_size == 0:
+                buffer.seek(0)
+                cursor.copy_expert(sql, buffer)
+                buffer = io.StringIO()
+        buffer.seek(0)
+        cursor.copy_expert(sql, buffer)
+    return count
+
+
+class Command(BaseCommand):
+    help = "Generate users, follows, tweets, likes and retweets with power-law popularity for performance testing"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--users", type=int, default=1000, help="Number of users")
+        parser.add_argument("--follows", type=float, default=50, help="Mean number of users each user follows")
+        parser.add_argument("--tweets", type=float, default=20, help="Mean number of tweets per user")
+        parser.add_argument("--likes", type=float, default=100, help="Mean number of likes per user")
+        parser.add_argument("--retweets", type=float, default=2, help="Mean number of retweets per user")
+        parser.add_argument("--days", type=float, default=30, help="Spread tweets over this many past days")
+        parser.add_argument("--skew", type=float, default=1.0, help="Exponent of the power law of popularity")
+        parser.add_argument("--prefix", default="seed", help="Prefix of the usernames")
+        parser.add_argument("--password", default="password", help="Password of every user")
+        parser.add_argument("--batch-size", type=int, default=10000, help="Number of rows per INSERT or COPY")
+        parser.add_argument("--seed", type=int, help="Seed of the random generator, for a reproducible graph")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if CustomUser.objects.filter(username__startswith=options["prefix"]).exists():
+            raise CommandError(f"Users named {options['prefix']}* already exist, pick another --prefix")
+        self.rng = random.Random(options["seed"])
+        # lorem_ipsum uses the global generator
+        random.seed(options["seed"])
+        self.batch_size: int = options["batch_size"]
+        self.now = timezone.now().timestamp()
+        self.since = self.now - options["days"] * 86400
+        popularity = Popularity(options["users"], options["skew"], self.rng)
+
+        # Tweets and likes only go into partitions that exist
+        partitions.ensure_partitions()
+        start = time.perf_counter()
+        user_ids = self.create_users(options["users"], options["prefix"], options["password"])
+        start = self.report("users", len(user_ids), start)
+        follows = self.create_follows(user_ids, popularity, options["follows"])
+        start = self.report("follows", follows, start)
+        tweet_ids, tweet_times, offsets = self.create_tweets(user_ids, options["tweets"])
+        start = self.report("tweets", len(tweet_ids), start)
+        engagement = (user_ids, popularity, tweet_ids, tweet_times, offsets)
+        start = self.report("likes", self.create_likes(*engagement, options["likes"]), start)
+        self.report("retweets", self.create_retweets(*engagement, options["retweets"]), start)
+
+        call_command("reconcile_counters", batch_size=self.batch_size, stdout=self.stdout)
+        celebrities = CustomUser.objects.filter(
+            id__in=user_ids, followers_count__gte=settings.TIMELINE_FANOUT_FOLLOWER_LIMIT
+        ).values_list("id", flat=True)
+        for user_id in celebrities:
+            timeline.set_celebrity(user_id, True)
+        with connection.cursor() as cursor:
+            for model in (CustomUser, Follow, Tweet, Like):
+                cursor.execute(f"ANALYZE {connection.ops.quote_name(model._meta.db_table)}")
+        self.stdout.write(self.style.SUCCESS("Seed data generated"))
+
+    def report(self, name: str, count: int, start: float) -> float:
+        """Write how many rows were inserted since ``start`` and return the current time."""
+        now = time.perf_counter()
+        self.stdout.write(f"{name}: {count} rows in {now - start:.1f}s")
+        return now
+
+    def timestamp(self, after: float) -> datetime:
+        """A random time between ``after`` and now."""
+        return datetime.fromtimestamp(after + self.rng.random() * (self.now - after), tz=UTC)
+
+    def create_users(self, count: int, prefix: str, password: str) -> array:
+        # Hashing is slow on purpose, every user shares the same hash
+        hashed = make_password(password)
+        user_ids = array("q")
+        for start in range(0, count, self.batch_size):
+            users = CustomUser.objects.bulk_create(
+                CustomUser(username=f"{prefix}{i}", email=f"{prefix}{i}@example.com", password=hashed)
+                for i in range(start, min(count, start + self.batch_size))
+            )
+            user_ids.extend(user.id for user in users)
+        return user_ids
+
+    def create_follows(self, user_ids: array, popularity: Popularity, mean: float) -> int:
+        def rows() -> Iterator[tuple[int, int, datetime]]:
+            for follower in range(len(user_ids)):
+                count = activity(self.rng, mean, len(user_ids) - 1)
+                for followed in popularity.pick_distinct(count, exclude=follower):
+                    yield user_ids[follower], user_ids[followed], self.timestamp(self.since)
+
+        return copy_rows(Follow, ["follower_id", "following_id", "created_at"], rows(), self.batch_size)
+
+    def create_tweets(self, user_ids: array, mean: float) -> tuple[array, array, array]:
+        """
+        Return the IDs and timestamps of the tweets, grouped by author, and the offset of
+        each author's first tweet in them.
+        """
+        tweet_ids, tweet_times, offsets = array("q"), array("d"), array("q", [0])
+        batch: list[Tweet] = []
+
+        def flush() -> None:
+            for tweet in Tweet.objects.bulk_create(batch):
+                tweet_ids.append(tweet.id)
+                tweet_times.append(tweet.created_at.timestamp())
+            batch.clear()
+
+        for user_id in user_ids:
+            for _ in range(activity(self.rng, mean, MAX_ACTIVITY_FACTOR * int(mean + 1))):
+                content = words(self.rng.randint(3, 40), common=False)[:280]
+                batch.append(Tweet(user_id=user_id, content=content, created_at=self.timestamp(self.since)))
+            offsets.append(len(tweet_ids) + len(batch))
+            if len(batch) >= self.batch_size:
+                flush()
+        flush()
+        return tweet_ids, tweet_times, offsets
+
+    def pick_tweets(self, user: int, popularity: Popularity, offsets: array, count: int) -> set[int]:
+        """Indexes of up to ``count`` distinct tweets of other users, by authors picked by popularity."""
+
+        def tweet_of(author: int) -> int | None:
+            first, last = offsets[author], offsets[author + 1]
+            return self.rng.randrange(first, last) if first < last else None
+
+        return popularity.pick_distinct(count, exclude=user, value=tweet_of)
+
+    def create_likes(
+        self,
+        user_ids: array,
+        popularity: Popularity,
+        tweet_ids: array,
+        tweet_times: array,
+        offsets: array,
+        mean: float,
+    ) -> int:
+        def rows() -> Iterator[tuple[int, int, datetime, datetime]]:
+            for user in range(len(user_ids)):
+                for tweet in self.pick_tweets(user, popularity, offsets, activity(self.rng, mean, len(tweet_ids))):
+                    tweet_time = datetime.fromtimestamp(tweet_times[tweet], tz=UTC)
+                    yield user_ids[user], tweet_ids[tweet], self.timestamp(tweet_times[tweet]), tweet_time
+
+        columns = ["user_id", "tweet_id", "created_at", "tweet_created_at"]
+        return copy_rows(Like, columns, rows(), self.batch_size)
+
+    def create_retweets(
+        self,
+        user_ids: array,
+        popularity: Popularity,
+        tweet_ids: array,
+        tweet_times: array,
+        offsets: array,
+        mean: float,
+    ) -> int:
+        count = 0
+        batch: list[Tweet] = []
+        for user in range(len(user_ids)):
+            for tweet in self.pick_tweets(user, popularity, offsets, activity(self.rng, mean, len(tweet_ids))):
+                batch.append(
+                    Tweet(
+                        user_id=user_ids[user],
+                        parent_id=tweet_ids[tweet],
+                        created_at=self.timestamp(tweet_times[tweet]),
+                    )
+                )
+            if len(batch) >= self.batch_size or user == len(user_ids) - 1:
+                count += len(Tweet.objects.bulk_create(batch))
+                batch.clear()
+        return count
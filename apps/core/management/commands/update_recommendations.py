@@ -0,0 +1,22 @@
+import os
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from apps.core import recommendations
+from apps.core.redis_client import task_lock
+
+
+class Command(BaseCommand):
+    help = "Recompute every user's \"who to follow\" recommendations, scoring users in several processes"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Number of scoring processes")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        # Shares the lock of the update_recommendations task, so the two never run at once
+        with task_lock(recommendations.LOCK_KEY, timeout=60 * 60 * 6) as acquired:
+            if not acquired:
+                raise CommandError("Recommendations are already being updated")
+            scored = recommendations.update(options["workers"])
+        self.stdout.write(self.style.SUCCESS(f"Scored {scored} users"))
@@ -0,0 +1,59 @@
+# Generated by Django 5.2 on 2026-10-18 19:09
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_of(model: type[models.Model], field: str) -> Coalesce:
+    rows = model.objects.filter(**{field: OuterRef("pk")}).order_by().values(field).annotate(n=Count("*"))
+    return Coalesce(Subquery(rows.values("n")), 0)
+
+
+def backfill_counters(apps, schema_editor) -> None:  # type: ignore[no-untyped-def]
+    CustomUser = apps.get_model("core", "CustomUser")
+    Tweet = apps.get_model("core", "Tweet")
+    Like = apps.get_model("core", "Like")
+    Follow = apps.get_model("core", "Follow")
+
+    CustomUser.objects.update(
+        following_count=count_of(Follow, "follower"),
+        followers_count=count_of(Follow, "following"),
+        tweets_count=count_of(Tweet, "user"),
+    )
+    Tweet.objects.update(likes_count=count_of(Like, "tweet"), retweets_count=count_of(Tweet, "parent"))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="customuser",
+            name="followers_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="customuser",
+            name="following_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="customuser",
+            name="tweets_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="tweet",
+            name="likes_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="tweet",
+            name="retweets_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2 on 2026-10-18 19:14
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("core", "0002_denormalized_counters"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="follow",
+            index=models.Index(fields=["following", "follower"], name="core_follow_followers_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="tweet",
+            index=models.Index(fields=["user", "-created_at"], name="core_tweet_user_created_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="tweet",
+            index=models.Index(fields=["-created_at", "-id"], name="core_tweet_created_id_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="tweet",
+            index=models.Index(
+                condition=models.Q(("parent__isnull", False)), fields=["parent", "user"], name="core_tweet_retweet_idx"
+            ),
+        ),
+    ]
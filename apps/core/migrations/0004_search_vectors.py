@@ -0,0 +1,52 @@
+# Generated by Django 5.2 on 2026-10-18 19:21
+
+import django.contrib.postgres.search
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("core", "0003_hot_path_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="customuser",
+            name="search_vector",
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=django.contrib.postgres.search.CombinedSearchVector(
+                    django.contrib.postgres.search.SearchVector("username", config="simple", weight="A"),
+                    "||",
+                    django.contrib.postgres.search.SearchVector("bio", config="simple", weight="B"),
+                    django.contrib.postgres.search.SearchConfig("simple"),
+                ),
+                output_field=django.contrib.postgres.search.SearchVectorField(),
+            ),
+        ),
+        migrations.AddField(
+            model_name="tweet",
+            name="search_vector",
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=django.contrib.postgres.search.SearchVector("content", config="english"),
+                output_field=django.contrib.postgres.search.SearchVectorField(),
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="customuser",
+            index=GinIndex(fields=["search_vector"], name="core_user_search_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="tweet",
+            index=GinIndex(
+                condition=models.Q(("parent__isnull", True)), fields=["search_vector"], name="core_tweet_search_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-18 20:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0005_notification"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tweet",
+            name="image_renditions",
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
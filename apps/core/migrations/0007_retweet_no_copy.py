@@ -0,0 +1,52 @@
+# Generated by Django 5.2 on 2026-10-18 20:33
+
+from django.contrib.postgres.operations import AddConstraintNotValid, ValidateConstraint
+from django.db import migrations, models, transaction
+
+BATCH_SIZE = 5000
+
+
+def compact_retweets(apps, schema_editor) -> None:  # type: ignore[no-untyped-def]
+    """Clear the content and image copied into retweets, one batch per transaction."""
+    Tweet = apps.get_model("core", "Tweet")
+
+    last_id = 0
+    while ids := list(
+        Tweet.objects.filter(parent__isnull=False, id__gt=last_id)
+        .order_by("id")
+        .values_list("id", flat=True)[:BATCH_SIZE]
+    ):
+        with transaction.atomic():
+            Tweet.objects.filter(id__in=ids).exclude(content="", image=None).update(content="", image=None)
+        last_id = ids[-1]
+
+
+class Migration(migrations.Migration):
+    # Keeps each batch of the compaction short, and validating the constraint from
+    # blocking writes
+    atomic = False
+
+    dependencies = [
+        ("core", "0006_tweet_image_renditions"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="tweet",
+            name="content",
+            field=models.TextField(blank=True, max_length=280),
+        ),
+        migrations.RunPython(compact_retweets, migrations.RunPython.noop),
+        AddConstraintNotValid(
+            model_name="tweet",
+            constraint=models.CheckConstraint(
+                condition=models.Q(
+                    ("parent__isnull", True),
+                    models.Q(("content", ""), models.Q(("image__isnull", True), ("image", ""), _connector="OR")),
+                    _connector="OR",
+                ),
+                name="core_tweet_retweet_no_copy",
+            ),
+        ),
+        ValidateConstraint(model_name="tweet", name="core_tweet_retweet_no_copy"),
+    ]
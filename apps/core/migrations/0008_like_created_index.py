@@ -0,0 +1,20 @@
+# Generated by Django 5.2 on 2026-10-18 20:52
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("core", "0007_retweet_no_copy"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="like",
+            index=models.Index(fields=["created_at"], name="core_like_created_idx"),
+        ),
+    ]
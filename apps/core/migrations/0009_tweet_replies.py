@@ -0,0 +1,64 @@
+# Generated by Django 5.2 on 2026-10-18 20:58
+
+import django.db.models.deletion
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("core", "0008_like_created_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tweet",
+            name="replies_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="tweet",
+            name="reply_to",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="replies",
+                to="core.tweet",
+            ),
+        ),
+        migrations.AddField(
+            model_name="tweet",
+            name="thread_path",
+            field=models.CharField(blank=True, db_collation="C", default="", editable=False, max_length=2176),
+        ),
+        migrations.AlterField(
+            model_name="notification",
+            name="verb",
+            field=models.CharField(
+                choices=[
+                    ("like", "liked your tweet"),
+                    ("retweet", "retweeted your tweet"),
+                    ("follow", "followed you"),
+                    ("reply", "replied to your tweet"),
+                ],
+                max_length=16,
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="tweet",
+            index=models.Index(
+                condition=models.Q(("reply_to__isnull", False)), fields=["reply_to"], name="core_tweet_reply_to_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="tweet",
+            index=models.Index(
+                condition=models.Q(("reply_to__isnull", False)), fields=["thread_path"], name="core_tweet_thread_idx"
+            ),
+        ),
+    ]
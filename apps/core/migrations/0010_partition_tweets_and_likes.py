@@ -0,0 +1,262 @@
+# Generated by Django 5.2 on 2026-10-18 21:40
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models, transaction
+from django.utils import timezone
+
+from apps.core.partitions import PARTITIONED_TABLES, ensure_partitions, month_start, next_month
+
+BACKFILL_BATCH_SIZE = 10_000
+LIKE_UNIQUE_NAME = "core_like_user_tweet_created_uniq"
+
+
+def backfill_tweet_created_at(apps, schema_editor) -> None:  # type: ignore[no-untyped-def]
+    """
+    Copy the time of each like's tweet onto the like, one range of IDs per transaction, so
+    that rows are only locked briefly. The next range starts at the next ID found after the
+    previous one, so likes added meanwhile are filled too.
+    """
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT min(id) FROM core_like")
+        start = cursor.fetchone()[0]
+        while start is not None:
+            cursor.execute(
+                "UPDATE core_like SET tweet_created_at = core_tweet.created_at FROM core_tweet "
+                "WHERE core_tweet.id = core_like.tweet_id AND core_like.id >= %s AND core_like.id < %s "
+                "AND core_like.tweet_created_at IS NULL",
+                [start, start + BACKFILL_BATCH_SIZE],
+            )
+            cursor.execute("SELECT min(id) FROM core_like WHERE id >= %s", [start + BACKFILL_BATCH_SIZE])
+            start = cursor.fetchone()[0]
+
+
+def require_tweet_created_at(apps, schema_editor) -> None:  # type: ignore[no-untyped-def]
+    """
+    Make ``core_like.tweet_created_at`` NOT NULL. A CHECK constraint validated beforehand,
+    without blocking writes, spares the ``SET NOT NULL`` its scan of the table.
+    """
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            'ALTER TABLE core_like ADD CONSTRAINT "core_like_tweet_created_at_notnull" '
+            "CHECK (tweet_created_at IS NOT NULL) NOT VALID"
+        )
+        cursor.execute('ALTER TABLE core_like VALIDATE CONSTRAINT "core_like_tweet_created_at_notnull"')
+        cursor.execute("ALTER TABLE core_like ALTER COLUMN tweet_created_at SET NOT NULL")
+        cursor.execute('ALTER TABLE core_like DROP CONSTRAINT "core_like_tweet_created_at_notnull"')
+
+
+def swap_like_unique_constraint(apps, schema_editor) -> None:  # type: ignore[no-untyped-def]
+    """
+    Replace the unique constraint on likes by user and tweet with one that also holds the
+    partition key. Its index is built without blocking writes and then attached, like
+    ``prepare_archive`` does for the primary key.
+    """
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS "{LIKE_UNIQUE_NAME}" '
+            "ON core_like (user_id, tweet_id, tweet_created_at)"
+        )
+        cursor.execute("SELECT conname FROM pg_constraint WHERE conrelid = 'core_like'::regclass AND contype = 'u'")
+        previous = [name for (name,) in cursor.fetchall()]
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(
+            f'ALTER TABLE core_like ADD CONSTRAINT "{LIKE_UNIQUE_NAME}" UNIQUE USING INDEX "{LIKE_UNIQUE_NAME}"'
+        )
+        for name in previous:
+            cursor.execute(f'ALTER TABLE core_like DROP CONSTRAINT "{name}"')
+
+
+def archive_name(name: str) -> str:
+    """Name an index of the table becoming the archive partition, within Postgres' 63 characters."""
+    return f"{name[:55]}_archive"
+
+
+def prepare_archive(cursor, table: str, key: str, archive_end: str) -> None:  # type: ignore[no-untyped-def]
+    """
+    Build, without blocking writes, what attaching ``table`` as the archive partition needs:
+    a unique index on the partitioned table's primary key, and a validated CHECK constraint
+    matching the partition's range, so that attaching it does not scan its rows.
+    """
+    cursor.execute(f'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS "{table}_archive_pkey" ON "{table}" (id, "{key}")')
+    cursor.execute(
+        f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_archive_range" '
+        f'CHECK ("{key}" IS NOT NULL AND "{key}" < \'{archive_end}\') NOT VALID'
+    )
+    # Only takes a lock that lets rows be read and written meanwhile
+    cursor.execute(f'ALTER TABLE "{table}" VALIDATE CONSTRAINT "{table}_archive_range"')
+
+
+def partition_table(cursor, table: str, key: str, archive_end: str) -> None:  # type: ignore[no-untyped-def]
+    """
+    Rename ``table`` to ``<table>_archive`` and create in its place a table with the same
+    columns, indexes and constraints, partitioned by range of ``key``, with the renamed
+    table attached as its partition of the rows before ``archive_end``. The primary key
+    gains the partition key and IDs carry on from the old table's sequence.
+
+    Only changes the catalog: the indexes of the archive are those the table already had,
+    and ``prepare_archive`` built the rest.
+    """
+    cursor.execute(f'LOCK TABLE "{table}" IN ACCESS EXCLUSIVE MODE')
+    cursor.execute(
+        "SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s "
+        "AND indexname NOT IN (SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass) "
+        "AND indexname != %s",
+        [table, table, f"{table}_archive_pkey"],
+    )
+    indexes = cursor.fetchall()
+    cursor.execute(
+        "SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype IN ('p', 'u', 'f')",
+        [table],
+    )
+    constraints = cursor.fetchall()
+    cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+    cursor.execute(f"SELECT last_value + is_called::int FROM {cursor.fetchone()[0]}")
+    next_id = cursor.fetchone()[0]
+
+    # Free the names of the indexes for the partitioned table. Constraint names only need
+    # to be unique per table, except for those backed by an index.
+    for name, _ in indexes:
+        cursor.execute(f'ALTER INDEX "{name}" RENAME TO "{archive_name(name)}"')
+    for name, contype, _ in constraints:
+        if contype == "p":
+            cursor.execute(f'ALTER TABLE "{table}" DROP CONSTRAINT "{name}"')
+        elif contype == "u":
+            cursor.execute(f'ALTER TABLE "{table}" RENAME CONSTRAINT "{name}" TO "{archive_name(name)}"')
+    # The partitioned table's primary key only matches an index backing a constraint
+    cursor.execute(
+        f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_archive_pkey" PRIMARY KEY USING INDEX "{table}_archive_pkey"'
+    )
+    cursor.execute(f'ALTER TABLE "{table}" ALTER COLUMN id DROP IDENTITY IF EXISTS')
+    cursor.execute(f'ALTER TABLE "{table}" RENAME TO "{table}_archive"')
+
+    cursor.execute(
+        f'CREATE TABLE "{table}" (LIKE "{table}_archive" INCLUDING DEFAULTS INCLUDING GENERATED '
+        f'INCLUDING CONSTRAINTS INCLUDING STORAGE) PARTITION BY RANGE ("{key}")'
+    )
+    cursor.execute(f'ALTER TABLE "{table}" DROP CONSTRAINT "{table}_archive_range"')
+    # Partitioned tables cannot have identity columns before Postgres 17
+    cursor.execute(f'CREATE SEQUENCE "{table}_id_seq" AS bigint OWNED BY "{table}".id')
+    cursor.execute(f"SELECT setval('\"{table}_id_seq\"', %s, false)", [next_id])
+    cursor.execute(f'ALTER TABLE "{table}" ALTER COLUMN id SET DEFAULT nextval(\'"{table}_id_seq"\')')
+    # Created on the partitioned table alone while it has no partitions. Attaching the
+    # archive then adopts its matching indexes and foreign keys instead of building them.
+    cursor.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_pkey" PRIMARY KEY (id, "{key}")')
+    for _, definition in indexes:
+        cursor.execute(definition)
+    for name, contype, definition in constraints:
+        if contype != "p":
+            cursor.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{name}" {definition}')
+    cursor.execute(
+        f'ALTER TABLE "{table}" ATTACH PARTITION "{table}_archive" FOR VALUES FROM (MINVALUE) TO (\'{archive_end}\')'
+    )
+    cursor.execute(f'ALTER TABLE "{table}_archive" DROP CONSTRAINT "{table}_archive_range"')
+
+
+def partition(apps, schema_editor) -> None:  # type: ignore[no-untyped-def]
+    connection = schema_editor.connection
+    # Rows written while the migration runs go to the archive too, so it ends with the
+    # current month and the monthly partitions start with the next one.
+    archive_end = next_month(month_start(timezone.now()))
+    with connection.cursor() as cursor:
+        for table, key in PARTITIONED_TABLES.items():
+            prepare_archive(cursor, table, key, archive_end.isoformat())
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        for table, key in PARTITIONED_TABLES.items():
+            partition_table(cursor, table, key, archive_end.isoformat())
+        ensure_partitions(archive_end, using=connection.alias)
+    with connection.cursor() as cursor:
+        for table in PARTITIONED_TABLES:
+            cursor.execute(f'ANALYZE "{table}"')
+
+
+class Migration(migrations.Migration):
+    # Indexes are built concurrently, and only swapping the tables in holds locks on them
+    atomic = False
+
+    dependencies = [
+        ("core", "0009_tweet_replies"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="tweet",
+            name="created_at",
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AlterField(
+            model_name="tweet",
+            name="parent",
+            field=models.ForeignKey(
+                blank=True,
+                db_constraint=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="retweets",
+                to="core.tweet",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="tweet",
+            name="reply_to",
+            field=models.ForeignKey(
+                blank=True,
+                db_constraint=False,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="replies",
+                to="core.tweet",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="like",
+            name="tweet",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="likes",
+                to="core.tweet",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="notification",
+            name="tweet",
+            field=models.ForeignKey(
+                blank=True,
+                db_constraint=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="core.tweet",
+            ),
+        ),
+        migrations.AddField(
+            model_name="like",
+            name="tweet_created_at",
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_tweet_created_at, migrations.RunPython.noop, atomic=False),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunPython(require_tweet_created_at, atomic=False)],
+            state_operations=[
+                migrations.AlterField(
+                    model_name="like",
+                    name="tweet_created_at",
+                    field=models.DateTimeField(editable=False),
+                ),
+            ],
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunPython(swap_like_unique_constraint, atomic=False)],
+            state_operations=[
+                migrations.AlterUniqueTogether(
+                    name="like",
+                    unique_together={("user", "tweet", "tweet_created_at")},
+                ),
+            ],
+        ),
+        migrations.RunPython(partition, atomic=False),
+    ]
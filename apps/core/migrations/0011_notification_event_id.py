@@ -0,0 +1,40 @@
+# Generated by Django 5.2 on 2026-10-18 22:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("core", "0010_partition_tweets_and_likes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notification",
+            name="event_id",
+            field=models.UUIDField(blank=True, editable=False, null=True),
+        ),
+        # Conditional unique constraints are unique indexes, built without blocking writes
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name="notification",
+                    constraint=models.UniqueConstraint(
+                        condition=models.Q(("event_id__isnull", False)),
+                        fields=("event_id",),
+                        name="core_notification_event_uniq",
+                    ),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(
+                    'CREATE UNIQUE INDEX CONCURRENTLY "core_notification_event_uniq" '
+                    'ON "core_notification" ("event_id") WHERE "event_id" IS NOT NULL',
+                    reverse_sql='DROP INDEX CONCURRENTLY IF EXISTS "core_notification_event_uniq"',
+                ),
+            ],
+        ),
+    ]
@@ -1,17 +1,32 @@
-from typing import TYPE_CHECKING
+from typing import Any
 
 from django.contrib.auth.models import AbstractUser
-from django.db import models
-from django.db.models import QuerySet
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.db import models, transaction
+from django.db.models import Q, QuerySet
 from django.utils import timezone
 
-if TYPE_CHECKING:
-    from django.db.models import QuerySet
-
 
 class CustomUser(AbstractUser):
     bio = models.TextField(max_length=500, blank=True)
     date_joined = models.DateTimeField(auto_now_add=True)
+    # Denormalized counters, kept up to date by the signal handlers in signals.py
+    following_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    tweets_count = models.PositiveIntegerField(default=0)
+    # Full-text search document, maintained by the database. See search.py.
+    search_vector = models.GeneratedField(
+        expression=SearchVector("username", weight="A", config="simple")
+        + SearchVector("bio", weight="B", config="simple"),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            GinIndex(fields=["search_vector"], name="core_user_search_idx"),
+        ]
 
     def __str__(self) -> str:
         return str(self.username)
@@ -32,19 +47,92 @@ class CustomUser(AbstractUser):
         return bool(Follow.objects.filter(follower=user, following=self).exists())
 
 
+# Replies nest at most this deep, so that every thread path fits in a btree index entry
+MAX_THREAD_DEPTH = 128
+# A path segment is at most 17 characters, see threads.py
+THREAD_PATH_MAX_LENGTH = MAX_THREAD_DEPTH * 17
+
+
 class Tweet(models.Model):
     user = models.ForeignKey("core.CustomUser", on_delete=models.CASCADE, related_name="tweets")
-    content = models.TextField(max_length=280)
+    # Both empty for retweets, which show the content and image of their parent
+    content = models.TextField(max_length=280, blank=True)
     image = models.ImageField(upload_to="tweet_images", blank=True, null=True)
-    created_at = models.DateTimeField(default=timezone.now)
-    parent = models.ForeignKey("self", on_delete=models.CASCADE, blank=True, null=True, related_name="retweets")
+    # Resized copies of the image made by images.process_tweet_image, empty until then
+    image_renditions = models.JSONField(default=list, blank=True)
+    # Partition key, never changed after creation. See partitions.py.
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    # Foreign keys to tweets are not constrained in the database, see partitions.py
+    parent = models.ForeignKey(
+        "self", on_delete=models.CASCADE, blank=True, null=True, related_name="retweets", db_constraint=False
+    )
+    # Indexed by core_tweet_reply_to_idx
+    reply_to = models.ForeignKey(
+        "self",
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        related_name="replies",
+        db_index=False,
+        db_constraint=False,
+    )
+    # Set on replies only, by threads.place_reply. See threads.py.
+    thread_path = models.CharField(
+        max_length=THREAD_PATH_MAX_LENGTH, blank=True, default="", db_collation="C", editable=False
+    )
+    # Denormalized counters, kept up to date by the signal handlers in signals.py
+    likes_count = models.PositiveIntegerField(default=0)
+    retweets_count = models.PositiveIntegerField(default=0)
+    replies_count = models.PositiveIntegerField(default=0)
+    # Full-text search document, maintained by the database. See search.py.
+    search_vector = models.GeneratedField(
+        expression=SearchVector("content", config="english"),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    # Viewer state and fragment cache version attached by hydration.hydrate_tweets
+    liked_by_viewer = False
+    retweeted_by_viewer = False
+    card_version = ""
+    # Depth below the tweet whose page shows it, set on replies by threads.annotate_depths
+    thread_depth = 0
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Profile feeds and home timeline rebuilds
+            models.Index(fields=["user", "-created_at"], name="core_tweet_user_created_idx"),
+            # Explore feed and keyset pagination
+            models.Index(fields=["-created_at", "-id"], name="core_tweet_created_id_idx"),
+            # Retweet lookups by parent and retweeter
+            models.Index(fields=["parent", "user"], name="core_tweet_retweet_idx", condition=Q(parent__isnull=False)),
+            # Full-text search, which only returns original tweets
+            GinIndex(fields=["search_vector"], name="core_tweet_search_idx", condition=Q(parent__isnull=True)),
+            # Direct replies, for counting them and cascading deletes
+            models.Index(fields=["reply_to"], name="core_tweet_reply_to_idx", condition=Q(reply_to__isnull=False)),
+            # Descendants of a tweet in thread order, and keyset pagination through them
+            models.Index(fields=["thread_path"], name="core_tweet_thread_idx", condition=Q(reply_to__isnull=False)),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=Q(parent__isnull=True) | (Q(content="") & (Q(image__isnull=True) | Q(image=""))),
+                name="core_tweet_retweet_no_copy",
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"{self.user.username}: {self.content[:50]}"
 
+    def save(self, *args: Any, **kwargs: Any) -> None:
+        if not self._state.adding or self.reply_to_id is None:
+            super().save(*args, **kwargs)
+            return
+        # A reply's thread path ends with its own ID, so threads.place_reply writes it from
+        # post_save. Inserting the reply in the same transaction means it is never seen without.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     def get_likes_count(self) -> int:
         return int(self.likes.count())
 
@@ -57,7 +145,7 @@ class Tweet(models.Model):
     def is_liked_by(self, user: "CustomUser") -> bool:
         if not user.is_authenticated:
             return False
-        return bool(self.likes.filter(user=user).exists())
+        return bool(self.likes.filter(user=user, tweet_created_at=self.created_at).exists())
 
     def get_likes(self) -> "QuerySet[CustomUser]":
         return CustomUser.objects.filter(likes__tweet=self)
@@ -65,21 +153,50 @@ class Tweet(models.Model):
     def get_retweets(self) -> "QuerySet[CustomUser]":
         return CustomUser.objects.filter(retweets__tweet=self)
 
+    @property
+    def image_sources(self) -> dict[str, Any] | None:
+        """The ``srcset`` of each rendition format, and the URL and size of the largest JPEG."""
+        if not self.image or not self.image_renditions:
+            return None
+        storage = self.image.storage
+        sources: dict[str, Any] = {}
+        for image_format in ("webp", "jpeg"):
+            renditions = [rendition for rendition in self.image_renditions if rendition["format"] == image_format]
+            sources[image_format] = ", ".join(
+                f"{storage.url(rendition['name'])} {rendition['width']}w" for rendition in renditions
+            )
+        largest = renditions[-1]
+        sources.update(src=storage.url(largest["name"]), width=largest["width"], height=largest["height"])
+        return sources
+
 
 class Like(models.Model):
     """Model for tweet likes."""
 
     user = models.ForeignKey("core.CustomUser", on_delete=models.CASCADE, related_name="likes")
-    tweet = models.ForeignKey(Tweet, on_delete=models.CASCADE, related_name="likes")
+    tweet = models.ForeignKey(Tweet, on_delete=models.CASCADE, related_name="likes", db_constraint=False)
     created_at = models.DateTimeField(default=timezone.now)
+    # Partition key, the liked tweet's created_at. Set from the tweet on save, bulk inserts
+    # must set it. See partitions.py.
+    tweet_created_at = models.DateTimeField(editable=False)
 
     class Meta:
-        unique_together = ("user", "tweet")
+        # Unique per user and tweet, the tweet's time is part of it for partitioning
+        unique_together = ("user", "tweet", "tweet_created_at")
         ordering = ["-created_at"]
+        indexes = [
+            # Incremental scoring of recent likes by trending.update
+            models.Index(fields=["created_at"], name="core_like_created_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.user.username} likes {self.tweet.content[:50]}"
 
+    def save(self, *args: Any, **kwargs: Any) -> None:
+        if self.tweet_created_at is None:
+            self.tweet_created_at = self.tweet.created_at
+        super().save(*args, **kwargs)
+
 
 class Follow(models.Model):
     follower = models.ForeignKey("core.CustomUser", on_delete=models.CASCADE, related_name="following")
@@ -89,6 +206,48 @@ class Follow(models.Model):
     class Meta:
         unique_together = ("follower", "following")
         ordering = ["-created_at"]
+        indexes = [
+            # Follower lists and timeline fan-out, answered from the index alone
+            models.Index(fields=["following", "follower"], name="core_follow_followers_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.follower.username} follows {self.following.username}"
+
+
+class Notification(models.Model):
+    """An event shown to ``recipient`` on the notifications page, written by notifications.py."""
+
+    class Verb(models.TextChoices):
+        LIKE = "like", "liked your tweet"
+        RETWEET = "retweet", "retweeted your tweet"
+        FOLLOW = "follow", "followed you"
+        REPLY = "reply", "replied to your tweet"
+
+    # Indexed as the leading column of core_notification_feed_idx
+    recipient = models.ForeignKey(
+        "core.CustomUser", on_delete=models.CASCADE, related_name="notifications", db_index=False
+    )
+    actor = models.ForeignKey("core.CustomUser", on_delete=models.CASCADE, related_name="+")
+    verb = models.CharField(max_length=16, choices=Verb.choices)
+    tweet = models.ForeignKey(
+        Tweet, on_delete=models.CASCADE, blank=True, null=True, related_name="+", db_constraint=False
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+    # ID of the queued event it was written from, so writing the event again adds nothing
+    event_id = models.UUIDField(blank=True, null=True, editable=False)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            # Notifications page and keyset pagination
+            models.Index(fields=["recipient", "-created_at", "-id"], name="core_notification_feed_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["event_id"], name="core_notification_event_uniq", condition=Q(event_id__isnull=False)
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.actor.username} {self.get_verb_display()}"
@@ -0,0 +1,194 @@
+"""
+Notifications: coalesced retweet emails and in-app notifications.
+
+Retweets are recorded in Redis instead of each enqueueing an email. The first event for
+a recipient schedules their digest ``NOTIFICATION_DIGEST_WINDOW`` seconds later; every
+event until then joins the same digest. The ``send_notification_digests`` task collects
+the digests that are due, so mail volume scales with recipients rather than retweets.
+A digest's events are removed only once it was sent, so a failed send is retried.
+
+In-app notifications are appended to a Redis queue by ``notify`` and written to the
+database in bulk by the ``write_notifications`` task. Unread counts live in Redis only,
+so the navbar badge can be polled without touching the database.
+"""
+
+import json
+import time
+import uuid
+from collections import defaultdict
+from collections.abc import Iterable
+from datetime import UTC, datetime
+from typing import Any, cast
+
+import redis
+from django.conf import settings
+
+from .models import CustomUser, Notification, Tweet
+from .redis_client import get_redis
+
+# Recipient ID -> timestamp at which their digest is due
+DUE_KEY = "notifications:due"
+# JSON encoded notifications waiting to be written to the database, oldest first
+QUEUE_KEY = "notifications:queue"
+# Held by the write_notifications task while it drains the queue
+WRITE_LOCK_KEY = "notifications:queue:lock"
+# Held by the send_notification_digests task while it sends digests
+DIGEST_LOCK_KEY = "notifications:digests:lock"
+
+
+def retweets_key(recipient_id: int) -> str:
+    """Sorted set of ``<tweet ID>:<retweeter username>`` scored by time of the retweet."""
+    return f"notifications:retweets:{recipient_id}"
+
+
+def record_retweet(recipient_id: int, tweet_id: int, retweeter_username: str) -> None:
+    now = time.time()
+    pipe = get_redis().pipeline()
+    pipe.zadd(retweets_key(recipient_id), {f"{tweet_id}:{retweeter_username}": now})
+    # NX keeps the due time of a digest that is already scheduled
+    pipe.zadd(DUE_KEY, {str(recipient_id): now + settings.NOTIFICATION_DIGEST_WINDOW}, nx=True)
+    pipe.execute()
+
+
+def due_recipients(now: float | None = None) -> list[int]:
+    """The recipients whose digest is due."""
+    now = time.time() if now is None else now
+    return [int(recipient_id) for recipient_id in cast(list[str], get_redis().zrangebyscore(DUE_KEY, "-inf", now))]
+
+
+def pending_retweets(recipient_id: int) -> list[str]:
+    """A recipient's pending retweet events, oldest first, to pass to ``group_retweets`` and ``finish_digest``."""
+    return cast(list[str], get_redis().zrange(retweets_key(recipient_id), 0, -1))
+
+
+def group_retweets(events: Iterable[str]) -> dict[int, list[str]]:
+    """Group retweet events as tweet ID -> retweeters."""
+    retweets: dict[int, list[str]] = defaultdict(list)
+    for event in events:
+        tweet_id, username = event.split(":", 1)
+        retweets[int(tweet_id)].append(username)
+    return dict(retweets)
+
+
+def finish_digest(recipient_id: int, events: list[str]) -> None:
+    """
+    Remove the events of a recipient's digest once it was sent. Retweets recorded since it
+    was read are kept, and their digest scheduled again.
+    """
+    key = retweets_key(recipient_id)
+
+    def remove(pipe: redis.client.Pipeline) -> None:
+        # Watched, so a retweet recorded in between retries this
+        remaining = set(cast(list[str], pipe.zrange(key, 0, -1))) - set(events)
+        pipe.multi()
+        if events:
+            pipe.zrem(key, *events)
+        if remaining:
+            pipe.zadd(DUE_KEY, {str(recipient_id): time.time() + settings.NOTIFICATION_DIGEST_WINDOW})
+        else:
+            pipe.zrem(DUE_KEY, str(recipient_id))
+
+    get_redis().transaction(remove, key)
+
+
+def unread_key(user_id: int) -> str:
+    return f"notifications:unread:{user_id}"
+
+
+def notify(recipient_id: int, actor_id: int, verb: Notification.Verb, tweet_id: int | None = None) -> None:
+    """Queue a notification and count it as unread. Users are not notified of their own actions."""
+    if recipient_id == actor_id:
+        return
+    event = {
+        "event_id": uuid.uuid4().hex,
+        "recipient_id": recipient_id,
+        "actor_id": actor_id,
+        "verb": verb,
+        "tweet_id": tweet_id,
+        "at": time.time(),
+    }
+    pipe = get_redis().pipeline()
+    pipe.rpush(QUEUE_KEY, json.dumps(event))
+    pipe.incr(unread_key(recipient_id))
+    pipe.execute()
+
+
+def unread_count(user_id: int) -> int:
+    return int(cast(str | None, get_redis().get(unread_key(user_id))) or 0)
+
+
+def mark_all_read(user_id: int) -> None:
+    get_redis().delete(unread_key(user_id))
+
+
+def write_queued(batch_size: int = 1000) -> int:
+    """
+    Write queued notifications to the database in batches and return how many were written.
+
+    Events are removed from the queue only once their batch is saved, so a crash writes
+    them again rather than losing them. Events already written are skipped by their
+    ``event_id``, so writing a batch again adds no duplicates. Callers must not run
+    concurrently.
+    """
+    client = get_redis()
+    written = 0
+    while events := cast(list[str], client.lrange(QUEUE_KEY, 0, batch_size - 1)):
+        batch = build_notifications(json.loads(event) for event in events)
+        written += len(Notification.objects.bulk_create(batch, ignore_conflicts=True))
+        client.ltrim(QUEUE_KEY, len(events), -1)
+    return written
+
+
+def build_notifications(events: Iterable[dict[str, Any]]) -> list[Notification]:
+    """Turn queued events into notifications, skipping those whose users or tweet were deleted since."""
+    events = list(events)
+    user_ids = {event["recipient_id"] for event in events} | {event["actor_id"] for event in events}
+    existing_users = set(CustomUser.objects.filter(id__in=user_ids).values_list("id", flat=True))
+    tweet_ids = {event["tweet_id"] for event in events if event["tweet_id"]}
+    existing_tweets = set(Tweet.objects.filter(id__in=tweet_ids).values_list("id", flat=True))
+    return [
+        Notification(
+            recipient_id=event["recipient_id"],
+            actor_id=event["actor_id"],
+            verb=event["verb"],
+            tweet_id=event["tweet_id"],
+            created_at=datetime.fromtimestamp(event["at"], tz=UTC),
+            # Missing from events queued before it was added
+            event_id=event.get("event_id"),
+        )
+        for event in events
+        if {event["recipient_id"], event["actor_id"]} <= existing_users
+        and (event["tweet_id"] is None or event["tweet_id"] in existing_tweets)
+    ]
+
+
+class NotificationGroup:
+    """Notifications of one kind about the same tweet, shown as a single entry."""
+
+    def __init__(self, notification: Notification) -> None:
+        self.verb = notification.get_verb_display()
+        self.tweet = notification.tweet
+        self.created_at = notification.created_at
+        self.actors: list[CustomUser] = []
+
+    @property
+    def others(self) -> int:
+        return len(self.actors) - 1
+
+
+def collapse(notifications: Iterable[Notification]) -> list[NotificationGroup]:
+    """
+    Collapse a page of notifications, newest first, into one group per verb and tweet.
+
+    Repeated events from the same actor, such as liking a tweet again after unliking it,
+    are shown once.
+    """
+    groups: dict[tuple[str, int | None], NotificationGroup] = {}
+    for notification in notifications:
+        key = (notification.verb, notification.tweet_id)
+        if key not in groups:
+            groups[key] = NotificationGroup(notification)
+        group = groups[key]
+        if notification.actor not in group.actors:
+            group.actors.append(notification.actor)
+    return list(groups.values())
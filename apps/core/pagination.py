@@ -0,0 +1,140 @@
+"""
+Keyset (cursor) pagination.
+
+Pages are selected with a ``WHERE`` on the ordering keys of the last row of the previous
+page instead of an ``OFFSET``, so deep pages cost the same as the first one and rows
+inserted while a user is scrolling never cause duplicates or skips. The ordering must be
+unique, which is why it always ends with the primary key.
+"""
+
+import base64
+import binascii
+import json
+from collections.abc import Iterator, Sequence
+from datetime import datetime
+from typing import Any
+
+from django.core.exceptions import ValidationError
+from django.db.models import Field, Model, Q, QuerySet
+from django.http import Http404
+from django.views.generic.list import MultipleObjectMixin
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    payload = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> list[Any]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise Http404(f"Invalid cursor: {e}") from e
+    if not isinstance(values, list):
+        raise Http404("Invalid cursor")
+    return values
+
+
+class CursorPage:
+    def __init__(self, object_list: list[Any], next_cursor: str | None) -> None:
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self.object_list)
+
+    def __len__(self) -> int:
+        return len(self.object_list)
+
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    def has_other_pages(self) -> bool:
+        return self.has_next()
+
+
+class CursorPaginator:
+    def __init__(self, queryset: QuerySet, per_page: int, ordering: Sequence[str] = ("-created_at", "-id")) -> None:
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = ordering
+
+    def decode(self, cursor: str) -> list[Any]:
+        """The ordering key values of ``cursor``, converted to the types of their fields."""
+        values = decode_cursor(cursor)
+        if len(values) != len(self.ordering):
+            raise Http404("Invalid cursor")
+        return [self._to_python(field.lstrip("-"), value) for field, value in zip(self.ordering, values, strict=True)]
+
+    def _after(self, values: list[Any]) -> Q:
+        """Build the filter selecting rows that come after the given ordering key values."""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, values, strict=True):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            condition |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+        # Redundant bound on the leading key so the database can seek the index to the cursor
+        # instead of filtering every row before it.
+        first = self.ordering[0]
+        bound = Q(**{f"{first.lstrip('-')}__{'lte' if first.startswith('-') else 'gte'}": values[0]})
+        return bound & condition
+
+    def _to_python(self, name: str, value: Any) -> Any:
+        """Convert a cursor value to the type of the ordering key ``name``, cursors come from the client."""
+        annotation = self.queryset.query.annotations.get(name)
+        field: Field = annotation.output_field if annotation is not None else self.queryset.model._meta.get_field(name)
+        try:
+            value = field.to_python(value)
+        except (ValidationError, TypeError, ValueError) as e:
+            raise Http404(f"Invalid cursor: {e}") from e
+        if value is None:
+            raise Http404("Invalid cursor")
+        return value
+
+    def get_page_queryset(self, cursor: str | None) -> QuerySet:
+        """Return the query loading the page after ``cursor``, plus one row to detect a next page."""
+        queryset = self.queryset.order_by(*self.ordering)
+        if cursor:
+            queryset = queryset.filter(self._after(self.decode(cursor)))
+        return queryset[: self.per_page + 1]
+
+    def page(self, cursor: str | None) -> CursorPage:
+        return self.make_page(list(self.get_page_queryset(cursor)))
+
+    async def apage(self, cursor: str | None) -> CursorPage:
+        return self.make_page([row async for row in self.get_page_queryset(cursor)])
+
+    def make_page(self, rows: list[Any]) -> CursorPage:
+        """Build the page from the rows loaded by ``get_page_queryset``."""
+        object_list = rows[: self.per_page]
+        next_cursor = None
+        if len(rows) > self.per_page:
+            last = object_list[-1]
+            next_cursor = encode_cursor([self._value(last, field.lstrip("-")) for field in self.ordering])
+        return CursorPage(object_list, next_cursor)
+
+    @staticmethod
+    def _value(obj: Model | dict[str, Any], name: str) -> Any:
+        return obj[name] if isinstance(obj, dict) else getattr(obj, name)
+
+
+class CursorPaginationMixin(MultipleObjectMixin):
+    """
+    Replace ``ListView``'s page-number pagination with keyset pagination.
+
+    The next page is requested with the opaque ``?cursor=`` token exposed as
+    ``page_obj.next_cursor``. No ``COUNT(*)`` is issued, so ``paginator.count`` is not available.
+    """
+
+    cursor_kwarg = "cursor"
+    cursor_ordering: Sequence[str] = ("-created_at", "-id")
+
+    def get_cursor_ordering(self) -> Sequence[str]:
+        return self.cursor_ordering
+
+    def paginate_queryset(self, queryset: QuerySet, page_size: int) -> tuple[Any, Any, Any, bool]:
+        paginator = CursorPaginator(queryset, page_size, self.get_cursor_ordering())
+        page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        return (paginator, page, page.object_list, page.has_other_pages())
@@ -0,0 +1,97 @@
+"""
+Monthly range partitions of the tweet and like tables.
+
+``core_tweet`` is partitioned on ``created_at``. ``core_like`` is partitioned on
+``tweet_created_at``, the creation time of the liked tweet, because every unique
+constraint of a partitioned table must include its partition key: a like is unique per
+user and tweet, and so per user, tweet and time of the tweet. The tables as they were
+before partitioning became their ``_archive`` partitions, which hold the rows up to the
+end of the month they were partitioned in. From then on each month has its own
+partition, so the indexes the feeds read only cover recent rows and each month is
+vacuumed on its own.
+
+The ``ensure_partitions`` task, run daily from Celery beat, creates the partitions of the
+current month and the next ``PARTITION_MONTHS_AHEAD``. Inserting a row for a month that has
+no partition fails.
+
+Postgres only skips partitions when a query bounds the partition key, so lookups of tweets
+and likes by ID also filter on the time of the tweets, see
+``timeline.home_timeline_queryset`` and ``hydration.liked_tweet_ids``. Ordered scans of the
+newest tweets, as in the Explore feed, read the partitions newest first and stop once the
+page is full.
+
+Postgres cannot enforce foreign keys to a partitioned table on a column that excludes the
+partition key, so foreign keys to tweets are not constrained in the database and deletes
+cascade to them through Django only.
+"""
+
+import re
+from datetime import UTC, datetime, timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+
+# Partitioned table -> partition key
+PARTITIONED_TABLES = {"core_tweet": "created_at", "core_like": "tweet_created_at"}
+
+
+def month_start(moment: datetime) -> datetime:
+    return moment.astimezone(UTC).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(month: datetime) -> datetime:
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def partition_name(table: str, month: datetime) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def archive_end(bound: str) -> datetime:
+    """Parse the end of an archive partition from its bound, as ``FOR VALUES FROM (MINVALUE) TO ('...')``."""
+    match = re.search(r"TO \('([^']+)'\)", bound)
+    if match is None:
+        raise ValueError(f"Unexpected archive partition bound: {bound}")
+    return datetime.fromisoformat(match[1])
+
+
+def ensure_partitions(now: datetime | None = None, using: str = DEFAULT_DB_ALIAS) -> list[str]:
+    """
+    Create the missing partitions of the current month and the next ``PARTITION_MONTHS_AHEAD``,
+    except for months the archive partition covers, and return their names.
+    """
+    months = [month_start(now or timezone.now())]
+    for _ in range(settings.PARTITION_MONTHS_AHEAD):
+        months.append(next_month(months[-1]))
+
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    created = []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT parent.relname, child.relname, pg_get_expr(child.relpartbound, child.oid) FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "WHERE parent.relname = ANY(%s)",
+            [list(PARTITIONED_TABLES)],
+        )
+        existing = set()
+        archive_ends = {}
+        for table, name, bound in cursor.fetchall():
+            existing.add(name)
+            if name == f"{table}_archive":
+                archive_ends[table] = archive_end(bound)
+        for table in PARTITIONED_TABLES:
+            for month in months:
+                name = partition_name(table, month)
+                # Months up to the end of the archive are in the archive
+                if name in existing or (table in archive_ends and month < archive_ends[table]):
+                    continue
+                # Bounds are ISO timestamps, which need no escaping
+                cursor.execute(
+                    f"CREATE TABLE IF NOT EXISTS {quote(name)} PARTITION OF {quote(table)} "
+                    f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+                )
+                created.append(name)
+    return created
@@ -0,0 +1,219 @@
+"""
+"Who to follow" recommendations for the users page.
+
+The ``update_recommendations`` task runs from Celery beat, in its worker process: Celery's
+prefork workers are daemonic and cannot start processes of their own. The
+``update_recommendations`` management command scores users in several processes instead,
+for graphs too large to score in one. Either loads the whole follow graph into compressed
+sparse rows: for each user, by position in ``user_ids``, the positions of the users they
+follow are ``following[following_offsets[i]:following_offsets[i + 1]]``, and likewise for
+their followers. These are flat ``array`` buffers of 8 byte integers rather than model
+instances, so the graph of millions of follows fits in a few tens of megabytes and is
+cheap to hand to worker processes, which score users in chunks.
+
+Candidates a user does not follow yet are scored by
+
+- friends of friends: each account followed by an account the user follows, and
+- co-follows: each account followed by other followers of the accounts the user follows,
+  sampling at most ``CO_FOLLOWERS_SAMPLE`` of those followers per account.
+
+The best ``RECOMMENDATIONS_SIZE`` of each user are stored in a Redis sorted set, next to
+the most followed accounts that users without recommendations are shown instead.
+"""
+
+import heapq
+from array import array
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from typing import cast
+
+from django.conf import settings
+from django.contrib.postgres.fields import ArrayField
+from django.db.models import BigIntegerField, F, Func, IntegerField, QuerySet, Value
+
+from .models import CustomUser, Follow
+from .redis_client import get_redis
+
+POPULAR_KEY = "recommendations:popular"
+# Held by the update_recommendations task while it runs
+LOCK_KEY = "recommendations:lock"
+# Recommendations of users the task stops updating, such as deleted ones, expire
+KEY_TTL = 60 * 60 * 24 * 3
+
+# Whole numbers, so candidates are scored by counting each path to them this many times
+FRIEND_OF_FRIEND_WEIGHT = 4
+CO_FOLLOW_WEIGHT = 1
+# Followers of each followed account whose follows are counted as co-follows
+CO_FOLLOWERS_SAMPLE = 20
+# Users scored per task sent to a worker process
+CHUNK_SIZE = 1000
+# Rows read from the database at a time while loading the graph
+LOAD_CHUNK_SIZE = 10000
+
+
+def recommendations_key(user_id: int) -> str:
+    return f"recommendations:{user_id}"
+
+
+class FollowGraph:
+    """The follow graph as compressed sparse rows, indexed by position in ``user_ids``."""
+
+    def __init__(
+        self,
+        user_ids: array,
+        following_offsets: array,
+        following: array,
+        follower_offsets: array,
+        followers: array,
+    ) -> None:
+        self.user_ids = user_ids
+        self.following_offsets = following_offsets
+        self.following = following
+        self.follower_offsets = follower_offsets
+        self.followers = followers
+
+    def following_of(self, index: int) -> array:
+        return self.following[self.following_offsets[index] : self.following_offsets[index + 1]]
+
+    def followers_of(self, index: int) -> array:
+        return self.followers[self.follower_offsets[index] : self.follower_offsets[index + 1]]
+
+    def followers_count(self, index: int) -> int:
+        return int(self.follower_offsets[index + 1] - self.follower_offsets[index])
+
+
+def sparse_rows(edges: Iterable[tuple[int, int]], positions: dict[int, int]) -> tuple[array, array]:
+    """Offsets and targets of ``(source, target)`` user ID pairs, which must be ordered by source."""
+    offsets = array("q", bytes(8 * (len(positions) + 1)))
+    targets = array("q")
+    for source, target in edges:
+        offsets[positions[source] + 1] += 1
+        targets.append(positions[target])
+    for i in range(len(positions)):
+        offsets[i + 1] += offsets[i]
+    return offsets, targets
+
+
+def load_graph() -> FollowGraph:
+    """Read the follow graph, both ways round, through the indexes on ``Follow``."""
+    user_ids = array("q", CustomUser.objects.order_by("id").values_list("id", flat=True).iterator(LOAD_CHUNK_SIZE))
+    positions = {user_id: i for i, user_id in enumerate(user_ids)}
+    follows = Follow.objects.order_by()
+    following_offsets, following = sparse_rows(
+        follows.order_by("follower_id", "following_id")
+        .values_list("follower_id", "following_id")
+        .iterator(LOAD_CHUNK_SIZE),
+        positions,
+    )
+    follower_offsets, followers = sparse_rows(
+        follows.order_by("following_id", "follower_id")
+        .values_list("following_id", "follower_id")
+        .iterator(LOAD_CHUNK_SIZE),
+        positions,
+    )
+    return FollowGraph(user_ids, following_offsets, following, follower_offsets, followers)
+
+
+def sample(items: array, size: int) -> array:
+    """Up to ``size`` items spread evenly through ``items``."""
+    return items if len(items) <= size else items[:: len(items) // size][:size]
+
+
+def score_user(graph: FollowGraph, index: int) -> list[tuple[int, int]]:
+    """The best recommendations for the user at ``index``, as ``(user ID, score)``, best first."""
+    following = graph.following_of(index)
+    # Counter.update and most_common loop over the arrays and scores in C
+    scores: Counter[int] = Counter()
+    for followed in following:
+        friends = graph.following_of(followed)
+        for _ in range(FRIEND_OF_FRIEND_WEIGHT):
+            scores.update(friends)
+        for co_follower in sample(graph.followers_of(followed), CO_FOLLOWERS_SAMPLE):
+            if co_follower != index:
+                for _ in range(CO_FOLLOW_WEIGHT):
+                    scores.update(graph.following_of(co_follower))
+    for candidate in [*following, index]:
+        del scores[candidate]
+    return [
+        (graph.user_ids[candidate], score) for candidate, score in scores.most_common(settings.RECOMMENDATIONS_SIZE)
+    ]
+
+
+# Set in each worker process by its initializer, so the graph is sent to a worker once
+_graph: FollowGraph | None = None
+
+
+def _set_graph(graph: FollowGraph) -> None:
+    global _graph
+    _graph = graph
+
+
+def _score_chunk(indexes: range) -> list[tuple[int, list[tuple[int, int]]]]:
+    graph = cast(FollowGraph, _graph)
+    return [(graph.user_ids[index], score_user(graph, index)) for index in indexes]
+
+
+def score_users(graph: FollowGraph, workers: int) -> Iterator[list[tuple[int, list[tuple[int, int]]]]]:
+    """Score every user, yielding ``(user ID, recommendations)`` a chunk of users at a time."""
+    chunks = [
+        range(start, min(start + CHUNK_SIZE, len(graph.user_ids)))
+        for start in range(0, len(graph.user_ids), CHUNK_SIZE)
+    ]
+    if workers <= 1:
+        _set_graph(graph)
+        yield from map(_score_chunk, chunks)
+        return
+    with ProcessPoolExecutor(workers, initializer=_set_graph, initargs=(graph,)) as executor:
+        yield from executor.map(_score_chunk, chunks)
+
+
+def update(workers: int = 1) -> int:
+    """Recompute the recommendations of every user and return the number of users scored."""
+    graph = load_graph()
+    client = get_redis()
+    popular = heapq.nlargest(settings.RECOMMENDATIONS_SIZE, range(len(graph.user_ids)), key=graph.followers_count)
+    pipe = client.pipeline()
+    pipe.delete(POPULAR_KEY)
+    if counts := {str(graph.user_ids[i]): graph.followers_count(i) for i in popular if graph.followers_count(i)}:
+        pipe.zadd(POPULAR_KEY, counts)
+    pipe.execute()
+
+    scored = 0
+    for chunk in score_users(graph, workers):
+        pipe = client.pipeline(transaction=False)
+        for user_id, recommendations in chunk:
+            key = recommendations_key(user_id)
+            pipe.delete(key)
+            if recommendations:
+                pipe.zadd(key, {str(candidate): score for candidate, score in recommendations})
+                pipe.expire(key, KEY_TTL)
+        pipe.execute()
+        scored += len(chunk)
+    return scored
+
+
+def recommended_ids(user_id: int) -> list[int]:
+    """IDs of the users recommended to a user, best first, or of the most followed users if there are none."""
+    client = get_redis()
+    ids = cast(list[str], client.zrevrange(recommendations_key(user_id), 0, -1))
+    if not ids:
+        ids = cast(list[str], client.zrevrange(POPULAR_KEY, 0, -1))
+    return [int(recommended_id) for recommended_id in ids]
+
+
+def recommended_users(user: CustomUser) -> QuerySet[CustomUser]:
+    """The users recommended to a user that they do not follow yet, best first."""
+    followed = Follow.objects.filter(follower=user).values("following_id")
+    users = CustomUser.objects.exclude(id=user.id).exclude(id__in=followed)
+    if not (ids := recommended_ids(user.id)):
+        # Until the first update_recommendations run
+        most_followed = users.order_by("-followers_count", "id").values_list("id", flat=True)
+        ids = list(most_followed[: settings.RECOMMENDATIONS_SIZE])
+    position = Func(
+        Value(ids, output_field=ArrayField(BigIntegerField())),
+        F("id"),
+        function="array_position",
+        output_field=IntegerField(),
+    )
+    return users.filter(id__in=ids).annotate(recommendation_rank=position).order_by("recommendation_rank")
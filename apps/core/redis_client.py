@@ -0,0 +1,54 @@
+import uuid
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import cast
+
+import redis
+import redis.asyncio as aioredis
+from django.conf import settings
+
+_client: redis.Redis | None = None
+
+
+def get_redis() -> redis.Redis:
+    """
+    Return the shared Redis client used for timelines and other hot data.
+
+    The client is created lazily so importing this module never opens a connection.
+    """
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _client
+
+
+def get_async_redis() -> aioredis.Redis:
+    """Return a new asyncio Redis client, these cannot be shared between event loops."""
+    return cast(aioredis.Redis, aioredis.Redis.from_url(settings.REDIS_URL, decode_responses=True))
+
+
+@contextmanager
+def task_lock(key: str, timeout: int) -> Iterator[bool]:
+    """
+    Hold the lock ``key`` for at most ``timeout`` seconds while the block runs, and yield
+    whether it was acquired.
+
+    The lock holds a token of this run and is only released while it still does, so a run
+    that outlived the timeout cannot release the lock of the run that took it over.
+    """
+    client = get_redis()
+    token = uuid.uuid4().hex
+    if not client.set(key, token, nx=True, ex=timeout):
+        yield False
+        return
+
+    def release(pipe: redis.client.Pipeline) -> None:
+        if pipe.get(key) == token:
+            pipe.multi()
+            pipe.delete(key)
+
+    try:
+        yield True
+    finally:
+        # A WATCH transaction rather than a Lua script, which fakeredis cannot run in tests
+        client.transaction(release, key)
@@ -0,0 +1,145 @@
+"""
+Read replica routing.
+
+Views with ``ReplicaReadsMixin`` read from a random database of ``REPLICA_DATABASES``;
+every other query, and every write, goes to ``default``. Replicas lag behind the primary,
+so users must not read from them right after acting:
+
+- once a request has written, its remaining reads go to the primary too;
+- ``replica_middleware`` then sets a cookie that sends the user's reads to the primary for
+  ``REPLICA_STICKINESS`` seconds, long enough for the replicas to catch up.
+
+The state of the current request is kept in a context variable, set by the middleware and
+shared with the worker threads that run sync code for async views.
+"""
+
+import random
+from collections.abc import Awaitable, Callable
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, cast
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Model
+from django.http import HttpRequest, HttpResponseBase
+from django.template.response import SimpleTemplateResponse
+from django.utils.decorators import sync_and_async_middleware
+from django.views import View
+
+STICKY_COOKIE = "read_primary"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+@dataclass
+class RequestState:
+    # Reads from the primary because the user wrote recently
+    sticky: bool = False
+    # Inside a view that may read from the replicas
+    read_from_replica: bool = False
+    # The request wrote to the primary
+    wrote: bool = False
+
+
+_state: ContextVar[RequestState | None] = ContextVar("replica_request_state", default=None)
+
+
+class ReplicaRouter:
+    """Send the reads of ``ReplicaReadsMixin`` views to the replicas and everything else to the primary."""
+
+    def db_for_read(self, model: type[Model], **hints: Any) -> str:
+        state = _state.get()
+        if state and state.read_from_replica and not state.wrote and settings.REPLICA_DATABASES:
+            return random.choice(settings.REPLICA_DATABASES)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model: type[Model], **hints: Any) -> str:
+        if state := _state.get():
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1: Model, obj2: Model, **hints: Any) -> bool:
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db: str, app_label: str, model_name: str | None = None, **hints: Any) -> bool:
+        # Replicas get their schema from the primary
+        return db not in settings.REPLICA_DATABASES
+
+
+def begin_request(request: HttpRequest) -> RequestState:
+    state = RequestState(sticky=STICKY_COOKIE in request.COOKIES)
+    _state.set(state)
+    return state
+
+
+def finish_request(state: RequestState, response: HttpResponseBase) -> HttpResponseBase:
+    if state.wrote and settings.REPLICA_DATABASES:
+        response.set_cookie(STICKY_COOKIE, "1", max_age=settings.REPLICA_STICKINESS, httponly=True, samesite="Lax")
+    return response
+
+
+@sync_and_async_middleware
+def replica_middleware(get_response: Callable) -> Callable:
+    """Track the reads and writes of each request, and keep users who wrote on the primary."""
+    if iscoroutinefunction(get_response):
+
+        async def async_middleware(request: HttpRequest) -> HttpResponseBase:
+            state = begin_request(request)
+            return finish_request(state, await get_response(request))
+
+        return async_middleware
+
+    def middleware(request: HttpRequest) -> HttpResponseBase:
+        state = begin_request(request)
+        return finish_request(state, get_response(request))
+
+    return middleware
+
+
+class ReplicaReadsMixin(View):
+    """
+    Read from the replicas while handling safe requests of users who have not written recently.
+
+    Template responses are rendered before leaving the view, so that the queries of the
+    template read from the replicas too.
+    """
+
+    def start_replica_reads(self, request: HttpRequest) -> RequestState | None:
+        state = _state.get()
+        if state is None or state.sticky or request.method not in SAFE_METHODS:
+            return None
+        state.read_from_replica = True
+        return state
+
+    def dispatch(self, request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponseBase:
+        state = self.start_replica_reads(request)
+        if state is None:
+            return super().dispatch(request, *args, **kwargs)
+        try:
+            response = super().dispatch(request, *args, **kwargs)
+            if isinstance(response, SimpleTemplateResponse):
+                response.render()
+            return response
+        finally:
+            state.read_from_replica = False
+
+
+class AsyncReplicaReadsMixin(ReplicaReadsMixin):
+    """``ReplicaReadsMixin`` for views with async handlers."""
+
+    async def dispatch(  # type: ignore[override]
+        self, request: HttpRequest, *args: Any, **kwargs: Any
+    ) -> HttpResponseBase:
+        state = self.start_replica_reads(request)
+        handler = cast(Awaitable[HttpResponseBase], super(ReplicaReadsMixin, self).dispatch(request, *args, **kwargs))
+        if state is None:
+            return await handler
+        try:
+            response = await handler
+            if isinstance(response, SimpleTemplateResponse):
+                await sync_to_async(response.render)()
+            return response
+        finally:
+            state.read_from_replica = False
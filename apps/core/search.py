@@ -0,0 +1,54 @@
+"""
+Full-text search over tweets and users.
+
+Both models carry a ``search_vector`` column generated by the database from the searched
+text and indexed with GIN, so a search is an index lookup on ``@@`` instead of an
+``ILIKE '%term%'`` scan. The text search configurations used here must match the ones
+the generated columns are built with in models.py.
+
+Ranks are cast to double precision: ``ts_rank`` returns a ``real``, which never equals
+the double a cursor sends back, so keyset pagination would skip rows tied on rank.
+"""
+
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, FloatField, QuerySet
+from django.db.models.functions import Cast
+
+from .models import CustomUser, Tweet
+
+TWEET_SEARCH_CONFIG = "english"
+USER_SEARCH_CONFIG = "simple"
+WORD_RE = re.compile(r"[^\W_]+")
+
+
+def tweet_search_query(text: str) -> SearchQuery:
+    """Parse search box input, supporting quoted phrases, ``or`` and ``-excluded`` words."""
+    return SearchQuery(text, config=TWEET_SEARCH_CONFIG, search_type="websearch")
+
+
+def user_search_query(text: str) -> SearchQuery:
+    """Match users whose username or bio has words starting with each word of ``text``."""
+    prefixes = " & ".join(f"{word}:*" for word in WORD_RE.findall(text))
+    return SearchQuery(prefixes, config=USER_SEARCH_CONFIG, search_type="raw")
+
+
+def search_rank(query: SearchQuery) -> Cast:
+    return Cast(SearchRank(F("search_vector"), query), FloatField())
+
+
+def search_tweets(text: str) -> QuerySet[Tweet]:
+    """Original tweets matching ``text``, most relevant first, with the relevance as ``rank``."""
+    query = tweet_search_query(text)
+    tweets = Tweet.objects.filter(parent=None, search_vector=query).annotate(rank=search_rank(query))
+    tweets = tweets.order_by(F("rank").desc(), "-id")
+    return tweets if WORD_RE.search(text) else tweets.none()
+
+
+def search_users(text: str) -> QuerySet[CustomUser]:
+    """Users matching ``text`` as a prefix, most relevant first, with the relevance as ``rank``."""
+    query = user_search_query(text)
+    users = CustomUser.objects.filter(search_vector=query).annotate(rank=search_rank(query))
+    users = users.order_by(F("rank").desc(), "username")
+    return users if WORD_RE.search(text) else users.none()
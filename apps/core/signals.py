@@ -0,0 +1,124 @@
+"""
+Maintain the denormalized counters on ``Tweet`` and ``CustomUser``.
+
+Counters are adjusted with atomic ``F()`` updates from model signals rather than in the
+views, so that rows removed by cascading deletes are accounted for as well. Bulk
+operations bypass signals; the ``reconcile_counters`` command repairs any drift.
+
+The same handlers invalidate the caches holding what changed: the cards of tweets whose
+content changes, the cached copies of users, and the cached pages of the user who made
+the change. Counters are rendered outside the cached cards, so changing them leaves the
+cards cached. Counter changes are also published to open live update streams,
+new replies are placed in their thread and deleted tweets are dropped from the trending
+scores.
+"""
+
+from datetime import datetime
+from typing import Any, cast
+
+from django.db.models import F, Model
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import threads, trending
+from .backends import invalidate_cached_user
+from .caching import invalidate_user_views
+from .hydration import invalidate_tweet_card
+from .live import publish_counter
+from .models import CustomUser, Follow, Like, Tweet
+
+
+def adjust_counter(
+    model: type[Model], pk: int | None, field: str, delta: int, created_at: datetime | None = None
+) -> None:
+    """
+    Add ``delta`` to a counter. Tweets are partitioned by ``created_at``, so passing their
+    creation time lets Postgres only search their partition for them.
+    """
+    if pk is None:
+        return
+    rows = model._default_manager.filter(pk=pk)
+    if created_at is not None:
+        rows = rows.filter(created_at=created_at)
+    rows.update(**{field: Greatest(F(field) + delta, 0)})
+    if model is CustomUser:
+        invalidate_cached_user(pk)
+
+
+def loaded_created_at(tweet: Tweet, relation: str) -> datetime | None:
+    """The creation time of the tweet ``tweet`` retweets or replies to, if it is already loaded."""
+    if not getattr(Tweet, relation).is_cached(tweet):
+        return None
+    related = getattr(tweet, relation)
+    if related is None or "created_at" in related.get_deferred_fields():
+        return None
+    return cast(datetime, related.created_at)
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def user_changed(sender: type[CustomUser], instance: CustomUser, **kwargs: Any) -> None:
+    invalidate_cached_user(instance.pk)
+    invalidate_user_views(instance.pk)
+
+
+@receiver(post_save, sender=Like)
+def like_created(sender: type[Like], instance: Like, created: bool, **kwargs: Any) -> None:
+    if created:
+        adjust_counter(Tweet, instance.tweet_id, "likes_count", 1, instance.tweet_created_at)
+        publish_counter(instance.tweet_id, "likes_count", 1)
+        invalidate_user_views(instance.user_id)
+
+
+@receiver(post_delete, sender=Like)
+def like_deleted(sender: type[Like], instance: Like, **kwargs: Any) -> None:
+    adjust_counter(Tweet, instance.tweet_id, "likes_count", -1, instance.tweet_created_at)
+    publish_counter(instance.tweet_id, "likes_count", -1)
+    invalidate_user_views(instance.user_id)
+
+
+@receiver(post_save, sender=Tweet)
+def tweet_saved(sender: type[Tweet], instance: Tweet, created: bool, **kwargs: Any) -> None:
+    if created:
+        adjust_counter(CustomUser, instance.user_id, "tweets_count", 1)
+        adjust_counter(Tweet, instance.parent_id, "retweets_count", 1, loaded_created_at(instance, "parent"))
+        publish_counter(instance.parent_id, "retweets_count", 1)
+        if instance.reply_to_id is not None:
+            threads.place_reply(instance)
+            adjust_counter(Tweet, instance.reply_to_id, "replies_count", 1, loaded_created_at(instance, "reply_to"))
+            publish_counter(instance.reply_to_id, "replies_count", 1)
+    else:
+        invalidate_tweet_card(instance.id)
+        if instance.parent_id is None:
+            # Retweet cards show the content and image of their parent
+            for retweet_id in Tweet.objects.filter(parent_id=instance.id).values_list("id", flat=True):
+                invalidate_tweet_card(retweet_id)
+    invalidate_user_views(instance.user_id)
+
+
+@receiver(post_delete, sender=Tweet)
+def tweet_deleted(sender: type[Tweet], instance: Tweet, **kwargs: Any) -> None:
+    if instance.parent_id is None:
+        trending.forget(instance.id)
+    adjust_counter(CustomUser, instance.user_id, "tweets_count", -1)
+    adjust_counter(Tweet, instance.parent_id, "retweets_count", -1, loaded_created_at(instance, "parent"))
+    publish_counter(instance.parent_id, "retweets_count", -1)
+    adjust_counter(Tweet, instance.reply_to_id, "replies_count", -1, loaded_created_at(instance, "reply_to"))
+    publish_counter(instance.reply_to_id, "replies_count", -1)
+    invalidate_user_views(instance.user_id)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender: type[Follow], instance: Follow, created: bool, **kwargs: Any) -> None:
+    if created:
+        adjust_counter(CustomUser, instance.follower_id, "following_count", 1)
+        adjust_counter(CustomUser, instance.following_id, "followers_count", 1)
+        invalidate_user_views(instance.follower_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender: type[Follow], instance: Follow, **kwargs: Any) -> None:
+    adjust_counter(CustomUser, instance.follower_id, "following_count", -1)
+    adjust_counter(CustomUser, instance.following_id, "followers_count", -1)
+    invalidate_user_views(instance.follower_id)
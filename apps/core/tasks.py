@@ -1,32 +1,242 @@
+from typing import Any, cast
+
 from celery import shared_task
 from django.conf import settings
-from django.core.mail import send_mail
+from django.core.mail import EmailMultiAlternatives, get_connection
 from django.template.loader import render_to_string
 
 
 @shared_task
 def send_retweet_notification(tweet_id: int, retweeter_username: str) -> None:
     """
-    Send an email notification to a user when their tweet is retweeted.
+    Add a retweet to the author's next notification digest.
+
+    Kept for tasks enqueued before retweets were recorded by ``RetweetView`` directly.
+    """
+    from apps.core import notifications
+    from apps.core.models import Tweet
+
+    author_id = Tweet.objects.filter(id=tweet_id).values_list("user_id", flat=True).first()
+    if author_id is not None:
+        notifications.record_retweet(author_id, tweet_id, retweeter_username)
+
+
+@shared_task
+def send_notification_digests() -> None:
+    """
+    Email every recipient whose digest is due a summary of the retweets of their tweets.
+
+    Runs periodically from Celery beat. Each digest is rendered once and all of them are
+    sent over a single SMTP connection. A digest's events are removed once it was sent, so
+    those of a digest that failed to send are sent by the next run.
     """
-    from apps.core.models import Tweet  # Import here to avoid circular imports
+    from apps.core import notifications
+    from apps.core.redis_client import task_lock
 
-    tweet = Tweet.objects.select_related("user").get(id=tweet_id)
-    tweet_author = tweet.user
+    # Skip this run while a previous one is still sending, which would send the same digests
+    with task_lock(notifications.DIGEST_LOCK_KEY, timeout=300) as acquired:
+        if acquired:
+            _send_due_digests()
 
-    subject = f"{retweeter_username} retweeted your tweet!"
-    html_message = render_to_string(
-        "core/emails/retweet_notification.html",
-        {
-            "tweet": tweet,
-            "retweeter_username": retweeter_username,
-        },
+
+def _send_due_digests() -> None:
+    """Send the digests that are due, see ``send_notification_digests``."""
+    from apps.core import notifications
+    from apps.core.models import CustomUser, Tweet
+
+    events = {
+        recipient_id: notifications.pending_retweets(recipient_id) for recipient_id in notifications.due_recipients()
+    }
+    if not events:
+        return
+    digests = {recipient_id: notifications.group_retweets(pending) for recipient_id, pending in events.items()}
+    recipients = CustomUser.objects.only("username", "email").in_bulk(digests)
+    tweets = Tweet.objects.only("content", "created_at").in_bulk(
+        {tweet_id for retweets in digests.values() for tweet_id in retweets}
     )
 
-    send_mail(
-        subject=subject,
-        message="",
-        from_email=settings.DEFAULT_FROM_EMAIL,
-        recipient_list=[tweet_author.email],
-        html_message=html_message,
+    messages: dict[int, EmailMultiAlternatives] = {}
+    for recipient_id, retweets in digests.items():
+        recipient = recipients.get(recipient_id)
+        if recipient is None or not recipient.email:
+            continue
+        items: list[dict[str, Any]] = [
+            {"tweet": tweets[tweet_id], "retweeters": usernames, "others": len(usernames) - 1}
+            for tweet_id, usernames in retweets.items()
+            if tweet_id in tweets
+        ]
+        if not items:
+            continue
+        if len(items) == 1:
+            first = items[0]
+            others = f" and {first['others']} others" if first["others"] else ""
+            subject = f"{first['retweeters'][0]}{others} retweeted your tweet!"
+        else:
+            subject = f"{sum(len(item['retweeters']) for item in items)} new retweets of your tweets"
+        html_message = render_to_string(
+            "core/emails/retweet_digest.html",
+            {"recipient": recipient, "items": items, "site_url": settings.SITE_URL},
+        )
+        message = EmailMultiAlternatives(subject, "", settings.DEFAULT_FROM_EMAIL, [recipient.email])
+        message.attach_alternative(html_message, "text/html")
+        messages[recipient_id] = message
+
+    with get_connection() as connection:
+        for recipient_id, pending in events.items():
+            # Digests with nothing to send are dropped, the others once sent
+            if recipient_id in messages:
+                connection.send_messages([messages[recipient_id]])
+            notifications.finish_digest(recipient_id, pending)
+
+
+@shared_task
+def write_notifications() -> None:
+    """Write queued in-app notifications to the database. Runs periodically from Celery beat."""
+    from apps.core import notifications
+    from apps.core.redis_client import task_lock
+
+    # Skip this run while a previous one is still writing
+    with task_lock(notifications.WRITE_LOCK_KEY, timeout=300) as acquired:
+        if acquired:
+            notifications.write_queued()
+
+
+@shared_task
+def flush_likes() -> None:
+    """Write the likes buffered in write-behind mode to the database. Runs periodically from Celery beat."""
+    from apps.core import like_buffer
+    from apps.core.redis_client import task_lock
+
+    # Skip this run while a previous one is still writing
+    with task_lock(like_buffer.FLUSH_LOCK_KEY, timeout=300) as acquired:
+        if acquired:
+            like_buffer.flush()
+
+
+@shared_task
+def fan_out_tweet(tweet_id: int) -> None:
+    """
+    Push a new tweet onto the home timelines of its author and the author's followers.
+
+    Authors with too many followers are only flagged as celebrities, their tweets are
+    merged into followers' timelines at read time instead. Open live update streams of the
+    timelines the tweet lands on are told about it.
+    """
+    from apps.core import live, timeline
+    from apps.core.models import Follow, Tweet
+
+    tweet = Tweet.objects.filter(id=tweet_id).values("user_id", "user__followers_count", "created_at").first()
+    if tweet is None:
+        return
+    author_id = tweet["user_id"]
+    entry = {str(tweet_id): tweet["created_at"].timestamp()}
+    timeline.push_to_timelines([author_id], entry)
+
+    is_celebrity = tweet["user__followers_count"] >= settings.TIMELINE_FANOUT_FOLLOWER_LIMIT
+    timeline.set_celebrity(author_id, is_celebrity)
+    live.publish_tweet([live.EXPLORE_CHANNEL], tweet_id, author_id)
+    if is_celebrity:
+        live.publish_tweet([live.author_channel(author_id)], tweet_id, author_id)
+        return
+    followers = Follow.objects.filter(following_id=author_id).values_list("follower_id", flat=True)
+    for batch in timeline.batched(followers.iterator(), settings.TIMELINE_FANOUT_BATCH_SIZE):
+        timeline.push_to_timelines(batch, entry)
+        live.publish_tweet([live.user_channel(follower_id) for follower_id in batch], tweet_id, author_id)
+
+
+@shared_task
+def remove_tweet_from_timelines(tweet_id: int, author_id: int) -> None:
+    """
+    Remove a deleted tweet from the home timelines of its author and the author's followers.
+    """
+    from apps.core import timeline
+    from apps.core.models import Follow
+
+    timeline.remove_from_timelines([author_id], [tweet_id])
+    followers = Follow.objects.filter(following_id=author_id).values_list("follower_id", flat=True)
+    for batch in timeline.batched(followers.iterator(), settings.TIMELINE_FANOUT_BATCH_SIZE):
+        timeline.remove_from_timelines(batch, [tweet_id])
+
+
+@shared_task
+def backfill_timeline(follower_id: int, following_id: int) -> None:
+    """
+    Add the recent tweets of a newly followed user to the follower's home timeline.
+    """
+    from apps.core import timeline
+    from apps.core.models import Tweet
+
+    rows = (
+        Tweet.objects.filter(user_id=following_id)
+        .order_by("-created_at")
+        .values_list("id", "created_at")[: settings.TIMELINE_MAX_LENGTH]
+    )
+    entries = {str(tweet_id): created_at.timestamp() for tweet_id, created_at in rows}
+    if entries:
+        timeline.push_to_timelines([follower_id], entries)
+
+
+@shared_task
+def purge_timeline(follower_id: int, following_id: int) -> None:
+    """
+    Remove the tweets of an unfollowed user from the follower's home timeline.
+    """
+    from apps.core import timeline
+    from apps.core.models import Tweet
+    from apps.core.redis_client import get_redis
+
+    members = cast(list[str], get_redis().zrange(timeline.timeline_key(follower_id), 0, -1))
+    tweet_ids = list(
+        Tweet.objects.filter(id__in=[int(member) for member in members], user_id=following_id).values_list(
+            "id", flat=True
+        )
     )
+    if tweet_ids:
+        timeline.remove_from_timelines([follower_id], tweet_ids)
+
+
+@shared_task
+def process_tweet_image(tweet_id: int) -> None:
+    """
+    Replace the uploaded image of a new tweet with resized renditions without metadata.
+    """
+    from apps.core import images
+    from apps.core.models import Tweet
+
+    tweet = Tweet.objects.filter(id=tweet_id).only("created_at", "image", "image_renditions").first()
+    if tweet is None or not tweet.image or tweet.image_renditions:
+        return
+    images.process_tweet_image(tweet)
+
+
+@shared_task
+def update_trending() -> None:
+    """Score the likes and retweets since the previous run. Runs periodically from Celery beat."""
+    from apps.core import trending
+    from apps.core.redis_client import task_lock
+
+    # Skip this run while a previous one is still scoring
+    with task_lock(trending.LOCK_KEY, timeout=300) as acquired:
+        if acquired:
+            trending.update()
+
+
+@shared_task
+def update_recommendations() -> None:
+    """Recompute every user's "who to follow" recommendations. Runs periodically from Celery beat."""
+    from apps.core import recommendations
+    from apps.core.redis_client import task_lock
+
+    # Skip this run while a previous one, or the update_recommendations command, is still
+    # scoring. Scored in this process, prefork workers cannot start worker processes.
+    with task_lock(recommendations.LOCK_KEY, timeout=60 * 60 * 6) as acquired:
+        if acquired:
+            recommendations.update()
+
+
+@shared_task
+def ensure_partitions() -> None:
+    """Create the upcoming monthly partitions of the tweet and like tables. Runs daily from Celery beat."""
+    from apps.core import partitions
+
+    partitions.ensure_partitions()
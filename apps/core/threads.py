@@ -0,0 +1,99 @@
+"""
+Reply threads.
+
+Every reply stores its ``thread_path``: the IDs of the tweets from the root of its
+conversation down to the reply itself, one segment per tweet. A segment is the number of
+hex digits of the ID, less one, as a single hex digit, followed by those digits. Longer
+IDs get a larger leading digit, so under the "C" collation paths sort like tuples of IDs:
+every tweet comes right before its replies, which come in the order they were posted.
+No segment is a prefix of another, so the descendants of a tweet are exactly the replies
+whose path starts with its own.
+
+A conversation then loads in a fixed number of queries however deep or busy it is:
+
+- the ancestors of a tweet by primary key, with their IDs read from its path, and
+- a page of its descendants, in thread order, with one range scan of
+  ``core_tweet_thread_idx``, paginated by keyset on the path.
+
+Original tweets have an empty path, theirs is their own segment. Paths are at most
+``MAX_THREAD_DEPTH`` tweets long so that they always fit in a btree index entry.
+"""
+
+from typing import cast
+
+from django.db.models import QuerySet
+
+from .models import MAX_THREAD_DEPTH, Tweet
+
+# Ancestors shown above a tweet: the root of the conversation, then the nearest ones
+MAX_ANCESTORS_SHOWN = 10
+
+
+def segment(tweet_id: int) -> str:
+    digits = f"{tweet_id:x}"
+    return f"{len(digits) - 1:x}{digits}"
+
+
+def path_ids(path: str) -> list[int]:
+    """The IDs of the tweets on a thread path, root first."""
+    ids = []
+    start = 0
+    while start < len(path):
+        end = start + 2 + int(path[start], 16)
+        ids.append(int(path[start + 1 : end], 16))
+        start = end
+    return ids
+
+
+def own_path(tweet: Tweet) -> str:
+    """The path of a tweet, which for original tweets is not stored."""
+    return str(tweet.thread_path) or segment(tweet.id)
+
+
+def depth(tweet: Tweet) -> int:
+    """Number of tweets on the path from the root of a tweet's conversation to the tweet, itself included."""
+    return len(path_ids(own_path(tweet)))
+
+
+def can_reply_to(tweet: Tweet) -> bool:
+    return tweet.parent_id is None and depth(tweet) < MAX_THREAD_DEPTH
+
+
+def place_reply(reply: Tweet) -> None:
+    """
+    Store the thread path of a new reply, below the tweet it replies to. Called from
+    ``post_save``, inside the transaction ``Tweet.save`` inserts replies in.
+    """
+    reply.thread_path = own_path(cast(Tweet, reply.reply_to)) + segment(reply.id)
+    Tweet.objects.filter(id=reply.id, created_at=reply.created_at).update(thread_path=reply.thread_path)
+
+
+def ancestor_ids(tweet: Tweet) -> tuple[list[int], list[int]]:
+    """
+    IDs of the ancestors of a tweet to show, root first, and of those left out between the
+    root and the nearest ones.
+    """
+    ids = path_ids(str(tweet.thread_path))[:-1]
+    if len(ids) <= MAX_ANCESTORS_SHOWN:
+        return ids, []
+    nearest = len(ids) - MAX_ANCESTORS_SHOWN + 1
+    return [ids[0], *ids[nearest:]], ids[1:nearest]
+
+
+def descendants(tweet: Tweet) -> QuerySet[Tweet]:
+    """
+    The replies to a tweet and all replies to those, for pagination by ``thread_path``.
+
+    The paths starting with the tweet's own sort strictly between it and itself followed by
+    ``"g"``, which comes after every hex digit. Expressed as a range rather than a ``LIKE``,
+    this and the keyset cursor bound the same scan of the index.
+    """
+    path = own_path(tweet)
+    return Tweet.objects.filter(reply_to__isnull=False, thread_path__gt=path, thread_path__lt=path + "g")
+
+
+def annotate_depths(replies: list[Tweet], below: Tweet) -> None:
+    """Set ``thread_depth`` on each of a page of descendants, 1 for direct replies to ``below``."""
+    root_depth = depth(below)
+    for reply in replies:
+        reply.thread_depth = len(path_ids(str(reply.thread_path))) - root_depth
@@ -0,0 +1,187 @@
+"""
+Materialized home timelines.
+
+Every active user's home timeline is a capped Redis sorted set of tweet IDs scored by the
+tweet's creation timestamp. New tweets are pushed to followers' timelines on write by the
+``fan_out_tweet`` task. Authors with at least ``TIMELINE_FANOUT_FOLLOWER_LIMIT`` followers
+are not fanned out; their tweets are merged into their followers' timelines at read time.
+
+A page is read from Redis with one ``ZREVRANGEBYSCORE`` starting at the cursor, merged
+with the celebrity tweets of the same window, and only its tweets are loaded from the
+database, so a page costs the same however long the timeline is.
+"""
+
+from collections.abc import Iterable, Iterator
+from datetime import UTC, datetime
+from itertools import islice
+from typing import TypeVar, cast
+
+from django.conf import settings
+from django.db.models import Q, QuerySet
+
+from .models import CustomUser, Follow, Tweet
+from .redis_client import get_redis
+
+T = TypeVar("T")
+
+CELEBRITIES_KEY = "timeline:celebrities"
+# Stored in every materialized timeline so that an empty timeline still exists in Redis.
+SENTINEL = "0"
+
+# A timeline entry, as (tweet ID, creation timestamp), and the position a page starts
+# after, as (creation time, tweet ID) like the keyset cursor of the page
+Entry = tuple[int, float]
+Position = tuple[datetime, int]
+
+
+def timeline_key(user_id: int) -> str:
+    return f"timeline:{user_id}"
+
+
+def batched(iterable: Iterable[T], size: int) -> Iterator[list[T]]:
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def push_to_timelines(user_ids: list[int], tweets: dict[str, float]) -> None:
+    """
+    Add tweets (ID -> score) to the timelines of the given users.
+
+    Only timelines that are already materialized are updated, missing ones are rebuilt
+    from the database the next time their owner reads them.
+    """
+    client = get_redis()
+    pipe = client.pipeline(transaction=False)
+    for user_id in user_ids:
+        pipe.exists(timeline_key(user_id))
+    existing = [user_id for user_id, exists in zip(user_ids, pipe.execute(), strict=True) if exists]
+
+    for user_id in existing:
+        key = timeline_key(user_id)
+        pipe.zadd(key, tweets)
+        pipe.zremrangebyrank(key, 0, -settings.TIMELINE_MAX_LENGTH - 1)
+    pipe.execute()
+
+
+def remove_from_timelines(user_ids: list[int], tweet_ids: list[int]) -> None:
+    pipe = get_redis().pipeline(transaction=False)
+    for user_id in user_ids:
+        pipe.zrem(timeline_key(user_id), *tweet_ids)
+    pipe.execute()
+
+
+def set_celebrity(user_id: int, is_celebrity: bool) -> None:
+    client = get_redis()
+    if is_celebrity:
+        client.sadd(CELEBRITIES_KEY, user_id)
+    else:
+        client.srem(CELEBRITIES_KEY, user_id)
+
+
+def timeline_source_queryset(user: CustomUser) -> QuerySet[Tweet]:
+    """Return the tweets a user's home timeline is built from: their own and those of followed users."""
+    following = Follow.objects.filter(follower=user).values_list("following", flat=True)
+    return Tweet.objects.filter(Q(user__in=following) | Q(user=user)).order_by("-created_at")
+
+
+def rebuild_timeline(user: CustomUser) -> list[tuple[int, float]]:
+    """Materialize a user's timeline from the database and return its tweets, newest first."""
+    rows = list(timeline_source_queryset(user).values_list("id", "created_at")[: settings.TIMELINE_MAX_LENGTH])
+    entries = [(tweet_id, created_at.timestamp()) for tweet_id, created_at in rows]
+    key = timeline_key(user.id)
+    pipe = get_redis().pipeline()
+    pipe.delete(key)
+    pipe.zadd(key, {SENTINEL: 0, **{str(tweet_id): score for tweet_id, score in entries}})
+    pipe.expire(key, settings.TIMELINE_TTL)
+    pipe.execute()
+    return entries
+
+
+def is_after(entry: Entry, after: Position | None) -> bool:
+    tweet_id, score = entry
+    if after is None:
+        return True
+    after_score = after[0].timestamp()
+    return score < after_score or (score == after_score and tweet_id < after[1])
+
+
+def newest_first(entries: Iterable[Entry]) -> list[Entry]:
+    """Sort entries like the home timeline's keyset cursor: by time, then ID, descending."""
+    return sorted(entries, key=lambda entry: (entry[1], entry[0]), reverse=True)
+
+
+def read_timeline_page(user: CustomUser, after: Position | None, size: int) -> list[Entry]:
+    """
+    Return the first ``size`` entries of a user's materialized timeline after ``after``,
+    newest first, rebuilding the timeline if it is missing.
+
+    Reading a timeline refreshes its TTL, so only timelines of active users are kept in Redis.
+    """
+    client = get_redis()
+    key = timeline_key(user.id)
+    high = "+inf" if after is None else after[0].timestamp()
+    entries: list[Entry] = []
+    start = 0
+    while True:
+        pipe = client.pipeline(transaction=False)
+        # Entries tied with the cursor's time are read again and skipped below
+        pipe.zrevrangebyscore(key, high, "-inf", start=start, num=size, withscores=True)
+        pipe.expire(key, settings.TIMELINE_TTL)
+        members, exists = pipe.execute()
+        if not exists:
+            return newest_first(entry for entry in rebuild_timeline(user) if is_after(entry, after))[:size]
+        window = [(int(member), score) for member, score in members if member != SENTINEL]
+        entries = newest_first(entries + [entry for entry in window if is_after(entry, after)])
+        if len(members) < size:
+            return entries[:size]
+        # Redis orders tied scores by member as strings, not by ID, so the tie at the end
+        # of the page has to be read whole before the page can be cut
+        if len(entries) >= size and members[-1][1] < entries[size - 1][1]:
+            return entries[:size]
+        start += size
+
+
+def celebrity_tweets_page(user: CustomUser, after: Position | None, size: int) -> list[Entry]:
+    """The first ``size`` tweets after ``after`` of the followed authors that are too popular to fan out."""
+    celebrities = [int(member) for member in cast(set[str], get_redis().smembers(CELEBRITIES_KEY))]
+    if not celebrities:
+        return []
+    followed = Follow.objects.filter(follower=user, following_id__in=celebrities).values_list("following_id", flat=True)
+    tweets = Tweet.objects.filter(user_id__in=followed)
+    if after is not None:
+        tweets = tweets.filter(Q(created_at__lt=after[0]) | Q(created_at=after[0], id__lt=after[1]))
+    rows = tweets.order_by("-created_at", "-id").values_list("id", "created_at")[:size]
+    return [(tweet_id, created_at.timestamp()) for tweet_id, created_at in rows]
+
+
+def get_home_timeline(user: CustomUser, after: Position | None = None, size: int | None = None) -> list[Entry]:
+    """
+    Return the first ``size`` tweets after ``after`` on a user's home timeline, newest first,
+    as (ID, creation timestamp). The whole timeline by default.
+    """
+    size = settings.TIMELINE_MAX_LENGTH if size is None else size
+    # Fan-out-on-read for followed authors that are too popular to fan out on write
+    entries = dict(read_timeline_page(user, after, size) + celebrity_tweets_page(user, after, size))
+    return newest_first(entries.items())[:size]
+
+
+def get_home_timeline_ids(user: CustomUser) -> list[int]:
+    """Return the tweet IDs on a user's home timeline."""
+    return [tweet_id for tweet_id, _ in get_home_timeline(user)]
+
+
+def home_timeline_queryset(user: CustomUser, after: Position | None = None, size: int | None = None) -> QuerySet[Tweet]:
+    """
+    Return the first ``size`` tweets after ``after`` on a user's home timeline.
+
+    Bounded by the time of the oldest one, so that only the partitions the page spans are
+    searched for them.
+    """
+    entries = get_home_timeline(user, after, size)
+    queryset = Tweet.objects.filter(id__in=[tweet_id for tweet_id, _ in entries])
+    if entries:
+        # A second of slack for the rounding of timestamps stored as floats
+        oldest = datetime.fromtimestamp(min(score for _, score in entries) - 1, UTC)
+        queryset = queryset.filter(created_at__gte=oldest)
+    return queryset
@@ -0,0 +1,116 @@
+"""
+Trending tweets for the Explore page's Top mode.
+
+Every like and retweet adds ``weight * 2 ** ((t - base) / TRENDING_HALF_LIFE)`` to the
+score of the original tweet it engages with, where ``t`` is the time of the engagement.
+This is forward decay: instead of every score shrinking as time passes, new engagement
+counts for more, which ranks tweets exactly as decaying all scores would while letting
+scores be added to incrementally. Once ``base`` falls far enough behind, all scores are
+scaled down and ``base`` is moved to the present, so they never overflow.
+
+The ``update_trending`` task runs from Celery beat. Each run scores only the engagement
+created since the previous one, found through the ``created_at`` indexes, adds it to a
+Redis sorted set and trims the set to the best candidates. Explore reads the top
+``TRENDING_SIZE`` tweets from that set with a single ``ZREVRANGE``.
+
+Unlikes and deleted retweets do not lower scores, they fall away with the decay.
+"""
+
+import time
+from datetime import UTC, datetime
+from typing import cast
+
+from django.conf import settings
+from django.contrib.postgres.fields import ArrayField
+from django.db.models import BigIntegerField, F, FloatField, Func, IntegerField, QuerySet, Sum, Value
+from django.db.models.functions import Coalesce, Extract, Power
+
+from .models import Like, Tweet
+from .redis_client import get_redis
+
+SCORES_KEY = "trending:scores"
+# Unix time scores are relative to, and time up to which engagement has been scored
+BASE_KEY = "trending:base"
+PROCESSED_UNTIL_KEY = "trending:processed_until"
+# Held by the update_trending task while it runs
+LOCK_KEY = "trending:lock"
+
+LIKE_WEIGHT = 1.0
+RETWEET_WEIGHT = 2.0
+# Scores kept per tweet shown, so tweets just below the top can still climb into it
+CANDIDATES_PER_TWEET = 10
+# Engagement is only scored once it is this many seconds old, so that rows still being
+# committed when a run starts are not skipped by it
+COMMIT_LAG = 5
+# Engagement older than this many half-lives when first scored counts for at most 1/16
+MAX_HALF_LIVES = 4
+# Scores are scaled down and rebased once base is this many half-lives old
+REBASE_HALF_LIVES = 64
+
+
+def decayed(weight: float, base: float) -> Sum:
+    """Sum of the forward decayed weights of the rows, by their ``created_at``."""
+    exponent = (Extract("created_at", "epoch") - Value(base)) / Value(float(settings.TRENDING_HALF_LIFE))
+    return Sum(Value(weight) * Power(Value(2.0), exponent), output_field=FloatField())
+
+
+def engagement_scores(since: datetime, until: datetime, base: float) -> dict[int, float]:
+    """Scores of the likes and retweets created in ``(since, until]``, by original tweet ID."""
+    # Likes of a retweet count for the tweet it shares
+    likes = (
+        Like.objects.filter(created_at__gt=since, created_at__lte=until)
+        .annotate(target=Coalesce("tweet__parent_id", "tweet_id"))
+        .values("target")
+        .annotate(score=decayed(LIKE_WEIGHT, base))
+        .values_list("target", "score")
+    )
+    retweets = (
+        Tweet.objects.filter(parent__isnull=False, created_at__gt=since, created_at__lte=until)
+        .values("parent_id")
+        .annotate(score=decayed(RETWEET_WEIGHT, base))
+        .values_list("parent_id", "score")
+    )
+    scores: dict[int, float] = {}
+    for tweet_id, score in [*likes, *retweets]:
+        scores[tweet_id] = scores.get(tweet_id, 0.0) + score
+    return scores
+
+
+def update(now: float | None = None) -> int:
+    """Score the engagement since the previous update and return the number of tweets scored."""
+    now = time.time() if now is None else now
+    half_life = settings.TRENDING_HALF_LIFE
+    client = get_redis()
+    base_value, processed_value = cast(list[str | None], client.mget(BASE_KEY, PROCESSED_UNTIL_KEY))
+    base = float(base_value) if base_value else now
+    until = now - COMMIT_LAG
+    since = max(float(processed_value) if processed_value else 0.0, until - MAX_HALF_LIVES * half_life)
+
+    pipe = client.pipeline()
+    if now - base > REBASE_HALF_LIVES * half_life:
+        pipe.zunionstore(SCORES_KEY, {SCORES_KEY: 2 ** ((base - now) / half_life)})
+        base = now
+    scores = engagement_scores(datetime.fromtimestamp(since, UTC), datetime.fromtimestamp(until, UTC), base)
+    for tweet_id, score in scores.items():
+        pipe.zincrby(SCORES_KEY, score, str(tweet_id))
+    pipe.zremrangebyrank(SCORES_KEY, 0, -settings.TRENDING_SIZE * CANDIDATES_PER_TWEET - 1)
+    pipe.mset({BASE_KEY: base, PROCESSED_UNTIL_KEY: until})
+    pipe.execute()
+    return len(scores)
+
+
+def top_tweet_ids() -> list[int]:
+    """IDs of the ``TRENDING_SIZE`` top scored tweets, best first."""
+    ids = cast(list[str], get_redis().zrevrange(SCORES_KEY, 0, settings.TRENDING_SIZE - 1))
+    return [int(tweet_id) for tweet_id in ids]
+
+
+def forget(tweet_id: int) -> None:
+    get_redis().zrem(SCORES_KEY, str(tweet_id))
+
+
+def ranked(queryset: QuerySet[Tweet], tweet_ids: list[int]) -> QuerySet[Tweet]:
+    """Filter ``queryset`` to the given tweets, annotated with their ``trending_rank`` in the list."""
+    ids = Value(tweet_ids, output_field=ArrayField(BigIntegerField()))
+    rank = Func(ids, F("id"), function="array_position", output_field=IntegerField())
+    return queryset.filter(id__in=tweet_ids).annotate(trending_rank=rank)
@@ -1,18 +1,30 @@
+from django.conf import settings
 from django.urls import path
 
-from . import views
+from . import async_views, views
+
+feed_views = async_views if settings.ASYNC_VIEWS else views
 
 urlpatterns = [
-    path("", views.HomeView.as_view(), name="home"),
+    path("", feed_views.HomeView.as_view(), name="home"),
     path("logout/", views.CustomLogoutView.as_view(), name="logout"),
-    path("explore/", views.ExploreView.as_view(), name="explore"),
+    path("explore/", feed_views.ExploreView.as_view(), name="explore"),
+    path("search/", views.SearchView.as_view(), name="search"),
     path("users/", views.UsersListView.as_view(), name="users_list"),
-    path("tweet/<int:pk>/", views.TweetDetailView.as_view(), name="tweet_detail"),
+    path("users/search/", views.UserSearchView.as_view(), name="user_search"),
+    path("tweet/<int:pk>/", feed_views.TweetDetailView.as_view(), name="tweet_detail"),
     path("tweet/new/", views.NewTweetView.as_view(), name="new_tweet"),
-    path("tweet/<int:tweet_id>/like/", views.LikeTweetView.as_view(), name="like_tweet"),
+    path("tweet/<int:tweet_id>/reply/", views.ReplyView.as_view(), name="reply"),
+    path("tweet/<int:tweet_id>/like/", feed_views.LikeTweetView.as_view(), name="like_tweet"),
+    path("tweet/<int:tweet_id>/unlike/", feed_views.LikeTweetView.as_view(liked=False), name="unlike_tweet"),
     path("tweet/<int:tweet_id>/retweet/", views.RetweetView.as_view(), name="retweet"),
+    path("tweet/<int:tweet_id>/unretweet/", views.RetweetView.as_view(retweeted=False), name="undo_retweet"),
     path("profile/<str:username>/", views.ProfileView.as_view(), name="profile"),
     path("profile/<str:username>/follow/", views.FollowUserView.as_view(), name="follow_user"),
+    path("profile/<str:username>/unfollow/", views.FollowUserView.as_view(following=False), name="unfollow_user"),
     path("edit_profile/", views.EditProfileView.as_view(), name="edit_profile"),
+    path("notifications/", views.NotificationsView.as_view(), name="notifications"),
+    path("notifications/unread/", views.UnreadNotificationsView.as_view(), name="unread_notifications"),
+    path("live/<str:feed>/", views.LiveUpdatesView.as_view(), name="live_updates"),
     path("register/", views.RegisterView.as_view(), name="register"),
 ]
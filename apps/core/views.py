@@ -1,25 +1,43 @@
 import logging
-import time
+from collections.abc import Sequence
 from typing import Any, cast
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
 from django.contrib.auth import logout
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.messages.views import SuccessMessageMixin
 from django.core.exceptions import PermissionDenied
-from django.db.models import Q, QuerySet
-from django.http import HttpRequest, HttpResponse
-from django.shortcuts import get_object_or_404, redirect
+from django.db import connection, connections, transaction
+from django.db.models import QuerySet
+from django.http import Http404, HttpRequest, HttpResponse, HttpResponseBase, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse, reverse_lazy
-from django.views.generic import CreateView, DetailView, FormView, ListView, UpdateView, View
+from django.views.generic import CreateView, DetailView, ListView, UpdateView, View
 from django.views.generic.base import ContextMixin
 
+from . import like_buffer, live, recommendations, threads, trending
+from .caching import CachePolicyMixin
 from .forms import (
     TweetForm,
     UserRegisterForm,
     UserUpdateForm,
 )
-from .models import CustomUser, Follow, Like, Tweet
-from .tasks import send_retweet_notification
+from .hydration import hydrate_tweets, with_card_relations
+from .models import CustomUser, Follow, Like, Notification, Tweet
+from .notifications import collapse, mark_all_read, notify, record_retweet, unread_count
+from .pagination import CursorPage, CursorPaginationMixin, CursorPaginator
+from .replicas import ReplicaReadsMixin
+from .search import search_tweets, search_users
+from .tasks import (
+    backfill_timeline,
+    fan_out_tweet,
+    process_tweet_image,
+    purge_timeline,
+    remove_tweet_from_timelines,
+)
+from .timeline import home_timeline_queryset
 
 logger = logging.getLogger(__name__)
 
@@ -37,24 +55,74 @@ class RegisterView(SuccessMessageMixin, CreateView):
 
 
 class TweetContextMixin(ContextMixin):
+    """
+    Hydrate the tweets rendered by a view and expose the viewer's state for them.
+
+    ``liked_tweets`` and ``retweeted_tweets`` are sets of the IDs among the tweets on the
+    page only, so their cost does not grow with the number of likes a user has made.
+    """
+
+    def get_page_tweets(self, context: dict[str, Any]) -> list[Tweet]:
+        return [cast(Tweet, self.object)]
+
     def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
         context: dict[str, Any] = super().get_context_data(**kwargs)
-        context["liked_tweets"] = self.request.user.likes.values_list("tweet_id", flat=True)
-        context["retweeted_tweets"] = Tweet.objects.filter(parent__isnull=False, user=self.request.user).values_list(
-            "parent_id", flat=True
-        )
+        tweets = hydrate_tweets(self.get_page_tweets(context), self.request.user)
+        context["liked_tweets"] = {tweet.id for tweet in tweets if tweet.liked_by_viewer}
+        context["retweeted_tweets"] = {tweet.id for tweet in tweets if tweet.retweeted_by_viewer}
         return context
 
 
-class HomeView(LoginRequiredMixin, TweetContextMixin, ListView):
+class LiveUpdatesMixin(ContextMixin):
+    """
+    Expose the URL of the live updates stream of ``live_feed`` to the template, following
+    the counters of the tweets on the page.
+    """
+
+    live_feed: str
+
+    def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
+        context: dict[str, Any] = super().get_context_data(**kwargs)
+        tweet_ids = [tweet.id for tweet in context.get("tweets", ())]
+        token = live.stream_token(cast(CustomUser, self.request.user).id, self.live_feed, tweet_ids)
+        context["live_updates_url"] = reverse("live_updates", kwargs={"feed": self.live_feed}) + f"?token={token}"
+        return context
+
+
+class TweetListMixin(TweetContextMixin):
+    """Hydrate the page of tweets of a ``ListView``."""
+
+    def get_page_tweets(self, context: dict[str, Any]) -> list[Tweet]:
+        context["tweets"] = context["object_list"] = list(context["object_list"])
+        return cast(list[Tweet], context["tweets"])
+
+
+def home_timeline_page_queryset(user: CustomUser, cursor: str | None, per_page: int) -> QuerySet[Tweet]:
+    """
+    The tweets of the page of a user's home timeline after ``cursor``, for a
+    ``CursorPaginator`` ordered by ``("-created_at", "-id")``.
+    """
+    after = None
+    if cursor:
+        created_at, tweet_id = CursorPaginator(Tweet.objects.all(), per_page).decode(cursor)
+        after = (created_at, tweet_id)
+    # Twice the rows the paginator reads, so a page stays full when some of its tweets
+    # were deleted since they were pushed to the timeline
+    return with_card_relations(home_timeline_queryset(user, after, 2 * (per_page + 1)))
+
+
+class HomeView(
+    LoginRequiredMixin, ReplicaReadsMixin, LiveUpdatesMixin, TweetListMixin, CursorPaginationMixin, ListView
+):
     template_name = "core/home.html"
     model = Tweet
     context_object_name = "tweets"
     paginate_by = 6
+    live_feed = "home"
 
     def get_queryset(self) -> QuerySet[Tweet]:
-        following = Follow.objects.filter(follower=self.request.user).values_list("following", flat=True)
-        return Tweet.objects.filter(Q(user__in=following) | Q(user=self.request.user)).order_by("-created_at")
+        user = cast(CustomUser, self.request.user)
+        return home_timeline_page_queryset(user, self.request.GET.get(self.cursor_kwarg), self.paginate_by)
 
     def get_template_names(self) -> list[str]:
         if self.request.htmx and self.request.htmx.trigger == "tweets-container":
@@ -62,38 +130,96 @@ class HomeView(LoginRequiredMixin, TweetContextMixin, ListView):
         return [self.template_name]
 
     def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
-        # Just to make infinite scrolling show spinner to make it more obvious
-        if self.request.htmx and self.request.htmx.trigger == "tweets-container":
-            time.sleep(1)
         context: dict[str, Any] = super().get_context_data(**kwargs)
         context["form"] = TweetForm()
         return context
 
 
-class ExploreView(LoginRequiredMixin, TweetContextMixin, ListView):
+class ExploreModeMixin(ContextMixin):
+    """Switch Explore between the latest tweets and, with ``?mode=top``, the trending ones."""
+
+    def is_top_mode(self) -> bool:
+        return bool(self.request.GET.get("mode") == "top")
+
+    def get_cursor_ordering(self) -> Sequence[str]:
+        return ("trending_rank", "id") if self.is_top_mode() else ("-created_at", "-id")
+
+    def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
+        context: dict[str, Any] = super().get_context_data(**kwargs)
+        context["explore_mode"] = "top" if self.is_top_mode() else "latest"
+        return context
+
+
+class ExploreView(
+    LoginRequiredMixin,
+    CachePolicyMixin,
+    ReplicaReadsMixin,
+    LiveUpdatesMixin,
+    ExploreModeMixin,
+    TweetListMixin,
+    CursorPaginationMixin,
+    ListView,
+):
     template_name = "core/explore.html"
     model = Tweet
     context_object_name = "tweets"
     paginate_by = 6
+    cache_timeout = 15
+    live_feed = "explore"
 
     def get_queryset(self) -> QuerySet[Tweet]:
-        return Tweet.objects.all().order_by("-created_at")
+        queryset = with_card_relations(Tweet.objects.all())
+        if self.is_top_mode():
+            return trending.ranked(queryset, trending.top_tweet_ids())
+        return queryset
 
     def get_template_names(self) -> list[str]:
         if self.request.htmx:
-            time.sleep(1)
             return ["core/timeline.html"]
         return [self.template_name]
 
 
-class UsersListView(LoginRequiredMixin, ListView):
+class SearchView(LoginRequiredMixin, TweetListMixin, CursorPaginationMixin, ListView):
+    template_name = "core/search.html"
+    model = Tweet
+    context_object_name = "tweets"
+    paginate_by = 6
+    cursor_ordering = ("-rank", "-id")
+
+    def get_queryset(self) -> QuerySet[Tweet]:
+        return with_card_relations(search_tweets(self.request.GET.get("q", "")))
+
+    def get_template_names(self) -> list[str]:
+        if self.request.htmx and self.request.htmx.trigger == "tweets-container":
+            return ["core/timeline.html"]
+        return [self.template_name]
+
+    def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
+        context: dict[str, Any] = super().get_context_data(**kwargs)
+        context["search_query"] = self.request.GET.get("q", "")
+        return context
+
+
+class UsersListView(LoginRequiredMixin, ReplicaReadsMixin, CursorPaginationMixin, ListView):
     template_name = "core/users_list.html"
     model = CustomUser
     context_object_name = "users"
     paginate_by = 10
 
     def get_queryset(self) -> QuerySet[CustomUser]:
-        return CustomUser.objects.exclude(id=self.request.user.id).order_by("username")
+        search_query = self.request.GET.get("search", "")
+        if search_query:
+            return search_users(search_query).exclude(id=self.request.user.id)
+        return recommendations.recommended_users(self.request.user)
+
+    def get_cursor_ordering(self) -> Sequence[str]:
+        # Usernames are unique, recommendations ranked by their position in the list
+        return ("-rank", "username") if self.request.GET.get("search") else ("recommendation_rank", "id")
+
+    def get_template_names(self) -> list[str]:
+        if self.request.htmx:
+            return ["core/user_list.html"]
+        return [self.template_name]
 
     def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
         context: dict[str, Any] = super().get_context_data(**kwargs)
@@ -103,15 +229,91 @@ class UsersListView(LoginRequiredMixin, ListView):
         return context
 
 
-class TweetDetailView(LoginRequiredMixin, TweetContextMixin, DetailView):
-    template_name = "core/tweet_detail.html"
+class UserSearchView(LoginRequiredMixin, ListView):
+    """Typeahead suggestions for the user search box."""
+
+    template_name = "core/user_suggestions.html"
+    context_object_name = "users"
+    max_suggestions = 8
+
+    def get_queryset(self) -> QuerySet[CustomUser]:
+        users = search_users(self.request.GET.get("search", "")).exclude(id=self.request.user.id)
+        return users.only("username")[: self.max_suggestions]
+
+
+class ThreadMixin(ContextMixin):
+    """
+    Show the conversation around a tweet: the tweets it replies to, a reply form and a page
+    of the replies below it, in thread order. Further pages of replies are requested with
+    HTMX and rendered with ``core/thread_replies.html``. The latest retweets of the tweet
+    are listed below, with a count of the others.
+    """
+
+    replies_per_page = 20
+    retweets_shown = 10
+    cursor_kwarg = "cursor"
+
+    def get_thread_tweet(self, tweet: Tweet) -> Tweet:
+        # Retweets show the conversation of the tweet they share
+        return tweet.parent or tweet
+
+    def get_ancestors_queryset(self, thread_tweet: Tweet) -> QuerySet[Tweet]:
+        shown, _ = threads.ancestor_ids(thread_tweet)
+        # The root's path is empty, each further ancestor's is longer than the previous one's
+        return with_card_relations(Tweet.objects.filter(id__in=shown)).order_by("thread_path")
+
+    def get_replies_paginator(self, thread_tweet: Tweet) -> CursorPaginator:
+        # Paths end with the reply's own ID, so they are unique
+        return CursorPaginator(
+            with_card_relations(threads.descendants(thread_tweet)), self.replies_per_page, ("thread_path",)
+        )
+
+    def get_retweets_queryset(self, tweet: Tweet) -> QuerySet[Tweet]:
+        return Tweet.objects.filter(parent=tweet).select_related("user").order_by("-created_at")[: self.retweets_shown]
+
+    def get_retweets_context(self, tweet: Tweet, retweets: list[Tweet]) -> dict[str, Any]:
+        # The cached counter, so tweets with many retweets are never counted
+        return {"retweets": retweets, "more_retweets_count": max(0, tweet.retweets_count - len(retweets))}
+
+    def get_thread_context(self, thread_tweet: Tweet, ancestors: list[Tweet], replies: CursorPage) -> dict[str, Any]:
+        threads.annotate_depths(replies.object_list, thread_tweet)
+        _, hidden = threads.ancestor_ids(thread_tweet)
+        return {
+            "thread_tweet": thread_tweet,
+            "ancestors": ancestors,
+            "hidden_ancestors": hidden,
+            "replies": replies,
+            "reply_form": TweetForm(reply_to=thread_tweet) if threads.can_reply_to(thread_tweet) else None,
+        }
+
+    def get_template_names(self) -> list[str]:
+        if self.request.htmx and self.request.htmx.trigger == "thread-replies":
+            return ["core/thread_replies.html"]
+        return ["core/tweet_detail.html"]
+
+
+class TweetDetailView(
+    LoginRequiredMixin, CachePolicyMixin, ReplicaReadsMixin, ThreadMixin, TweetContextMixin, DetailView
+):
     model = Tweet
     context_object_name = "tweet"
+    cache_timeout = 30
+
+    def get_queryset(self) -> QuerySet[Tweet]:
+        return with_card_relations(Tweet.objects.all())
+
+    def get_page_tweets(self, context: dict[str, Any]) -> list[Tweet]:
+        tweet = cast(Tweet, self.object)
+        thread_tweet = self.get_thread_tweet(tweet)
+        ancestors = list(self.get_ancestors_queryset(thread_tweet))
+        replies = self.get_replies_paginator(thread_tweet).page(self.request.GET.get(self.cursor_kwarg))
+        context.update(self.get_thread_context(thread_tweet, ancestors, replies))
+        return [tweet, *ancestors, *replies]
 
     def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
         context: dict[str, Any] = super().get_context_data(**kwargs)
         tweet = cast(Tweet, self.object)
-        context["retweets"] = Tweet.objects.filter(parent=tweet).order_by("-created_at")
+        context.update(self.get_retweets_context(tweet, list(self.get_retweets_queryset(tweet))))
         return context
 
 
@@ -128,51 +330,158 @@ class NewTweetView(LoginRequiredMixin, SuccessMessageMixin, CreateView):
     def form_valid(self, form: TweetForm) -> HttpResponse:
         response = super().form_valid(form)
         logger.info(f"New tweet created by {self.request.user.username}")
+        fan_out_tweet.delay(tweet_id=self.object.id)
+        if self.object.image:
+            process_tweet_image.delay(tweet_id=self.object.id)
         return response
 
 
-class LikeTweetView(LoginRequiredMixin, TweetContextMixin, DetailView):
-    model = Tweet
-    template_name = "core/tweet_card.html"
-    slug_field = "id"
-    slug_url_kwarg = "tweet_id"
-
-    def get(self, request: HttpRequest, *args: tuple, **kwargs: dict) -> HttpResponse:
-        tweet = self.get_object()
-        like, created = Like.objects.get_or_create(user=request.user, tweet=tweet)
-        action = "liked" if created else "unliked"
-        logger.info(f"User {request.user.username} {action} tweet {tweet.id}")
-        if not created:
-            like.delete()
-        return super().get(request, *args, **kwargs)
+class ReplyView(NewTweetView):
+    """Post a reply to a tweet, or to the tweet shared by a retweet."""
 
+    http_method_names = ["post"]
+    success_message = "Your reply has been posted!"
 
-class RetweetView(LoginRequiredMixin, View):
     def post(self, request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponse:
-        original_tweet = get_object_or_404(Tweet, pk=kwargs["tweet_id"])
-        retweet, created = Tweet.objects.get_or_create(
-            user=request.user,
-            parent=original_tweet,
-            defaults={"content": original_tweet.content, "image": original_tweet.image},
-        )
-        if created:
-            logger.info(
-                f"User {request.user.username} retweeted tweet {original_tweet.id} "
-                f"from {original_tweet.user.username}"
-            )
-            send_retweet_notification.delay(tweet_id=original_tweet.id, retweeter_username=request.user.username)
-        else:
-            logger.info(f"User {request.user.username} un-retweeted tweet {original_tweet.id}")
-            retweet.delete()
-        return redirect(request.META.get("HTTP_REFERER", reverse_lazy("home")))
+        tweet = get_object_or_404(Tweet.objects.select_related("parent"), pk=kwargs["tweet_id"])
+        self.reply_to = tweet.parent or tweet
+        return super().post(request, *args, **kwargs)
 
+    def get_form_kwargs(self) -> dict[str, Any]:
+        kwargs: dict[str, Any] = super().get_form_kwargs()
+        kwargs["reply_to"] = self.reply_to
+        return kwargs
 
-class ProfileView(LoginRequiredMixin, TweetContextMixin, DetailView):
+    def form_valid(self, form: TweetForm) -> HttpResponse:
+        response = super().form_valid(form)
+        notify(self.reply_to.user_id, cast(CustomUser, self.request.user).id, Notification.Verb.REPLY, self.object.id)
+        return response
+
+    def form_invalid(self, form: TweetForm) -> HttpResponse:
+        for errors in form.errors.values():
+            messages.error(self.request, str(errors[0]))
+        return redirect(self.get_success_url())
+
+    def get_success_url(self) -> str:
+        return reverse("tweet_detail", kwargs={"pk": self.reply_to.id})
+
+
+def write_like(user: CustomUser, tweet: Tweet, liked: bool) -> bool:
+    """Like or unlike the tweet for the user and return whether that changed anything."""
+    if settings.LIKE_WRITE_BEHIND:
+        return like_buffer.set_liked(user.id, tweet, liked)
+    if liked:
+        return Like.objects.get_or_create(user=user, tweet=tweet, tweet_created_at=tweet.created_at)[1]
+    deleted, _ = Like.objects.filter(user=user, tweet=tweet, tweet_created_at=tweet.created_at).delete()
+    return deleted > 0
+
+
+def write_retweet(user: CustomUser, tweet: Tweet, retweeted: bool) -> int | None:
+    """
+    Retweet the tweet for the user, or undo their retweet, and return the ID of the retweet
+    created or deleted, or None if nothing changed.
+    """
+    with transaction.atomic():
+        # Retweets are unique per user and parent, but core_tweet is partitioned and Postgres
+        # only enforces unique constraints including created_at, so concurrent writes of the
+        # same retweet are serialized with a lock held until the transaction ends instead
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtextextended(%s, 0))", [f"retweet:{user.id}:{tweet.id}"])
+        retweet = Tweet.objects.filter(user=user, parent=tweet).first()
+        if retweeted:
+            return None if retweet is not None else Tweet.objects.create(user=user, parent=tweet).id
+        if retweet is None:
+            return None
+        retweet_id = retweet.id
+        # Loaded already, so the retweets counter is updated with the parent's creation time
+        retweet.parent = tweet
+        retweet.delete()
+        return retweet_id
+
+
+def like_button_response(request: HttpRequest, tweet: Tweet, liked: bool, changed: bool) -> HttpResponse:
+    """
+    Render the like button of a tweet the viewer just liked or unliked. The change is added
+    to the counter loaded before it was written rather than loading the tweet again.
+    """
+    user = cast(CustomUser, request.user)
+    if changed:
+        action = "liked" if liked else "unliked"
+        logger.info(f"User {user.username} {action} tweet {tweet.id}")
+        if liked:
+            notify(tweet.user_id, user.id, Notification.Verb.LIKE, tweet.id)
+    if settings.LIKE_WRITE_BEHIND:
+        like_buffer.apply_buffered_likes([tweet], None, set())
+    elif changed:
+        tweet.likes_count = max(0, tweet.likes_count + (1 if liked else -1))
+    tweet.liked_by_viewer = liked
+    return render(request, "core/like_button.html", {"tweet": tweet})
+
+
+class LikeTweetView(LoginRequiredMixin, View):
+    """Like a tweet, or unlike it when ``liked`` is False. Repeating a request changes nothing."""
+
+    liked = True
+
+    def post(self, request: HttpRequest, *args: Any, tweet_id: int, **kwargs: Any) -> HttpResponse:
+        tweet = get_object_or_404(Tweet.objects.only("user", "created_at", "likes_count"), pk=tweet_id)
+        changed = write_like(cast(CustomUser, request.user), tweet, self.liked)
+        return like_button_response(request, tweet, self.liked, changed)
+
+
+class RetweetView(LoginRequiredMixin, View):
+    """
+    Retweet a tweet, or undo the retweet when ``retweeted`` is False. Repeating a request
+    changes nothing. Retweets have no content of their own, so the buttons of a retweet's
+    card act on the tweet it shares.
+    """
+
+    retweeted = True
+
+    def post(self, request: HttpRequest, *args: Any, tweet_id: int, **kwargs: Any) -> HttpResponse:
+        user = cast(CustomUser, request.user)
+        tweet = get_object_or_404(
+            Tweet.objects.select_related("user", "parent__user").only(
+                "user__username",
+                "created_at",
+                "retweets_count",
+                "parent__user__username",
+                "parent__created_at",
+                "parent__retweets_count",
+            ),
+            pk=tweet_id,
+        )
+        original_tweet = tweet.parent or tweet
+        retweet_id = write_retweet(user, original_tweet, self.retweeted)
+        changed = retweet_id is not None
+        if retweet_id is not None and self.retweeted:
+            logger.info(f"User {user.username} retweeted tweet {original_tweet.id} from {original_tweet.user.username}")
+            if original_tweet.user_id != user.id:
+                record_retweet(original_tweet.user_id, original_tweet.id, user.username)
+            notify(original_tweet.user_id, user.id, Notification.Verb.RETWEET, original_tweet.id)
+            fan_out_tweet.delay(tweet_id=retweet_id)
+        elif retweet_id is not None:
+            logger.info(f"User {user.username} un-retweeted tweet {original_tweet.id}")
+            remove_tweet_from_timelines.delay(tweet_id=retweet_id, author_id=user.id)
+
+        # Counted from the write rather than loading the tweet again
+        if changed:
+            original_tweet.retweets_count = max(0, original_tweet.retweets_count + (1 if self.retweeted else -1))
+        original_tweet.retweeted_by_viewer = self.retweeted
+        return render(request, "core/retweet_button.html", {"tweet": original_tweet})
+
+
+class ProfileView(LoginRequiredMixin, CachePolicyMixin, ReplicaReadsMixin, TweetContextMixin, DetailView):
     model = CustomUser
     template_name = "core/profile.html"
     context_object_name = "profile_user"
     slug_field = "username"
     slug_url_kwarg = "username"
+    cache_timeout = 30
+
+    def get_page_tweets(self, context: dict[str, Any]) -> list[Tweet]:
+        context["tweets"] = list(with_card_relations(self.object.tweets.all()))
+        return cast(list[Tweet], context["tweets"])
 
     def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
         context: dict[str, Any] = super().get_context_data(**kwargs)
@@ -196,20 +505,108 @@ class EditProfileView(LoginRequiredMixin, SuccessMessageMixin, UpdateView):
         return response
 
 
-class FollowUserView(LoginRequiredMixin, FormView):
-    def post(self, request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponse:
-        user_to_follow = get_object_or_404(CustomUser, username=kwargs["username"])
-        if user_to_follow == request.user:
-            logger.warning(f"User {request.user.username} attempted to follow themselves")
+class FollowUserView(LoginRequiredMixin, View):
+    """
+    Follow a user, or unfollow them when ``following`` is False. Repeating a request changes
+    nothing.
+
+    HTMX requests get the new follow button, and on the user's profile their follower count
+    out of band. Plain form posts are redirected back.
+    """
+
+    following = True
+
+    def post(self, request: HttpRequest, *args: Any, username: str, **kwargs: Any) -> HttpResponse:
+        user = cast(CustomUser, request.user)
+        followed = get_object_or_404(CustomUser, username=username)
+        if followed == user:
+            logger.warning(f"User {user.username} attempted to follow themselves")
             raise PermissionDenied("You cannot follow yourself.")
 
-        follow, created = Follow.objects.get_or_create(follower=request.user, following=user_to_follow)
-        action = "followed" if created else "unfollowed"
-        logger.info(f"User {request.user.username} {action} user {user_to_follow.username}")
-        if not created:
-            follow.delete()
+        if self.following:
+            changed = Follow.objects.get_or_create(follower=user, following=followed)[1]
+        else:
+            deleted, _ = Follow.objects.filter(follower=user, following=followed).delete()
+            changed = deleted > 0
+        if changed:
+            action = "followed" if self.following else "unfollowed"
+            logger.info(f"User {user.username} {action} user {followed.username}")
+            if self.following:
+                backfill_timeline.delay(follower_id=user.id, following_id=followed.id)
+                notify(followed.id, user.id, Notification.Verb.FOLLOW)
+            else:
+                purge_timeline.delay(follower_id=user.id, following_id=followed.id)
+
+        if not request.htmx:
+            return redirect(request.META.get("HTTP_REFERER", reverse_lazy("home")))
+        context: dict[str, Any] = {"followed": followed, "is_following": self.following}
+        if request.htmx.current_url_abs_path == reverse("profile", kwargs={"username": followed.username}):
+            # Counted from the write rather than loading the user again
+            context["followers_count"] = max(0, followed.followers_count + (1 if self.following else -1) * changed)
+        return render(request, "core/follow_button.html", context)
+
+
+class NotificationsView(LoginRequiredMixin, CursorPaginationMixin, ListView):
+    template_name = "core/notifications.html"
+    context_object_name = "notifications"
+    paginate_by = 20
+
+    def get_queryset(self) -> QuerySet[Notification]:
+        return Notification.objects.filter(recipient=cast(CustomUser, self.request.user)).select_related(
+            "actor", "tweet"
+        )
+
+    def get_template_names(self) -> list[str]:
+        if self.request.htmx:
+            return ["core/notification_list.html"]
+        return [self.template_name]
+
+    def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
+        context: dict[str, Any] = super().get_context_data(**kwargs)
+        context["groups"] = collapse(context["object_list"])
+        if not self.request.GET.get(self.cursor_kwarg):
+            mark_all_read(cast(CustomUser, self.request.user).id)
+        return context
 
-        return redirect(request.META.get("HTTP_REFERER", reverse_lazy("home")))
+
+class UnreadNotificationsView(LoginRequiredMixin, View):
+    """Navbar badge polled by HTMX. Served from Redis without querying the database."""
+
+    def get(self, request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponse:
+        user = cast(CustomUser, request.user)
+        return render(request, "core/notifications_badge.html", {"unread_count": unread_count(user.id)})
+
+
+class LiveUpdatesView(View):
+    """
+    Stream new tweets and counter changes of a feed as server-sent events.
+
+    Asynchronous so that an open stream does not hold a worker thread; it must be served
+    through ASGI. Authenticated with the token issued by ``LiveUpdatesMixin``.
+    """
+
+    async def get(self, request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponseBase:
+        feed = kwargs["feed"]
+        if feed not in live.FEEDS:
+            raise Http404(f"Unknown feed {feed}")
+        stream = live.read_stream_token(request.GET.get("token", ""), feed)
+        if stream is None:
+            # EventSource gives up instead of reconnecting on a 401
+            return HttpResponse(status=401)
+        user_id, tweet_ids = stream
+        hub = live.get_hub()
+        if feed == "home":
+            channels = await live.home_channels(hub, user_id)
+            # Streams stay open for minutes, don't hold a database connection for each
+            await sync_to_async(connections.close_all)()
+        else:
+            channels = [live.EXPLORE_CHANNEL]
+        events = live.stream_events(hub, channels, user_id, reverse(feed), tweet_ids)
+        response = StreamingHttpResponse(events, content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        # Stops nginx from buffering the stream
+        response["X-Accel-Buffering"] = "no"
+        return response
 
 
 class CustomLogoutView(View):
@@ -3,14 +3,23 @@ ASGI config for twitter_clone project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Live updates are streamed by an asynchronous view, so the site is served through this
+rather than WSGI, e.g. ``uvicorn config.asgi:application``.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
 
 import os
 
+from django.conf import settings
+from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "twitter_clone.settings")
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
 
 application = get_asgi_application()
+
+if settings.DEBUG:
+    # Serve static files like runserver does during development
+    application = ASGIStaticFilesHandler(application)
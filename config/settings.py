@@ -29,6 +29,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "crispy_forms",
     "crispy_bootstrap5",
     "django_htmx",
@@ -45,6 +46,7 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "django_htmx.middleware.HtmxMiddleware",
+    "apps.core.replicas.replica_middleware",
 ]
 
 ROOT_URLCONF = "config.urls"
@@ -79,9 +81,31 @@ DATABASES = {
         "USER": os.environ.get("POSTGRES_USER", "postgres"),
         "PASSWORD": os.environ.get("POSTGRES_PASSWORD", "postgres"),
         "HOST": os.environ.get("POSTGRES_HOST", "db"),
-        "PORT": 5432,
+        "PORT": int(os.environ.get("POSTGRES_PORT", 5432)),
+        # Seconds a connection is kept open for the next requests of its thread, 0 closes it
+        # after every request. Under ASGI each request runs on its own thread, so reuse
+        # connections with PgBouncer there instead.
+        "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", 0)),
+        "CONN_HEALTH_CHECKS": os.environ.get("DB_CONN_HEALTH_CHECKS", "True").lower() == "true",
+        # PgBouncer in transaction pooling mode hands each transaction a different server
+        # connection, which loses the server-side cursors of QuerySet.iterator()
+        "DISABLE_SERVER_SIDE_CURSORS": os.environ.get("DB_PGBOUNCER", "False").lower() == "true",
+        "OPTIONS": {},
     }
 }
+# Read replicas, as comma-separated hosts, read by the views with ReplicaReadsMixin. Tests
+# mirror them to the test database of default.
+for number, host in enumerate(filter(None, os.environ.get("DB_REPLICA_HOSTS", "").split(",")), 1):
+    DATABASES[f"replica{number}"] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "OPTIONS": dict(DATABASES["default"]["OPTIONS"]),
+        "TEST": {"MIRROR": "default"},
+    }
+REPLICA_DATABASES = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ["apps.core.replicas.ReplicaRouter"]
+# Seconds the reads of a user who wrote go to the primary, to outlast replication lag
+REPLICA_STICKINESS = int(os.environ.get("REPLICA_STICKINESS", 10))
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -133,6 +157,9 @@ CRISPY_TEMPLATE_PACK = "bootstrap5"
 # Media files
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+# Largest tweet image accepted, and widths in pixels of the renditions made of each image
+TWEET_IMAGE_MAX_UPLOAD_SIZE = int(os.environ.get("TWEET_IMAGE_MAX_UPLOAD_SIZE", 10 * 1024 * 1024))
+TWEET_IMAGE_WIDTHS = [int(width) for width in os.environ.get("TWEET_IMAGE_WIDTHS", "320 640 1280").split()]
 
 # Login settings
 LOGIN_URL = "login"
@@ -147,9 +174,20 @@ EMAIL_HOST_USER = os.environ.get("EMAIL_HOST_USER", "")
 EMAIL_HOST_PASSWORD = os.environ.get("EMAIL_HOST_PASSWORD", "")
 EMAIL_USE_TLS = os.environ.get("EMAIL_USE_TLS", "False").lower() == "true"
 DEFAULT_FROM_EMAIL = os.environ.get("DEFAULT_FROM_EMAIL", "noreply@twitter-clone.com")
+# Base URL of links in emails
+SITE_URL = os.environ.get("SITE_URL", "http://localhost:8000")
 
 # Custom user model
 AUTH_USER_MODEL = "core.CustomUser"
+AUTHENTICATION_BACKENDS = [
+    "apps.core.backends.CachedModelBackend",
+    # Still accepted for sessions created before the cached backend was introduced
+    "django.contrib.auth.backends.ModelBackend",
+]
+CACHED_USER_TIMEOUT = int(os.environ.get("CACHED_USER_TIMEOUT", 60 * 5))
+
+# Sessions are read from the cache and written through to the database
+SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
 
 # Celery Configuration
 CELERY_BROKER_URL = os.environ.get("CELERY_BROKER_URL", "redis://localhost:6379/0")
@@ -159,6 +197,98 @@ CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_TIMEZONE = TIME_ZONE
 
+# Redis used for materialized timelines and other hot data
+REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/1")
+
+# Caches. CACHE_BACKEND lets tests swap Redis for an in-process cache.
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "django.core.cache.backends.redis.RedisCache")
+CACHE_URL = os.environ.get("CACHE_URL", REDIS_URL)
+# Each process keeps a bounded pool of connections per cache and waits for a free one
+# instead of opening connections without limit under load.
+CACHE_OPTIONS = {
+    "pool_class": "redis.BlockingConnectionPool",
+    "max_connections": int(os.environ.get("CACHE_MAX_CONNECTIONS", 20)),
+    "timeout": 5,
+    "socket_connect_timeout": 1,
+    "socket_timeout": 1,
+}
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKEND,
+        "LOCATION": CACHE_URL,
+        "OPTIONS": CACHE_OPTIONS,
+    },
+    # Rendered template fragments, such as tweet cards
+    "fragments": {
+        "BACKEND": CACHE_BACKEND,
+        "LOCATION": CACHE_URL,
+        "KEY_PREFIX": "fragments",
+        "OPTIONS": CACHE_OPTIONS,
+    },
+}
+
+# Home timelines
+TIMELINE_MAX_LENGTH = int(os.environ.get("TIMELINE_MAX_LENGTH", 800))
+TIMELINE_TTL = int(os.environ.get("TIMELINE_TTL", 60 * 60 * 24 * 7))
+TIMELINE_FANOUT_FOLLOWER_LIMIT = int(os.environ.get("TIMELINE_FANOUT_FOLLOWER_LIMIT", 10_000))
+TIMELINE_FANOUT_BATCH_SIZE = int(os.environ.get("TIMELINE_FANOUT_BATCH_SIZE", 1000))
+
+# Retweet notifications are collected for this many seconds before a digest is sent
+NOTIFICATION_DIGEST_WINDOW = int(os.environ.get("NOTIFICATION_DIGEST_WINDOW", 60 * 5))
+
+# Live updates: seconds of updates coalesced into one event, seconds between keepalives
+# of idle streams, how long browsers wait before reconnecting a dropped stream, and
+# seconds a page's stream token stays valid for reconnecting
+LIVE_THROTTLE = float(os.environ.get("LIVE_THROTTLE", 1))
+LIVE_KEEPALIVE = float(os.environ.get("LIVE_KEEPALIVE", 15))
+LIVE_RETRY_MS = int(os.environ.get("LIVE_RETRY_MS", 5000))
+LIVE_TOKEN_MAX_AGE = int(os.environ.get("LIVE_TOKEN_MAX_AGE", 60 * 60 * 12))
+
+# Trending tweets: seconds for the weight of a like or retweet to halve, and number of
+# tweets in the Explore page's Top mode
+TRENDING_HALF_LIFE = int(os.environ.get("TRENDING_HALF_LIFE", 60 * 60 * 6))
+TRENDING_SIZE = int(os.environ.get("TRENDING_SIZE", 100))
+
+# "Who to follow" recommendations kept per user. See apps/core/recommendations.py.
+RECOMMENDATIONS_SIZE = int(os.environ.get("RECOMMENDATIONS_SIZE", 50))
+
+# Months of tweet and like partitions created ahead of time. See apps/core/partitions.py.
+PARTITION_MONTHS_AHEAD = int(os.environ.get("PARTITION_MONTHS_AHEAD", 3))
+
+# Buffer likes in Redis and write them to the database in batches from the flush_likes
+# task. See apps/core/like_buffer.py.
+LIKE_WRITE_BEHIND = os.environ.get("LIKE_WRITE_BEHIND", "False").lower() == "true"
+
+# Serve the feeds, tweet pages and likes with the async views in apps/core/async_views.py
+ASYNC_VIEWS = os.environ.get("ASYNC_VIEWS", "False").lower() == "true"
+
+CELERY_BEAT_SCHEDULE = {
+    "send-notification-digests": {
+        "task": "apps.core.tasks.send_notification_digests",
+        "schedule": int(os.environ.get("NOTIFICATION_DIGEST_INTERVAL", 30)),
+    },
+    "write-notifications": {
+        "task": "apps.core.tasks.write_notifications",
+        "schedule": int(os.environ.get("NOTIFICATION_WRITE_INTERVAL", 5)),
+    },
+    "flush-likes": {
+        "task": "apps.core.tasks.flush_likes",
+        "schedule": float(os.environ.get("LIKE_FLUSH_INTERVAL", 2)),
+    },
+    "update-trending": {
+        "task": "apps.core.tasks.update_trending",
+        "schedule": int(os.environ.get("TRENDING_INTERVAL", 60)),
+    },
+    "update-recommendations": {
+        "task": "apps.core.tasks.update_recommendations",
+        "schedule": int(os.environ.get("RECOMMENDATIONS_INTERVAL", 60 * 60 * 24)),
+    },
+    "ensure-partitions": {
+        "task": "apps.core.tasks.ensure_partitions",
+        "schedule": 60 * 60 * 24,
+    },
+}
+
 # Celery Test Configuration
 CELERY_TASK_ALWAYS_EAGER = os.environ.get("CELERY_TASK_ALWAYS_EAGER", "False").lower() == "true"
 CELERY_TASK_EAGER_PROPAGATES = os.environ.get("CELERY_TASK_EAGER_PROPAGATES", "False").lower() == "true"
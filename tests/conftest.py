@@ -1,10 +1,32 @@
+import fakeredis
 import pytest
+from django.core.cache import caches
 from django.test import Client
 
+from apps.core import redis_client
 from apps.core.models import CustomUser, Tweet
 from tests.factories import CustomUserFactory, TweetFactory
 
 
+@pytest.fixture(autouse=True)
+def fake_redis(monkeypatch: pytest.MonkeyPatch) -> fakeredis.FakeRedis:
+    """Replace the shared Redis client, and the asyncio clients, with in-memory fakes for every test."""
+    server = fakeredis.FakeServer()
+    client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    monkeypatch.setattr(redis_client, "_client", client)
+    monkeypatch.setattr(
+        redis_client, "get_async_redis", lambda: fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+    )
+    return client
+
+
+@pytest.fixture(autouse=True)
+def clear_caches() -> None:
+    """Start every test with empty in-process caches."""
+    for cache in caches.all():
+        cache.clear()
+
+
 @pytest.fixture
 def user() -> CustomUser:
     return CustomUserFactory()
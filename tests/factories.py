@@ -21,7 +21,8 @@ class TweetFactory(DjangoModelFactory):
         model = Tweet
 
     user = factory.SubFactory(CustomUserFactory)
-    content = factory.Faker("text", max_nb_chars=280)
+    # Retweets have no content of their own
+    content = factory.Maybe("parent", "", factory.Faker("text", max_nb_chars=280))
     created_at = factory.LazyFunction(timezone.now)
     parent = None
 
@@ -0,0 +1,171 @@
+import importlib
+from collections.abc import Callable, Iterator
+from typing import Any
+
+import pytest
+from django.core.cache import caches
+from django.test import Client
+from django.urls import clear_url_caches, reverse
+
+import apps.core.urls
+import config.urls
+from apps.core import async_views
+from apps.core.models import CustomUser, Like, Tweet
+from tests.factories import CustomUserFactory, FollowFactory, LikeFactory, TweetFactory
+
+
+@pytest.fixture
+def use_async_views(settings: Any) -> Iterator[Callable[[bool], None]]:
+    """Return a function switching the URLs between the sync and async views."""
+
+    def use(enabled: bool) -> None:
+        settings.ASYNC_VIEWS = enabled
+        importlib.reload(apps.core.urls)
+        importlib.reload(config.urls)
+        clear_url_caches()
+        for cache in caches.all():
+            cache.clear()
+
+    use(True)
+    yield use
+    use(False)
+
+
+@pytest.fixture(autouse=True)
+def async_unsafe(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Make sync database access from the event loop raise, as it does outside of tests."""
+    monkeypatch.delenv("DJANGO_ALLOW_ASYNC_UNSAFE", raising=False)
+
+
+def page_state(client: Client, url: str, **extra: Any) -> tuple[list[int], set[int], set[int], str | None]:
+    response = client.get(url, **extra)
+    assert response.status_code == 200
+    context = response.context
+    return (
+        [tweet.id for tweet in context["tweets"]],
+        context["liked_tweets"],
+        context["retweeted_tweets"],
+        context["page_obj"].next_cursor,
+    )
+
+
+@pytest.mark.django_db()
+class TestAsyncViews:
+    @pytest.mark.parametrize("name", ["home", "explore"])
+    def test_feeds__match_sync_views(
+        self, logged_in_client: Client, use_async_views: Callable[[bool], None], name: str
+    ) -> None:
+        followed = CustomUserFactory()
+        FollowFactory(follower=logged_in_client.user, following=followed)
+        tweets = TweetFactory.create_batch(8, user=followed)
+        LikeFactory(user=logged_in_client.user, tweet=tweets[-1])
+        TweetFactory(user=logged_in_client.user, parent=tweets[-2])
+
+        async_page = page_state(logged_in_client, reverse(name))
+        use_async_views(False)
+        sync_page = page_state(logged_in_client, reverse(name))
+
+        assert async_page == sync_page
+        assert async_page[1] == {tweets[-1].id}
+        assert async_page[2] == {tweets[-2].id}
+        assert async_page[3] is not None
+
+    def test_explore__serves_next_page_as_partial(
+        self, logged_in_client: Client, use_async_views: Callable[[bool], None]
+    ) -> None:
+        tweets = TweetFactory.create_batch(8)
+        _, _, _, cursor = page_state(logged_in_client, reverse("explore"))
+
+        response = logged_in_client.get(reverse("explore"), {"cursor": cursor}, HTTP_HX_REQUEST="true")
+
+        assert [tweet.id for tweet in response.context["tweets"]] == [tweets[1].id, tweets[0].id]
+        assert [template.name for template in response.templates][0] == "core/timeline.html"
+
+    def test_explore__is_cached_per_session(
+        self, logged_in_client: Client, use_async_views: Callable[[bool], None], django_assert_num_queries: Any
+    ) -> None:
+        TweetFactory()
+        # Responses setting the CSRF cookie are not cached
+        logged_in_client.get(reverse("explore"))
+        first = logged_in_client.get(reverse("explore"))
+        TweetFactory()
+
+        with django_assert_num_queries(0):
+            second = logged_in_client.get(reverse("explore"))
+
+        assert second.content == first.content
+
+    def test_tweet_detail__shows_retweets(
+        self, logged_in_client: Client, use_async_views: Callable[[bool], None], tweet: Tweet
+    ) -> None:
+        retweet = TweetFactory(parent=tweet)
+        LikeFactory(user=logged_in_client.user, tweet=tweet)
+
+        response = logged_in_client.get(reverse("tweet_detail", kwargs={"pk": tweet.id}))
+
+        assert response.status_code == 200
+        assert response.context["tweet"] == tweet
+        assert response.context["retweets"] == [retweet]
+        assert response.context["liked_tweets"] == {tweet.id}
+
+    def test_tweet_detail__shows_latest_retweets_and_counts_the_rest(
+        self, logged_in_client: Client, use_async_views: Callable[[bool], None], tweet: Tweet
+    ) -> None:
+        retweets = TweetFactory.create_batch(12, parent=tweet)
+
+        response = logged_in_client.get(reverse("tweet_detail", kwargs={"pk": tweet.id}))
+
+        latest = sorted(retweets, key=lambda retweet: retweet.created_at, reverse=True)[:10]
+        assert response.context["retweets"] == latest
+        assert response.context["more_retweets_count"] == 2
+        assert "and 2 more" in response.content.decode()
+
+    def test_tweet_detail__shows_thread(
+        self, logged_in_client: Client, use_async_views: Callable[[bool], None], tweet: Tweet
+    ) -> None:
+        reply = TweetFactory(user=tweet.user, reply_to=tweet)
+        nested = TweetFactory(user=tweet.user, reply_to=reply)
+        LikeFactory(user=logged_in_client.user, tweet=nested)
+
+        response = logged_in_client.get(reverse("tweet_detail", kwargs={"pk": reply.id}))
+
+        assert response.context["ancestors"] == [tweet]
+        assert [(r.id, r.thread_depth) for r in response.context["replies"]] == [(nested.id, 1)]
+        assert response.context["liked_tweets"] == {nested.id}
+
+    def test_tweet_detail__returns_404_for_missing_tweets(
+        self, logged_in_client: Client, use_async_views: Callable[[bool], None]
+    ) -> None:
+        assert logged_in_client.get(reverse("tweet_detail", kwargs={"pk": 0})).status_code == 404
+
+    def test_like_tweet__likes_and_unlikes(
+        self, logged_in_client: Client, use_async_views: Callable[[bool], None], tweet: Tweet
+    ) -> None:
+        like_url = reverse("like_tweet", kwargs={"tweet_id": tweet.id})
+        unlike_url = reverse("unlike_tweet", kwargs={"tweet_id": tweet.id})
+
+        liked = logged_in_client.post(like_url)
+        liked_again = logged_in_client.post(like_url)
+        unliked = logged_in_client.post(unlike_url)
+
+        assert liked.context["tweet"].likes_count == 1
+        assert liked.context["tweet"].liked_by_viewer is True
+        assert liked_again.context["tweet"].likes_count == 1
+        assert unliked.context["tweet"].likes_count == 0
+        assert unliked.context["tweet"].liked_by_viewer is False
+        assert not Like.objects.filter(tweet=tweet).exists()
+
+    def test_anonymous_users__are_redirected_to_login(
+        self, client: Client, use_async_views: Callable[[bool], None], tweet: Tweet
+    ) -> None:
+        response = client.get(reverse("home"))
+
+        assert response.status_code == 302
+        assert response.url.startswith(reverse("login"))
+
+    def test_urls__route_to_async_views(self, user: CustomUser, use_async_views: Callable[[bool], None]) -> None:
+        match = apps.core.urls.urlpatterns[0].resolve("")
+
+        assert match is not None
+        assert match.func.view_class is async_views.HomeView
+        assert async_views.HomeView.view_is_async
@@ -0,0 +1,71 @@
+from typing import Any
+
+import pytest
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.core.backends import CachedModelBackend
+from apps.core.models import CustomUser
+from tests.factories import CustomUserFactory, FollowFactory, TweetFactory
+
+
+@pytest.mark.django_db()
+class TestCachedModelBackend:
+    def test_get_user__is_served_from_cache(self, user: CustomUser, django_assert_num_queries: Any) -> None:
+        backend = CachedModelBackend()
+
+        with django_assert_num_queries(1):
+            backend.get_user(user.pk)
+            cached = backend.get_user(user.pk)
+
+        assert cached == user
+
+    def test_get_user__reflects_profile_and_counter_changes(self, user: CustomUser) -> None:
+        backend = CachedModelBackend()
+        backend.get_user(user.pk)
+
+        user.bio = "Updated bio"
+        user.save()
+        FollowFactory(follower=user)
+        cached = backend.get_user(user.pk)
+
+        assert cached is not None
+        assert (cached.bio, cached.following_count) == ("Updated bio", 1)
+
+
+@pytest.mark.django_db()
+class TestCachePolicyMixin:
+    def test_explore__repeat_request_needs_no_queries(self, logged_in_client: Client) -> None:
+        TweetFactory.create_batch(3)
+        # Responses setting the CSRF cookie are not cached
+        logged_in_client.get(reverse("explore"))
+        first = logged_in_client.get(reverse("explore"))
+
+        with CaptureQueriesContext(connection) as queries:
+            second = logged_in_client.get(reverse("explore"))
+
+        assert second.content == first.content
+        assert len(queries.captured_queries) == 0
+        assert "HX-Request" in second["Vary"]
+
+    def test_profile__reflects_viewers_own_follow_immediately(self, logged_in_client: Client) -> None:
+        other = CustomUserFactory()
+        url = reverse("profile", kwargs={"username": other.username})
+        logged_in_client.get(url)
+        assert logged_in_client.get(url).context["is_following"] is False
+
+        logged_in_client.post(reverse("follow_user", kwargs={"username": other.username}))
+        response = logged_in_client.get(url)
+
+        assert response.context["is_following"] is True
+
+    def test_explore__htmx_partial_is_cached_separately(self, logged_in_client: Client) -> None:
+        TweetFactory.create_batch(7)
+        logged_in_client.get(reverse("explore"))
+        logged_in_client.get(reverse("explore"))
+
+        response = logged_in_client.get(reverse("explore"), HTTP_HX_REQUEST="true")
+
+        assert "<html" not in response.content.decode()
@@ -0,0 +1,16 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+
+@pytest.mark.django_db(transaction=True)
+def test_connection_overhead__reports_new_and_reused_connection_latency() -> None:
+    stdout = StringIO()
+
+    call_command("connection_overhead", queries=5, stdout=stdout)
+
+    output = stdout.getvalue()
+    assert "new connection p50=" in output
+    assert "reused connection p50=" in output
+    assert "connection setup adds" in output
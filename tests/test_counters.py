@@ -0,0 +1,77 @@
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.core.models import CustomUser, Tweet
+from tests.factories import CustomUserFactory, FollowFactory, LikeFactory, TweetFactory
+
+
+@pytest.mark.django_db()
+class TestCounters:
+    def test_like_tweet__updates_likes_count(self, logged_in_client: Client, tweet: Tweet) -> None:
+        logged_in_client.post(reverse("like_tweet", kwargs={"tweet_id": tweet.id}))
+        tweet.refresh_from_db()
+        assert tweet.likes_count == 1
+
+        logged_in_client.post(reverse("unlike_tweet", kwargs={"tweet_id": tweet.id}))
+        tweet.refresh_from_db()
+        assert tweet.likes_count == 0
+
+    def test_retweet__updates_retweet_and_tweet_counts(self, logged_in_client: Client, tweet: Tweet) -> None:
+        logged_in_client.post(reverse("retweet", kwargs={"tweet_id": tweet.id}))
+
+        tweet.refresh_from_db()
+        logged_in_client.user.refresh_from_db()
+        assert tweet.retweets_count == 1
+        assert logged_in_client.user.tweets_count == 2
+
+    def test_retweet__updates_counter_in_the_partition_of_the_original(
+        self, logged_in_client: Client, tweet: Tweet
+    ) -> None:
+        with CaptureQueriesContext(connection) as queries:
+            logged_in_client.post(reverse("retweet", kwargs={"tweet_id": tweet.id}))
+            logged_in_client.post(reverse("undo_retweet", kwargs={"tweet_id": tweet.id}))
+
+        updates = [query["sql"] for query in queries if '"retweets_count" = GREATEST' in query["sql"]]
+        assert len(updates) == 2
+        assert all('"core_tweet"."created_at" =' in sql for sql in updates)
+
+    def test_follow_user__updates_follow_counts(self, logged_in_client: Client) -> None:
+        other_user = CustomUserFactory()
+
+        logged_in_client.post(reverse("follow_user", kwargs={"username": other_user.username}))
+
+        other_user.refresh_from_db()
+        logged_in_client.user.refresh_from_db()
+        assert other_user.followers_count == 1
+        assert logged_in_client.user.following_count == 1
+
+    def test_delete_user__cascades_to_counters(self, tweet: Tweet) -> None:
+        fan = CustomUserFactory()
+        LikeFactory(user=fan, tweet=tweet)
+        FollowFactory(follower=fan, following=tweet.user)
+        TweetFactory(user=fan, parent=tweet)
+
+        fan.delete()
+
+        tweet.refresh_from_db()
+        tweet.user.refresh_from_db()
+        assert (tweet.likes_count, tweet.retweets_count, tweet.user.followers_count) == (0, 0, 0)
+
+
+@pytest.mark.django_db()
+class TestReconcileCountersCommand:
+    def test_reconcile_counters__fixes_drift(self, user: CustomUser, tweet: Tweet) -> None:
+        LikeFactory(tweet=tweet)
+        Tweet.objects.filter(pk=tweet.pk).update(likes_count=42)
+        CustomUser.objects.filter(pk=user.pk).update(tweets_count=0)
+
+        call_command("reconcile_counters", batch_size=1)
+
+        tweet.refresh_from_db()
+        user.refresh_from_db()
+        assert tweet.likes_count == 1
+        assert user.tweets_count == 1
@@ -0,0 +1,136 @@
+from typing import Any
+
+import pytest
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.core.hydration import hydrate_tweets, invalidate_tweet_card
+from apps.core.models import CustomUser, Tweet
+from tests.factories import CustomUserFactory, LikeFactory, TweetFactory
+
+
+def create_tweets(count: int, viewer: CustomUser) -> None:
+    """Create a mix of tweets and retweets, some of them liked and retweeted by the viewer."""
+    for i in range(count):
+        tweet = TweetFactory(parent=TweetFactory() if i % 2 else None)
+        if i % 3 == 0:
+            LikeFactory(user=viewer, tweet=tweet)
+            TweetFactory(user=viewer, parent=tweet)
+
+
+def count_queries(client: Client, url: str) -> int:
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(queries.captured_queries)
+
+
+@pytest.mark.django_db()
+class TestHydrateTweets:
+    def test_hydrate_tweets__attaches_viewer_state(self, user: CustomUser) -> None:
+        liked, retweeted, other = TweetFactory.create_batch(3)
+        LikeFactory(user=user, tweet=liked)
+        TweetFactory(user=user, parent=retweeted)
+
+        tweets = {tweet.id: tweet for tweet in hydrate_tweets(Tweet.objects.filter(parent=None), user)}
+
+        assert (tweets[liked.id].liked_by_viewer, tweets[liked.id].retweeted_by_viewer) == (True, False)
+        assert (tweets[retweeted.id].liked_by_viewer, tweets[retweeted.id].retweeted_by_viewer) == (False, True)
+        assert (tweets[other.id].liked_by_viewer, tweets[other.id].retweeted_by_viewer) == (False, False)
+
+    @pytest.mark.parametrize("url_name", ["explore", "profile"])
+    def test_tweet_listing__query_count_is_independent_of_page_size(
+        self, logged_in_client: Client, url_name: str
+    ) -> None:
+        viewer = logged_in_client.user
+        author = TweetFactory().user
+        kwargs = {"username": author.username} if url_name == "profile" else {}
+        url = reverse(url_name, kwargs=kwargs)
+
+        create_tweets(1, viewer)
+        TweetFactory(user=author)
+        small_page = count_queries(logged_in_client, url)
+
+        create_tweets(8, viewer)
+        TweetFactory.create_batch(4, user=author, parent=TweetFactory())
+        full_page = count_queries(logged_in_client, url)
+
+        assert small_page == full_page
+
+
+@pytest.mark.django_db()
+class TestTweetContextMixin:
+    def test_viewer_state__is_scoped_to_tweets_on_page(self, logged_in_client: Client) -> None:
+        viewer = logged_in_client.user
+        off_page = TweetFactory()
+        LikeFactory(user=viewer, tweet=off_page)
+        TweetFactory(user=viewer, parent=off_page)
+        on_page = TweetFactory()
+        LikeFactory(user=viewer, tweet=on_page)
+
+        response = logged_in_client.get(reverse("tweet_detail", kwargs={"pk": on_page.id}))
+
+        assert response.context["liked_tweets"] == {on_page.id}
+        assert response.context["retweeted_tweets"] == set()
+
+
+@pytest.mark.django_db()
+class TestTweetCardCache:
+    def test_tweet_card__is_served_from_cache_until_invalidated(self, client: Client, tweet: Tweet) -> None:
+        def render_explore() -> str:
+            # A fresh session each time, so only the card cache can serve the page
+            client.force_login(tweet.user)
+            return client.get(reverse("explore")).content.decode()
+
+        render_explore()
+        Tweet.objects.filter(pk=tweet.pk).update(content="Edited without invalidating")
+
+        cached = render_explore()
+        LikeFactory(tweet=tweet)
+        liked = render_explore()
+        invalidate_tweet_card(tweet.id)
+        invalidated = render_explore()
+
+        assert "Edited without invalidating" not in cached
+        # Counters are rendered outside the cached fragment, so likes leave the card cached
+        assert "Edited without invalidating" not in liked
+        assert f'data-testid="like-count-{tweet.id}">1<' in liked
+        assert "Edited without invalidating" in invalidated
+
+    def test_editing_tweet__invalidates_cards_of_its_retweets(self, client: Client, tweet: Tweet) -> None:
+        retweet = TweetFactory(parent=tweet)
+
+        def render_retweeter_profile() -> str:
+            # A fresh session each time, so only the card cache can serve the page
+            client.force_login(retweet.user)
+            return client.get(reverse("profile", kwargs={"username": retweet.user.username})).content.decode()
+
+        render_retweeter_profile()
+        tweet.content = "Edited"
+        tweet.save()
+
+        assert "Edited" in render_retweeter_profile()
+
+    def test_tweet_card__applies_viewer_state_to_cached_card(self, client: Client, tweet: Tweet) -> None:
+        liker, other = CustomUserFactory.create_batch(2)
+        LikeFactory(user=liker, tweet=tweet)
+
+        client.force_login(other)
+        assert "like-btn liked" not in client.get(reverse("explore")).content.decode()
+        client.force_login(liker)
+        assert "like-btn liked" in client.get(reverse("explore")).content.decode()
+
+    def test_invalidate_tweet_card__replaces_version_after_commit(
+        self, tweet: Tweet, django_capture_on_commit_callbacks: Any
+    ) -> None:
+        (tweet,) = hydrate_tweets([tweet], tweet.user)
+        versions = [tweet.card_version]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            invalidate_tweet_card(tweet.id)
+            versions.append(hydrate_tweets([tweet], tweet.user)[0].card_version)
+        versions.append(hydrate_tweets([tweet], tweet.user)[0].card_version)
+
+        assert len(set(versions)) == 3
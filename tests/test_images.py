@@ -0,0 +1,146 @@
+import io
+from pathlib import Path
+from typing import Any
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client
+from django.urls import reverse
+from PIL import Image
+
+from apps.core.forms import TweetForm
+from apps.core.models import CustomUser, Tweet
+from apps.core.tasks import process_tweet_image
+from tests.factories import TweetFactory
+
+
+def image_file(size: tuple[int, int], image_format: str = "JPEG", mode: str = "RGB", **options: Any) -> bytes:
+    buffer = io.BytesIO()
+    Image.new(mode, size, (255, 0, 0, 128)).save(buffer, format=image_format, **options)
+    return buffer.getvalue()
+
+
+def animated_gif(size: tuple[int, int]) -> bytes:
+    frames = [Image.new("RGB", size, color) for color in ("red", "blue")]
+    buffer = io.BytesIO()
+    frames[0].save(buffer, format="GIF", save_all=True, append_images=frames[1:], duration=100, loop=0)
+    return buffer.getvalue()
+
+
+def photo_with_exif(size: tuple[int, int], orientation: int = 1) -> bytes:
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    exif[0x010F] = "Camera maker"
+    return image_file(size, exif=exif)
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings: Any, tmp_path: Path) -> Path:
+    settings.MEDIA_ROOT = tmp_path
+    settings.TWEET_IMAGE_WIDTHS = [320, 640, 1280]
+    return tmp_path
+
+
+@pytest.mark.django_db()
+class TestProcessTweetImage:
+    def test_process__makes_renditions_without_metadata(self, user: CustomUser, media_root: Path) -> None:
+        tweet = TweetFactory(user=user, image=SimpleUploadedFile("photo.jpg", photo_with_exif((1600, 1200))))
+        upload = media_root / tweet.image.name
+
+        process_tweet_image(tweet.id)
+
+        tweet.refresh_from_db()
+        assert [(r["format"], r["width"], r["height"]) for r in tweet.image_renditions] == [
+            ("webp", 320, 240),
+            ("jpeg", 320, 240),
+            ("webp", 640, 480),
+            ("jpeg", 640, 480),
+            ("webp", 1280, 960),
+            ("jpeg", 1280, 960),
+        ]
+        assert tweet.image.name == tweet.image_renditions[-1]["name"]
+        assert not upload.exists()
+        for rendition in tweet.image_renditions:
+            with Image.open(media_root / rendition["name"]) as image:
+                assert image.format == rendition["format"].upper()
+                assert image.size == (rendition["width"], rendition["height"])
+                assert not image.getexif()
+
+    def test_process__applies_orientation_and_never_upscales(self, user: CustomUser, media_root: Path) -> None:
+        # Stored sideways, displayed 300 pixels wide
+        tweet = TweetFactory(user=user, image=SimpleUploadedFile("photo.jpg", photo_with_exif((400, 300), 6)))
+
+        process_tweet_image(tweet.id)
+
+        tweet.refresh_from_db()
+        assert {(r["width"], r["height"]) for r in tweet.image_renditions} == {(300, 400)}
+
+    def test_process__flattens_transparency_for_jpeg(self, user: CustomUser, media_root: Path) -> None:
+        png = image_file((100, 50), "PNG", mode="RGBA")
+        tweet = TweetFactory(user=user, image=SimpleUploadedFile("logo.png", png))
+
+        process_tweet_image(tweet.id)
+
+        tweet.refresh_from_db()
+        modes = {}
+        for rendition in tweet.image_renditions:
+            with Image.open(media_root / rendition["name"]) as image:
+                modes[rendition["format"]] = image.mode
+        assert modes == {"webp": "RGBA", "jpeg": "RGB"}
+
+    def test_process__leaves_undecodable_uploads(self, user: CustomUser, media_root: Path) -> None:
+        tweet = TweetFactory(user=user, image=SimpleUploadedFile("photo.jpg", b"not an image"))
+
+        process_tweet_image(tweet.id)
+
+        tweet.refresh_from_db()
+        assert tweet.image_renditions == []
+        assert (media_root / tweet.image.name).exists()
+
+    def test_process__leaves_animated_uploads(self, user: CustomUser, media_root: Path) -> None:
+        tweet = TweetFactory(user=user, image=SimpleUploadedFile("animation.gif", animated_gif((400, 300))))
+
+        process_tweet_image(tweet.id)
+
+        tweet.refresh_from_db()
+        assert tweet.image_renditions == []
+        with Image.open(media_root / tweet.image.name) as image:
+            assert image.n_frames == 2
+
+
+@pytest.mark.django_db()
+class TestTweetImages:
+    def test_new_tweet__processes_uploaded_image(self, logged_in_client: Client) -> None:
+        upload = SimpleUploadedFile("photo.jpg", image_file((800, 400)), content_type="image/jpeg")
+
+        logged_in_client.post(reverse("new_tweet"), {"content": "Look", "image": upload})
+
+        tweet = Tweet.objects.get(content="Look")
+        assert [r["width"] for r in tweet.image_renditions if r["format"] == "webp"] == [320, 640, 800]
+
+    def test_tweet_card__offers_renditions_with_dimensions(self, logged_in_client: Client, user: CustomUser) -> None:
+        tweet = TweetFactory(user=user, image=SimpleUploadedFile("photo.jpg", image_file((800, 400))))
+        process_tweet_image(tweet.id)
+
+        content = logged_in_client.get(reverse("tweet_detail", kwargs={"pk": tweet.id})).content.decode()
+
+        assert '<source type="image/webp" srcset="/media/tweet_images/renditions/' in content
+        assert "-320.webp 320w, " in content
+        assert "-800.jpeg 800w" in content
+        assert 'width="800" height="400"' in content
+
+    @pytest.mark.parametrize(
+        ("name", "upload", "error"),
+        [
+            ("image.bmp", image_file((10, 10), "BMP"), "Upload a JPEG, PNG, GIF or WebP image."),
+            ("image.png", image_file((600, 600), "PNG"), "Images must be smaller than"),
+            ("animation.gif", animated_gif((10, 10)), "Animated images are not supported."),
+        ],
+    )
+    def test_tweet_form__rejects_unsupported_images(self, settings: Any, name: str, upload: bytes, error: str) -> None:
+        settings.TWEET_IMAGE_MAX_UPLOAD_SIZE = 1024
+
+        form = TweetForm({"content": "Look"}, {"image": SimpleUploadedFile(name, upload)})
+
+        assert not form.is_valid()
+        assert error in form.errors["image"][0]
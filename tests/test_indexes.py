@@ -0,0 +1,93 @@
+import re
+from collections.abc import Callable
+
+import pytest
+from django.db import connection
+from django.db.models import QuerySet
+
+from apps.core.hydration import with_card_relations
+from apps.core.models import CustomUser, Follow, Like, Notification, Tweet
+from apps.core.pagination import CursorPaginator, encode_cursor
+from apps.core.search import search_tweets, search_users
+from apps.core.timeline import timeline_source_queryset
+from tests.factories import FollowFactory, LikeFactory, TweetFactory
+
+QueryFactory = Callable[[CustomUser, Tweet], QuerySet]
+
+# name -> (query issued by a view, index it is expected to use)
+HOT_QUERIES: dict[str, tuple[QueryFactory, str | None]] = {
+    "explore_first_page": (
+        lambda user, tweet: CursorPaginator(with_card_relations(Tweet.objects.all()), 6).get_page_queryset(None),
+        "core_tweet_created_id_idx",
+    ),
+    "explore_next_page": (
+        lambda user, tweet: CursorPaginator(with_card_relations(Tweet.objects.all()), 6).get_page_queryset(
+            encode_cursor([tweet.created_at, tweet.id])
+        ),
+        "core_tweet_created_id_idx",
+    ),
+    "home_timeline_rebuild": (lambda user, tweet: timeline_source_queryset(user)[:800], None),
+    "profile_tweets": (lambda user, tweet: with_card_relations(user.tweets.all()), "core_tweet_user_created_idx"),
+    "tweet_detail_retweets": (
+        lambda user, tweet: Tweet.objects.filter(parent=tweet).select_related("user"),
+        "core_tweet_retweet_idx",
+    ),
+    "viewer_retweets": (
+        lambda user, tweet: Tweet.objects.filter(user=user, parent_id__in=[tweet.id]),
+        "core_tweet_retweet_idx",
+    ),
+    "viewer_likes": (lambda user, tweet: Like.objects.filter(user=user, tweet_id__in=[tweet.id]), None),
+    "retweet_toggle": (lambda user, tweet: Tweet.objects.filter(user=user, parent=tweet), "core_tweet_retweet_idx"),
+    "followers": (
+        lambda user, tweet: Follow.objects.filter(following=user).values_list("follower_id", flat=True),
+        "core_follow_followers_idx",
+    ),
+    "notifications": (
+        lambda user, tweet: CursorPaginator(Notification.objects.filter(recipient=user), 20).get_page_queryset(None),
+        "core_notification_feed_idx",
+    ),
+    # On tables this small the planner prefers the parent index over the GIN index
+    "tweet_search": (lambda user, tweet: search_tweets("hello world"), None),
+    "user_search": (lambda user, tweet: search_users("us"), "core_user_search_idx"),
+}
+
+
+def name_partition_indexes_after_parents(plan: str) -> str:
+    """Replace the names of the indexes of partitions in ``plan`` with those of their partitioned index."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname, parent.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "WHERE child.relkind = 'i'"
+        )
+        names = cursor.fetchall()
+    for child, parent in names:
+        plan = re.sub(rf"\b{child}\b", parent, plan)
+    return plan
+
+
+@pytest.mark.django_db()
+class TestHotQueryIndexes:
+    @pytest.mark.parametrize("name", HOT_QUERIES)
+    def test_hot_query__does_not_fall_back_to_sequential_scan(self, user: CustomUser, name: str) -> None:
+        tweet = TweetFactory(user=user)
+        FollowFactory(follower=user)
+        FollowFactory(following=user)
+        LikeFactory(user=user, tweet=tweet)
+        TweetFactory(user=user, parent=tweet)
+        # Enough original tweets by the user that scanning their profile index for a retweet
+        # costs more than looking it up in the retweet index
+        Tweet.objects.bulk_create(Tweet(user=user, content=f"tweet {i}") for i in range(500))
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {connection.ops.quote_name(Tweet._meta.db_table)}")
+            # Tables this small are always cheapest to scan, so only let the planner fall back
+            # to a sequential scan when no index can answer the query.
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        query, expected_index = HOT_QUERIES[name]
+
+        plan = name_partition_indexes_after_parents(query(user, tweet).explain())
+
+        assert "Seq Scan" not in plan, plan
+        if expected_index:
+            assert expected_index in plan, plan
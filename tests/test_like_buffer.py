@@ -0,0 +1,94 @@
+from typing import Any
+
+import fakeredis
+import pytest
+from django.test import Client
+from django.urls import reverse
+
+from apps.core import like_buffer
+from apps.core.models import Like, Tweet
+from apps.core.tasks import flush_likes
+from tests.factories import CustomUserFactory, LikeFactory
+
+
+@pytest.mark.django_db()
+class TestLikeBuffer:
+    @pytest.fixture(autouse=True)
+    def write_behind(self, settings: Any) -> None:
+        settings.LIKE_WRITE_BEHIND = True
+
+    def test_like_tweet__is_served_from_buffer_until_flushed(self, logged_in_client: Client, tweet: Tweet) -> None:
+        response = logged_in_client.post(reverse("like_tweet", kwargs={"tweet_id": tweet.id}))
+
+        assert response.context["tweet"].liked_by_viewer is True
+        assert response.context["tweet"].likes_count == 1
+        assert not Like.objects.exists()
+
+        flush_likes()
+
+        tweet.refresh_from_db()
+        assert tweet.likes_count == 1
+        assert tweet.is_liked_by(logged_in_client.user)
+        response = logged_in_client.get(reverse("tweet_detail", kwargs={"pk": tweet.id}))
+        assert response.context["liked_tweets"] == {tweet.id}
+
+    def test_set_liked__and_back_before_flush_writes_nothing(self, tweet: Tweet) -> None:
+        user = CustomUserFactory()
+
+        assert like_buffer.set_liked(user.id, tweet, True) is True
+        assert like_buffer.set_liked(user.id, tweet, True) is False
+        assert like_buffer.set_liked(user.id, tweet, False) is True
+        like_buffer.flush()
+
+        tweet.refresh_from_db()
+        assert tweet.likes_count == 0
+        assert not Like.objects.exists()
+
+    def test_set_liked__unlikes_existing_like(self, tweet: Tweet) -> None:
+        like = LikeFactory(tweet=tweet)
+
+        assert like_buffer.set_liked(like.user_id, tweet, True) is False
+        assert like_buffer.set_liked(like.user_id, tweet, False) is True
+        like_buffer.flush()
+
+        tweet.refresh_from_db()
+        assert tweet.likes_count == 0
+        assert not Like.objects.exists()
+
+    def test_flush__writes_again_after_crash(self, fake_redis: fakeredis.FakeRedis, tweet: Tweet) -> None:
+        users = CustomUserFactory.create_batch(3)
+        for user in users:
+            like_buffer.set_liked(user.id, tweet, True)
+        like_buffer.start_flush(tweet.id)
+        # The likes were written but the flush crashed before clearing them from Redis
+        like_buffer.write_likes({tweet.id: {user.id: True for user in users}})
+
+        assert like_buffer.flush() == 1
+
+        tweet.refresh_from_db()
+        assert tweet.likes_count == 3
+        assert Like.objects.filter(tweet=tweet).count() == 3
+        assert not fake_redis.exists(like_buffer.flushing_key(tweet.id), like_buffer.FLUSHING_KEY)
+
+    def test_flush_likes__skips_run_while_lock_is_held(self, fake_redis: fakeredis.FakeRedis, tweet: Tweet) -> None:
+        like_buffer.set_liked(CustomUserFactory().id, tweet, True)
+        fake_redis.set(like_buffer.FLUSH_LOCK_KEY, "other run")
+
+        flush_likes()
+
+        assert not Like.objects.exists()
+        assert fake_redis.get(like_buffer.FLUSH_LOCK_KEY) == "other run"
+
+    def test_flush_likes__keeps_lock_taken_over_by_next_run(
+        self, fake_redis: fakeredis.FakeRedis, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        def outlive_lock() -> int:
+            # The lock expired during the flush and the next run took it
+            fake_redis.set(like_buffer.FLUSH_LOCK_KEY, "next run")
+            return 0
+
+        monkeypatch.setattr(like_buffer, "flush", outlive_lock)
+
+        flush_likes()
+
+        assert fake_redis.get(like_buffer.FLUSH_LOCK_KEY) == "next run"
@@ -0,0 +1,118 @@
+import asyncio
+import json
+from collections.abc import Callable
+from typing import Any
+
+import pytest
+from asgiref.sync import async_to_sync, sync_to_async
+from django.test import Client
+from django.urls import reverse
+
+from apps.core import live
+from apps.core.models import CustomUser
+from apps.core.tasks import fan_out_tweet
+from tests.factories import CustomUserFactory, FollowFactory, LikeFactory, TweetFactory
+
+
+def parse_event(chunk: str) -> tuple[str, str]:
+    lines = chunk.strip().splitlines()
+    event = lines[0].removeprefix("event: ")
+    return event, "\n".join(line.removeprefix("data: ") for line in lines[1:])
+
+
+def stream(
+    feed: str, viewer: CustomUser, write: Callable[[], Any], events: int, tweet_ids: list[int] | None = None
+) -> list[tuple[str, str]]:
+    """Open a stream of ``feed``, run ``write`` once it is subscribed and collect the next events."""
+
+    async def run() -> list[tuple[str, str]]:
+        hub = live.get_hub()
+        channels = await live.home_channels(hub, viewer.id) if feed == "home" else [live.EXPLORE_CHANNEL]
+        chunks = live.stream_events(hub, channels, viewer.id, reverse(feed), tweet_ids or [])
+        await anext(chunks)
+        await sync_to_async(write)()
+        received = [parse_event(await asyncio.wait_for(anext(chunks), timeout=5)) for _ in range(events)]
+        await chunks.aclose()
+        assert hub.queues == {}
+        return received
+
+    return async_to_sync(run)()
+
+
+@pytest.mark.django_db()
+class TestLiveUpdates:
+    @pytest.fixture(autouse=True)
+    def fast_updates(self, settings: Any) -> None:
+        settings.LIVE_THROTTLE = 0.2
+
+    def test_stream__counts_new_tweets_of_followed_users(self, user: CustomUser) -> None:
+        followed = CustomUserFactory()
+        FollowFactory(follower=user, following=followed)
+        own, other = TweetFactory(user=user), TweetFactory(user=followed)
+
+        def write() -> None:
+            fan_out_tweet(own.id)
+            fan_out_tweet(other.id)
+
+        ((event, data),) = stream("home", user, write, 1)
+
+        assert event == "new-tweets"
+        assert "Show 1 new tweet<" in data
+
+    def test_stream__includes_tweets_of_followed_celebrities(self, user: CustomUser, settings: Any) -> None:
+        settings.TIMELINE_FANOUT_FOLLOWER_LIMIT = 1
+        celebrity = CustomUserFactory()
+        FollowFactory(follower=user, following=celebrity)
+        fan_out_tweet(TweetFactory(user=celebrity).id)
+        tweet = TweetFactory(user=celebrity)
+
+        ((event, data),) = stream("home", user, lambda: fan_out_tweet(tweet.id), 1)
+
+        assert event == "new-tweets"
+        assert "Show 1 new tweet<" in data
+
+    def test_stream__coalesces_counter_changes_of_tweets_on_page(
+        self, user: CustomUser, django_capture_on_commit_callbacks: Any
+    ) -> None:
+        tweet, off_page = TweetFactory.create_batch(2)
+
+        def write() -> None:
+            with django_capture_on_commit_callbacks(execute=True):
+                LikeFactory.create_batch(2, tweet=off_page)
+                LikeFactory.create_batch(3, tweet=tweet)
+                TweetFactory(parent=tweet)
+
+        ((event, data),) = stream("explore", user, write, 1, tweet_ids=[tweet.id])
+
+        assert event == "counters"
+        assert json.loads(data) == {str(tweet.id): {"likes_count": 3, "retweets_count": 1}}
+
+    def test_live_updates_view__streams_events_to_token_holders(self, user: CustomUser, client: Client) -> None:
+        url = reverse("live_updates", kwargs={"feed": "home"})
+
+        response = client.get(url, {"token": live.stream_token(user.id, "home")})
+
+        assert response.status_code == 200
+        assert response["Content-Type"] == "text/event-stream"
+        assert response["Cache-Control"] == "no-cache"
+
+    @pytest.mark.parametrize("feed", ["home", "explore"])
+    def test_feed_pages__link_stream_with_token(self, logged_in_client: Client, feed: str) -> None:
+        TweetFactory.create_batch(2)
+
+        response = logged_in_client.get(reverse(feed))
+
+        token = response.context["live_updates_url"].split("?token=")[1]
+        tweet_ids = [tweet.id for tweet in response.context["tweets"]]
+        assert live.read_stream_token(token, feed) == (logged_in_client.user.id, tweet_ids)
+        assert f'sse-connect="{response.context["live_updates_url"]}"' in response.content.decode()
+
+    def test_live_updates_view__rejects_invalid_tokens(self, user: CustomUser, client: Client) -> None:
+        url = reverse("live_updates", kwargs={"feed": "home"})
+
+        assert client.get(url).status_code == 401
+        assert client.get(url, {"token": "forged"}).status_code == 401
+        assert client.get(url, {"token": live.stream_token(user.id, "explore")}).status_code == 401
+
+    def test_live_updates_view__rejects_unknown_feeds(self, client: Client) -> None:
+        assert client.get(reverse("live_updates", kwargs={"feed": "nope"})).status_code == 404
@@ -0,0 +1,146 @@
+import json
+import smtplib
+import time
+from typing import Any, cast
+
+import pytest
+from django.core import mail
+from django.core.mail import EmailMultiAlternatives
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import Client
+from django.urls import reverse
+
+from apps.core import notifications
+from apps.core.models import CustomUser, Notification, Tweet
+from apps.core.tasks import send_notification_digests, write_notifications
+from tests.factories import CustomUserFactory, TweetFactory
+
+
+def make_due() -> None:
+    """Move every scheduled digest to the past."""
+    client = notifications.get_redis()
+    for recipient_id in cast(list[str], client.zrange(notifications.DUE_KEY, 0, -1)):
+        client.zadd(notifications.DUE_KEY, {recipient_id: 0})
+
+
+@pytest.mark.django_db()
+class TestNotificationDigests:
+    def test_retweets__are_coalesced_into_one_digest_per_recipient(self, tweet: Tweet) -> None:
+        other_tweet = TweetFactory(user=tweet.user)
+        for retweeter in CustomUserFactory.create_batch(3):
+            notifications.record_retweet(tweet.user_id, tweet.id, retweeter.username)
+        notifications.record_retweet(tweet.user_id, other_tweet.id, "someone")
+        make_due()
+
+        send_notification_digests()
+
+        assert len(mail.outbox) == 1
+        assert mail.outbox[0].to == [tweet.user.email]
+        assert mail.outbox[0].subject == "4 new retweets of your tweets"
+        html = str(cast(EmailMultiAlternatives, mail.outbox[0]).alternatives[0][0])
+        assert "and 2 others retweeted your tweet!" in html
+        assert other_tweet.content in html
+
+    def test_digest__is_not_sent_before_window_ends(self, tweet: Tweet) -> None:
+        notifications.record_retweet(tweet.user_id, tweet.id, "someone")
+
+        send_notification_digests()
+
+        assert mail.outbox == []
+        assert notifications.due_recipients(time.time() + 3600) == [tweet.user_id]
+
+    def test_digest__is_sent_by_next_run_after_failed_send(self, tweet: Tweet, monkeypatch: pytest.MonkeyPatch) -> None:
+        notifications.record_retweet(tweet.user_id, tweet.id, "someone")
+        make_due()
+
+        def fail(self: EmailBackend, messages: Any) -> int:
+            raise smtplib.SMTPServerDisconnected
+
+        with monkeypatch.context() as patch:
+            patch.setattr(EmailBackend, "send_messages", fail)
+            with pytest.raises(smtplib.SMTPServerDisconnected):
+                send_notification_digests()
+        send_notification_digests()
+        send_notification_digests()
+
+        assert [message.subject for message in mail.outbox] == ["someone retweeted your tweet!"]
+        assert notifications.due_recipients(time.time() + 3600) == []
+
+    def test_retweet_view__records_event_without_sending_mail(self, logged_in_client: Client) -> None:
+        author = CustomUserFactory()
+        original = TweetFactory(user=author)
+
+        logged_in_client.post(reverse("retweet", kwargs={"tweet_id": original.id}))
+        assert mail.outbox == []
+        make_due()
+        send_notification_digests()
+
+        user: CustomUser = logged_in_client.user
+        assert [message.subject for message in mail.outbox] == [f"{user.username} retweeted your tweet!"]
+
+
+@pytest.mark.django_db()
+class TestInAppNotifications:
+    def test_views__queue_notifications_and_count_them_unread(self, logged_in_client: Client) -> None:
+        author = CustomUserFactory()
+        tweet = TweetFactory(user=author)
+
+        logged_in_client.post(reverse("like_tweet", kwargs={"tweet_id": tweet.id}))
+        logged_in_client.post(reverse("retweet", kwargs={"tweet_id": tweet.id}))
+        logged_in_client.post(reverse("follow_user", kwargs={"username": author.username}))
+        write_notifications()
+
+        assert notifications.unread_count(author.id) == 3
+        assert sorted(Notification.objects.filter(recipient=author).values_list("verb", flat=True)) == [
+            "follow",
+            "like",
+            "retweet",
+        ]
+
+    def test_write_queued__skips_events_for_deleted_tweets(self, user: CustomUser) -> None:
+        tweet = TweetFactory()
+        notifications.notify(tweet.user_id, user.id, Notification.Verb.LIKE, tweet.id)
+        notifications.notify(tweet.user_id, user.id, Notification.Verb.FOLLOW)
+        tweet.delete()
+
+        assert notifications.write_queued() == 1
+        assert notifications.get_redis().llen(notifications.QUEUE_KEY) == 0
+
+    def test_write_queued__skips_events_written_before_a_crash(self, user: CustomUser) -> None:
+        notifications.notify(CustomUserFactory().id, user.id, Notification.Verb.FOLLOW)
+        # The batch was saved but the writer crashed before trimming the queue
+        events = notifications.get_redis().lrange(notifications.QUEUE_KEY, 0, -1)
+        Notification.objects.bulk_create(notifications.build_notifications(json.loads(event) for event in events))
+
+        notifications.write_queued()
+
+        assert Notification.objects.count() == 1
+        assert notifications.get_redis().llen(notifications.QUEUE_KEY) == 0
+
+    def test_unread_badge__does_not_query_database(
+        self, logged_in_client: Client, user: CustomUser, django_assert_num_queries: Any
+    ) -> None:
+        notifications.notify(user.id, CustomUserFactory().id, Notification.Verb.FOLLOW)
+        logged_in_client.get(reverse("unread_notifications"))
+
+        with django_assert_num_queries(0):
+            response = logged_in_client.get(reverse("unread_notifications"))
+
+        assert ">1</span>" in response.content.decode()
+
+    def test_notifications_page__collapses_events_and_marks_them_read(
+        self, logged_in_client: Client, user: CustomUser
+    ) -> None:
+        tweet = TweetFactory(user=user)
+        fan, *others = CustomUserFactory.create_batch(3)
+        for actor in [fan, fan, *others]:
+            notifications.notify(user.id, actor.id, Notification.Verb.LIKE, tweet.id)
+        notifications.notify(user.id, fan.id, Notification.Verb.FOLLOW)
+        notifications.write_queued()
+
+        response = logged_in_client.get(reverse("notifications"))
+
+        groups = response.context["groups"]
+        assert [(group.verb, len(group.actors)) for group in groups] == [("followed you", 1), ("liked your tweet", 3)]
+        assert "and 2 others" in response.content.decode()
+        assert notifications.unread_count(user.id) == 0
@@ -0,0 +1,67 @@
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.core.models import Tweet
+from apps.core.pagination import CursorPaginator, decode_cursor, encode_cursor
+from tests.factories import TweetFactory
+
+
+@pytest.mark.django_db()
+class TestCursorPaginator:
+    def test_page__walks_all_rows_once_despite_concurrent_inserts(self) -> None:
+        now = timezone.now()
+        created = [TweetFactory(created_at=now - timedelta(minutes=i)) for i in range(7)]
+        # Two tweets sharing a timestamp straddle a page boundary and must be ordered by id.
+        created.append(TweetFactory(created_at=created[-1].created_at))
+        paginator = CursorPaginator(Tweet.objects.all(), per_page=3)
+
+        seen = []
+        page = paginator.page(None)
+        seen.extend(page)
+        while page.has_next():
+            TweetFactory()
+            page = paginator.page(page.next_cursor)
+            seen.extend(page)
+
+        expected = sorted(created, key=lambda tweet: (tweet.created_at, tweet.id), reverse=True)
+        assert seen == expected
+
+    def test_encode_cursor__round_trips_microseconds(self) -> None:
+        created_at = timezone.now().replace(microsecond=123456)
+
+        assert decode_cursor(encode_cursor([created_at, 5])) == [created_at.isoformat(), 5]
+
+
+@pytest.mark.django_db()
+class TestExploreViewPagination:
+    def test_explore__next_page_link_uses_cursor_without_count(self, logged_in_client: Client) -> None:
+        TweetFactory.create_batch(7)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = logged_in_client.get(reverse("explore"))
+
+        assert response.context["page_obj"].has_next()
+        assert f"?cursor={response.context['page_obj'].next_cursor}" in response.content.decode()
+        assert not any("COUNT(" in query["sql"] for query in queries.captured_queries)
+        assert not any("OFFSET" in query["sql"] for query in queries.captured_queries)
+
+    @pytest.mark.parametrize(
+        "cursor",
+        [
+            "not-a-cursor",
+            encode_cursor(["x", 1]),
+            encode_cursor([timezone.now(), "x"]),
+            encode_cursor([None, 1]),
+            encode_cursor([[], {}]),
+        ],
+    )
+    def test_explore__invalid_cursor_returns_404(self, logged_in_client: Client, cursor: str) -> None:
+        response = logged_in_client.get(reverse("explore"), {"cursor": cursor})
+
+        assert response.status_code == 404
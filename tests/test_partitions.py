@@ -0,0 +1,62 @@
+from datetime import UTC, datetime
+
+import pytest
+
+from apps.core.hydration import liked_tweet_ids
+from apps.core.models import CustomUser, Like, Tweet
+from apps.core.partitions import ensure_partitions
+from apps.core.tasks import ensure_partitions as ensure_partitions_task
+from apps.core.timeline import home_timeline_queryset
+from tests.factories import FollowFactory, LikeFactory, TweetFactory
+
+# A month past the archive, which holds every row up to the end of the current month
+MONTH = datetime(2031, 11, 15, tzinfo=UTC)
+
+
+@pytest.mark.django_db()
+class TestPartitions:
+    def test_ensure_partitions__creates_upcoming_months_once(self) -> None:
+        created = ensure_partitions(MONTH)
+
+        months = ["203111", "203112", "203201", "203202"]
+        assert created == [f"core_tweet_p{month}" for month in months] + [f"core_like_p{month}" for month in months]
+        assert ensure_partitions(MONTH) == []
+
+    def test_ensure_partitions__skips_months_in_archive(self) -> None:
+        # The test database's tables were partitioned this month, so the archive covers it and
+        # the migration created the partitions of the following months. A partition of this
+        # month would overlap the archive and fail.
+        assert ensure_partitions() == []
+
+    def test_ensure_partitions_task__covers_current_month(self) -> None:
+        ensure_partitions_task()
+
+        tweet = TweetFactory()
+        assert Tweet.objects.filter(id=tweet.id, created_at=tweet.created_at).exists()
+
+    def test_like__takes_partition_key_from_tweet(self, user: CustomUser) -> None:
+        tweet = TweetFactory()
+
+        like = Like.objects.create(user=user, tweet=tweet)
+
+        assert like.tweet_created_at == tweet.created_at
+        assert tweet.is_liked_by(user)
+
+    def test_home_timeline__only_reads_recent_partitions(self, user: CustomUser) -> None:
+        ensure_partitions(MONTH)
+        followed = FollowFactory(follower=user).following
+        TweetFactory(user=followed, created_at=MONTH)
+
+        plan = home_timeline_queryset(user).explain()
+
+        assert "core_tweet_p" in plan, plan
+        assert "core_tweet_archive" not in plan, plan
+
+    def test_liked_tweet_ids__only_reads_partitions_of_the_tweets(self, user: CustomUser) -> None:
+        ensure_partitions(MONTH)
+        like = LikeFactory(user=user, tweet=TweetFactory(created_at=MONTH))
+
+        plan = liked_tweet_ids(user, [like.tweet]).explain()
+
+        assert "core_like_archive" not in plan, plan
+        assert list(liked_tweet_ids(user, [like.tweet])) == [like.tweet_id]
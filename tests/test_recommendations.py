@@ -0,0 +1,88 @@
+from io import StringIO
+
+import fakeredis
+import pytest
+from django.core.management import call_command
+from django.test import Client
+from django.urls import reverse
+
+from apps.core import recommendations
+from apps.core.models import CustomUser
+from apps.core.tasks import update_recommendations
+from tests.factories import CustomUserFactory, FollowFactory
+
+
+def follow(follower: CustomUser, *following: CustomUser) -> None:
+    for followed in following:
+        FollowFactory(follower=follower, following=followed)
+
+
+@pytest.mark.django_db()
+class TestRecommendations:
+    @pytest.fixture()
+    def users(self, user: CustomUser) -> list[CustomUser]:
+        """``user`` follows bob, who follows carol and dan, and erin, who follows bob and frank."""
+        bob, carol, dan, erin, frank = CustomUserFactory.create_batch(5)
+        follow(user, bob)
+        follow(bob, carol, dan)
+        follow(erin, bob, frank)
+        return [user, bob, carol, dan, erin, frank]
+
+    def test_update__scores_friends_of_friends_and_co_follows(
+        self, users: list[CustomUser], fake_redis: fakeredis.FakeRedis
+    ) -> None:
+        user, bob, carol, dan, erin, frank = users
+
+        update_recommendations()
+
+        recommended = fake_redis.zrevrange(recommendations.recommendations_key(user.id), 0, -1, withscores=True)
+        assert dict(recommended) == {
+            str(carol.id): recommendations.FRIEND_OF_FRIEND_WEIGHT,
+            str(dan.id): recommendations.FRIEND_OF_FRIEND_WEIGHT,
+            str(frank.id): recommendations.CO_FOLLOW_WEIGHT,
+        }
+        assert set(recommendations.recommended_ids(erin.id)) == {carol.id, dan.id}
+        assert fake_redis.zrevrange(recommendations.POPULAR_KEY, 0, 0) == [str(bob.id)]
+
+    def test_update__scores_in_worker_processes(self, users: list[CustomUser]) -> None:
+        graph = recommendations.load_graph()
+        in_process = list(recommendations.score_users(graph, workers=1))
+
+        assert list(recommendations.score_users(graph, workers=2)) == in_process
+
+    def test_update_recommendations_command__scores_in_worker_processes(
+        self, users: list[CustomUser], fake_redis: fakeredis.FakeRedis
+    ) -> None:
+        stdout = StringIO()
+
+        call_command("update_recommendations", workers=2, stdout=stdout)
+
+        assert f"Scored {len(users)} users" in stdout.getvalue()
+        assert fake_redis.exists(recommendations.recommendations_key(users[0].id))
+        assert not fake_redis.exists(recommendations.LOCK_KEY)
+
+    def test_users_list__shows_recommendations_not_yet_followed(
+        self, users: list[CustomUser], logged_in_client: Client
+    ) -> None:
+        user, bob, carol, dan, erin, frank = users
+        recommendations.update()
+        follow(user, carol)
+
+        response = logged_in_client.get(reverse("users_list"))
+
+        assert list(response.context["users"]) == [dan, frank]
+
+    def test_users_list__without_recommendations_shows_most_followed_users(
+        self, users: list[CustomUser], client: Client
+    ) -> None:
+        user, bob, carol, dan, erin, frank = users
+        newcomer = CustomUserFactory()
+        client.force_login(newcomer)
+
+        before = client.get(reverse("users_list")).context["users"]
+        recommendations.update()
+        after = client.get(reverse("users_list")).context["users"]
+
+        assert [u.id for u in before][:1] == [bob.id]
+        assert [u.id for u in after][:1] == [bob.id]
+        assert {u.id for u in after} == {bob.id, carol.id, dan.id, frank.id}
@@ -0,0 +1,72 @@
+import contextvars
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+from django.conf import settings as django_settings
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, override_settings
+from django.urls import reverse
+
+from apps.core.models import Tweet
+from apps.core.replicas import STICKY_COOKIE, ReplicaRouter, begin_request, finish_request
+from tests.factories import CustomUserFactory
+
+
+@override_settings(REPLICA_DATABASES=["replica1"])
+def test_router__reads_from_replica_until_request_writes(rf: RequestFactory) -> None:
+    def handle_request() -> None:
+        router = ReplicaRouter()
+        state = begin_request(rf.get("/"))
+        assert router.db_for_read(Tweet) == "default"
+
+        state.read_from_replica = True
+        assert router.db_for_read(Tweet) == "replica1"
+        assert router.db_for_write(Tweet) == "default"
+        assert router.db_for_read(Tweet) == "default"
+
+        response = finish_request(state, HttpResponse())
+        assert response.cookies[STICKY_COOKIE]["max-age"] == django_settings.REPLICA_STICKINESS
+
+    contextvars.copy_context().run(handle_request)
+
+
+def test_router__never_migrates_replicas() -> None:
+    with override_settings(REPLICA_DATABASES=["replica1"]):
+        assert ReplicaRouter().allow_migrate("default", "core") is True
+        assert ReplicaRouter().allow_migrate("replica1", "core") is False
+
+
+@pytest.mark.django_db()
+class TestReplicaReadsMixin:
+    @pytest.fixture
+    def replica_reads(self, monkeypatch: pytest.MonkeyPatch, settings: Any) -> list[str]:
+        """Record every read sent to a replica."""
+        # The primary stands in for a replica, so that views run against the test database
+        settings.REPLICA_DATABASES = ["default"]
+        reads: list[str] = []
+
+        def choice(databases: list[str]) -> str:
+            reads.append(databases[0])
+            return databases[0]
+
+        monkeypatch.setattr("apps.core.replicas.random", SimpleNamespace(choice=choice))
+        return reads
+
+    def test_explore__reads_from_replica(self, logged_in_client: Client, replica_reads: list[str]) -> None:
+        response = logged_in_client.get(reverse("explore"))
+
+        assert response.status_code == 200
+        assert replica_reads
+        assert STICKY_COOKIE not in response.cookies
+
+    def test_follow__keeps_user_on_primary_afterwards(self, logged_in_client: Client, replica_reads: list[str]) -> None:
+        other = CustomUserFactory()
+
+        response = logged_in_client.post(reverse("follow_user", kwargs={"username": other.username}))
+        assert STICKY_COOKIE in response.cookies
+
+        replica_reads.clear()
+        response = logged_in_client.get(reverse("profile", kwargs={"username": other.username}))
+        assert response.context["is_following"] is True
+        assert not replica_reads
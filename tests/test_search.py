@@ -0,0 +1,116 @@
+import pytest
+from django.test import Client
+from django.urls import reverse
+
+from apps.core.models import CustomUser
+from apps.core.search import search_tweets, search_users
+from tests.factories import CustomUserFactory, TweetFactory
+
+
+@pytest.mark.django_db()
+class TestSearchTweets:
+    def test_search_tweets__ranks_matches_and_skips_retweets(self) -> None:
+        passing = TweetFactory(content="The weather is nice today")
+        focused = TweetFactory(content="Weather, weather, weather! Talking about the weather again")
+        TweetFactory(content="Nothing to see here")
+        TweetFactory(parent=focused)
+
+        assert list(search_tweets("weather")) == [focused, passing]
+
+    def test_search_tweets__matches_word_stems(self) -> None:
+        tweet = TweetFactory(content="Went running in the park")
+
+        assert list(search_tweets("runs")) == [tweet]
+
+    def test_search_tweets__without_words_matches_nothing(self) -> None:
+        TweetFactory(content="Anything at all")
+
+        assert list(search_tweets(" !? ")) == []
+
+
+@pytest.mark.django_db()
+class TestSearchUsers:
+    def test_search_users__matches_username_and_bio_prefixes(self) -> None:
+        by_name = CustomUserFactory(username="pythonista", bio="")
+        by_bio = CustomUserFactory(username="someone", bio="Writes Python for a living")
+        CustomUserFactory(username="other", bio="Writes Rust")
+
+        users = list(search_users("pyth"))
+
+        # Username matches are weighted above bio matches
+        assert users == [by_name, by_bio]
+
+
+@pytest.mark.django_db()
+class TestSearchView:
+    def test_search__pages_through_ranked_results(self, logged_in_client: Client) -> None:
+        matches = [TweetFactory(content="cats " * (i + 1)) for i in range(8)]
+        TweetFactory(content="dogs")
+
+        seen = []
+        response = logged_in_client.get(reverse("search"), {"q": "cats"})
+        seen.extend(response.context["tweets"])
+        while response.context["page_obj"].has_next():
+            response = logged_in_client.get(
+                reverse("search"),
+                {"q": "cats", "cursor": response.context["page_obj"].next_cursor},
+                HTTP_HX_REQUEST="true",
+                HTTP_HX_TRIGGER="tweets-container",
+            )
+            assert response.templates[0].name == "core/timeline.html"
+            seen.extend(response.context["tweets"])
+
+        assert sorted(seen, key=lambda tweet: tweet.id) == matches
+        assert len(seen) == len(matches)
+
+    def test_search__pages_through_tweets_tied_on_rank(self, logged_in_client: Client) -> None:
+        # Identical content ranks identically, so the page boundary falls inside the tie
+        matches = [TweetFactory(content="cats and dogs") for _ in range(8)]
+
+        seen = []
+        response = logged_in_client.get(reverse("search"), {"q": "cats"})
+        seen.extend(response.context["tweets"])
+        while response.context["page_obj"].has_next():
+            response = logged_in_client.get(
+                reverse("search"),
+                {"q": "cats", "cursor": response.context["page_obj"].next_cursor},
+                HTTP_HX_REQUEST="true",
+                HTTP_HX_TRIGGER="tweets-container",
+            )
+            seen.extend(response.context["tweets"])
+
+        assert seen == sorted(matches, key=lambda tweet: tweet.id, reverse=True)
+
+    def test_users_list__pages_through_search_results(self, logged_in_client: Client) -> None:
+        matches = [CustomUserFactory(username=f"alice{i}", bio="") for i in range(12)]
+
+        response = logged_in_client.get(reverse("users_list"), {"search": "alice"})
+        seen = list(response.context["users"])
+        assert "cursor=" in response.content.decode()
+        response = logged_in_client.get(
+            reverse("users_list"),
+            {"search": "alice", "cursor": response.context["page_obj"].next_cursor},
+            HTTP_HX_REQUEST="true",
+        )
+        seen.extend(response.context["users"])
+
+        assert response.templates[0].name == "core/user_list.html"
+        assert not response.context["page_obj"].has_next()
+        assert sorted(seen, key=lambda user: user.id) == matches
+
+    def test_users_list__filters_by_search(self, logged_in_client: Client) -> None:
+        match = CustomUserFactory(username="alice_smith", bio="")
+        CustomUserFactory(username="bob", bio="")
+
+        response = logged_in_client.get(reverse("users_list"), {"search": "ali"})
+
+        assert list(response.context["users"]) == [match]
+
+    def test_user_search__returns_typeahead_suggestions(self, logged_in_client: Client, user: CustomUser) -> None:
+        CustomUserFactory(username="carol", bio="")
+
+        response = logged_in_client.get(reverse("user_search"), {"search": "car"}, HTTP_HX_REQUEST="true")
+
+        assert response.status_code == 200
+        assert [user.username for user in response.context["users"]] == ["carol"]
+        assert 'href="/profile/carol/"' in response.content.decode()
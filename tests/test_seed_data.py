@@ -0,0 +1,41 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import Count, F
+
+from apps.core.models import CustomUser, Follow, Like, Tweet
+
+
+def seed(**options: object) -> None:
+    call_command("seed_data", users=40, follows=8, tweets=4, likes=10, retweets=2, seed=1, stdout=StringIO(), **options)
+
+
+@pytest.mark.django_db()
+class TestSeedDataCommand:
+    def test_seed_data__generates_consistent_graph(self) -> None:
+        seed()
+
+        users = CustomUser.objects.filter(username__startswith="seed")
+        assert users.count() == 40
+        assert Follow.objects.exists() and Like.objects.exists()
+        assert not Follow.objects.filter(follower=F("following")).exists()
+        assert not Like.objects.filter(user=F("tweet__user")).exists()
+        assert not Like.objects.filter(created_at__lt=F("tweet__created_at")).exists()
+        assert not Like.objects.exclude(tweet_created_at=F("tweet__created_at")).exists()
+        assert not Tweet.objects.filter(parent__isnull=False, parent__parent__isnull=False).exists()
+        assert not users.annotate(n=Count("followers")).exclude(followers_count=F("n")).exists()
+        assert not Tweet.objects.annotate(n=Count("likes")).exclude(likes_count=F("n")).exists()
+
+    def test_seed_data__is_reproducible_and_refuses_existing_prefix(self) -> None:
+        seed(prefix="first")
+        seed(prefix="second")
+
+        def graph(prefix: str) -> list[tuple[str, str]]:
+            follows = Follow.objects.filter(follower__username__startswith=prefix)
+            return sorted(follows.values_list("follower__username", "following__username"))
+
+        assert [(a[5:], b[5:]) for a, b in graph("first")] == [(a[6:], b[6:]) for a, b in graph("second")]
+        with pytest.raises(CommandError):
+            seed(prefix="first")
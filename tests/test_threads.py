@@ -0,0 +1,152 @@
+import pytest
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.core import notifications, threads
+from apps.core.models import CustomUser, Notification, Tweet
+from tests.factories import TweetFactory
+
+
+def reply(to: Tweet, user: CustomUser) -> Tweet:
+    return TweetFactory(user=user, reply_to=to)
+
+
+@pytest.mark.django_db()
+class TestThreadPaths:
+    @pytest.mark.parametrize("ids", [[1, 15, 16], [255, 4096, 2**40], [9, 2**63 - 1]])
+    def test_path__sorts_like_the_tuple_of_ids(self, ids: list[int]) -> None:
+        paths = {tuple(ids[:n]): "".join(threads.segment(i) for i in ids[:n]) for n in range(1, len(ids) + 1)}
+        paths[(ids[0], ids[1] + 1)] = threads.segment(ids[0]) + threads.segment(ids[1] + 1)
+
+        assert sorted(paths.values()) == [paths[key] for key in sorted(paths)]
+        assert all(threads.path_ids(path) == list(key) for key, path in paths.items())
+
+    def test_reply__is_placed_below_the_tweet_it_replies_to(self, user: CustomUser) -> None:
+        root = TweetFactory(user=user)
+        first = reply(root, user)
+        nested = reply(first, user)
+
+        root.refresh_from_db()
+        assert threads.path_ids(nested.thread_path) == [root.id, first.id, nested.id]
+        assert list(threads.descendants(root).order_by("thread_path")) == [first, nested]
+        assert list(threads.descendants(first)) == [nested]
+        assert (root.replies_count, root.thread_path) == (1, "")
+
+    def test_reply__is_not_saved_without_its_path(self, user: CustomUser, monkeypatch: pytest.MonkeyPatch) -> None:
+        root = TweetFactory(user=user)
+
+        def crash(tweet: Tweet) -> None:
+            raise ConnectionError
+
+        monkeypatch.setattr(threads, "place_reply", crash)
+
+        with pytest.raises(ConnectionError):
+            reply(root, user)
+
+        assert list(Tweet.objects.all()) == [root]
+
+    def test_deleting_reply__removes_its_replies_and_updates_count(self, user: CustomUser) -> None:
+        root = TweetFactory(user=user)
+        first = reply(root, user)
+        reply(first, user)
+
+        first.delete()
+
+        root.refresh_from_db()
+        assert root.replies_count == 0
+        assert not threads.descendants(root).exists()
+
+
+@pytest.mark.django_db()
+class TestThreadViews:
+    def test_reply__posts_reply_to_original_and_notifies_author(
+        self, logged_in_client: Client, user: CustomUser
+    ) -> None:
+        tweet = TweetFactory()
+        retweet = TweetFactory(user=user, parent=tweet)
+
+        response = logged_in_client.post(reverse("reply", kwargs={"tweet_id": retweet.id}), {"content": "Agreed"})
+
+        posted = Tweet.objects.get(content="Agreed")
+        assert response.url == reverse("tweet_detail", kwargs={"pk": tweet.id})
+        assert (posted.reply_to, posted.user) == (tweet, user)
+        notifications.write_queued()
+        assert Notification.objects.get(recipient=tweet.user).verb == Notification.Verb.REPLY
+
+    def test_reply__rejects_replies_below_max_depth(
+        self, logged_in_client: Client, user: CustomUser, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setattr(threads, "MAX_THREAD_DEPTH", 2)
+        deepest = reply(TweetFactory(user=user), user)
+
+        logged_in_client.post(reverse("reply", kwargs={"tweet_id": deepest.id}), {"content": "Too deep"})
+
+        assert not Tweet.objects.filter(content="Too deep").exists()
+
+    def test_tweet_detail__shows_ancestors_and_replies_in_thread_order(
+        self, logged_in_client: Client, user: CustomUser
+    ) -> None:
+        root = TweetFactory(user=user)
+        tweet = reply(root, user)
+        first, second = reply(tweet, user), reply(tweet, user)
+        nested = reply(first, user)
+        reply(root, user)
+
+        response = logged_in_client.get(reverse("tweet_detail", kwargs={"pk": tweet.id}))
+
+        assert [ancestor.id for ancestor in response.context["ancestors"]] == [root.id]
+        replies = response.context["replies"]
+        assert [(r.id, r.thread_depth) for r in replies] == [(first.id, 1), (nested.id, 2), (second.id, 1)]
+        assert 'action="{}"'.format(reverse("reply", kwargs={"tweet_id": tweet.id})) in response.content.decode()
+
+    def test_tweet_detail__shows_root_and_nearest_ancestors_of_deep_replies(
+        self, logged_in_client: Client, user: CustomUser, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setattr(threads, "MAX_ANCESTORS_SHOWN", 3)
+        thread = [TweetFactory(user=user)]
+        for _ in range(5):
+            thread.append(reply(thread[-1], user))
+
+        response = logged_in_client.get(reverse("tweet_detail", kwargs={"pk": thread[-1].id}))
+
+        assert [ancestor.id for ancestor in response.context["ancestors"]] == [t.id for t in thread[0:1] + thread[3:5]]
+        assert response.context["hidden_ancestors"] == [thread[1].id, thread[2].id]
+
+    def test_tweet_detail__pages_through_replies(self, logged_in_client: Client, user: CustomUser) -> None:
+        tweet = TweetFactory(user=user)
+        replies = [reply(tweet, user) for _ in range(21)]
+        nested = reply(replies[0], user)
+        url = reverse("tweet_detail", kwargs={"pk": tweet.id})
+
+        first = logged_in_client.get(url)
+        cursor = first.context["replies"].next_cursor
+        second = logged_in_client.get(url, {"cursor": cursor}, HTTP_HX_REQUEST="true", HTTP_HX_TRIGGER="thread-replies")
+
+        assert [r.id for r in first.context["replies"]] == [replies[0].id, nested.id, *[r.id for r in replies[1:19]]]
+        assert [r.id for r in second.context["replies"]] == [r.id for r in replies[19:]]
+        assert second.templates[0].name == "core/thread_replies.html"
+
+    def test_tweet_detail__queries_do_not_grow_with_thread(self, logged_in_client: Client, user: CustomUser) -> None:
+        small, busy = TweetFactory(user=user), TweetFactory(user=user)
+        small_reply = reply(small, user)
+        for parent in [reply(busy, user) for _ in range(10)]:
+            reply(parent, user)
+        deep = busy
+        for _ in range(10):
+            deep = reply(deep, user)
+
+        def count_queries(tweet: Tweet) -> int:
+            with CaptureQueriesContext(connection) as queries:
+                response = logged_in_client.get(reverse("tweet_detail", kwargs={"pk": tweet.id}))
+            assert response.status_code == 200
+            return len(queries.captured_queries)
+
+        # Sets the CSRF cookie, so that no response below is cached
+        logged_in_client.get(reverse("home"))
+
+        root_queries = count_queries(small)
+        assert count_queries(busy) == root_queries
+        # Plus one for the ancestors
+        assert count_queries(small_reply) == count_queries(deep) == root_queries + 1
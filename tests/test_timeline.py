@@ -0,0 +1,101 @@
+import fakeredis
+import pytest
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from pytest_django.fixtures import SettingsWrapper
+
+from apps.core.models import CustomUser
+from apps.core.tasks import fan_out_tweet
+from apps.core.timeline import CELEBRITIES_KEY, get_home_timeline, get_home_timeline_ids, timeline_key
+from tests.factories import CustomUserFactory, FollowFactory, TweetFactory
+
+
+@pytest.mark.django_db()
+class TestHomeTimeline:
+    def test_get_home_timeline_ids__rebuilds_missing_timeline(self, user: CustomUser) -> None:
+        followed = CustomUserFactory()
+        FollowFactory(follower=user, following=followed)
+        own_tweet = TweetFactory(user=user)
+        followed_tweet = TweetFactory(user=followed)
+        TweetFactory()
+
+        assert get_home_timeline_ids(user) == [followed_tweet.id, own_tweet.id]
+
+    def test_fan_out_tweet__pushes_to_materialized_follower_timelines(
+        self, user: CustomUser, fake_redis: fakeredis.FakeRedis
+    ) -> None:
+        author = CustomUserFactory()
+        FollowFactory(follower=user, following=author)
+        get_home_timeline_ids(user)
+
+        tweet = TweetFactory(user=author)
+        fan_out_tweet(tweet.id)
+
+        assert fake_redis.zscore(timeline_key(user.id), tweet.id) == tweet.created_at.timestamp()
+
+    def test_fan_out_tweet__merges_celebrity_tweets_on_read(
+        self, user: CustomUser, fake_redis: fakeredis.FakeRedis, settings: SettingsWrapper
+    ) -> None:
+        settings.TIMELINE_FANOUT_FOLLOWER_LIMIT = 1
+        celebrity = CustomUserFactory()
+        FollowFactory(follower=user, following=celebrity)
+        get_home_timeline_ids(user)
+
+        tweet = TweetFactory(user=celebrity)
+        fan_out_tweet(tweet.id)
+
+        assert fake_redis.sismember(CELEBRITIES_KEY, celebrity.id)
+        assert fake_redis.zscore(timeline_key(user.id), tweet.id) is None
+        assert tweet.id in get_home_timeline_ids(user)
+
+    def test_get_home_timeline__pages_from_cursor_with_ties_and_celebrities(
+        self, user: CustomUser, settings: SettingsWrapper
+    ) -> None:
+        settings.TIMELINE_FANOUT_FOLLOWER_LIMIT = 1
+        followed, celebrity = CustomUserFactory.create_batch(2)
+        FollowFactory(follower=user, following=followed)
+        FollowFactory(follower=user, following=celebrity)
+        now = timezone.now()
+        # Tied on time, so pages must break the tie by ID
+        tweets = [TweetFactory(user=author, created_at=now) for author in [followed, celebrity] * 4]
+        for tweet in tweets:
+            fan_out_tweet(tweet.id)
+        everything = get_home_timeline_ids(user)
+
+        pages = []
+        after = None
+        while page := get_home_timeline(user, after, 3):
+            pages.append([tweet_id for tweet_id, _ in page])
+            after = (now, page[-1][0])
+
+        assert sorted(everything, reverse=True) == everything == [tweet.id for tweet in reversed(tweets)]
+        assert [tweet_id for page in pages for tweet_id in page] == everything
+        assert [len(page) for page in pages] == [3, 3, 2]
+
+    def test_home__pages_through_timeline(self, logged_in_client: Client) -> None:
+        tweets = TweetFactory.create_batch(8, user=logged_in_client.user)
+
+        seen = []
+        response = logged_in_client.get(reverse("home"))
+        seen.extend(response.context["tweets"])
+        while response.context["page_obj"].has_next():
+            response = logged_in_client.get(
+                reverse("home"),
+                {"cursor": response.context["page_obj"].next_cursor},
+                HTTP_HX_REQUEST="true",
+                HTTP_HX_TRIGGER="tweets-container",
+            )
+            seen.extend(response.context["tweets"])
+
+        assert seen == sorted(tweets, key=lambda tweet: (tweet.created_at, tweet.id), reverse=True)
+
+    def test_follow_user__backfills_and_purges_timeline(self, logged_in_client: Client) -> None:
+        other_user = CustomUserFactory()
+        tweet = TweetFactory(user=other_user)
+        get_home_timeline_ids(logged_in_client.user)
+        logged_in_client.post(reverse("follow_user", kwargs={"username": other_user.username}))
+        assert tweet.id in get_home_timeline_ids(logged_in_client.user)
+
+        logged_in_client.post(reverse("unfollow_user", kwargs={"username": other_user.username}))
+        assert tweet.id not in get_home_timeline_ids(logged_in_client.user)
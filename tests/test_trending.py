@@ -0,0 +1,112 @@
+import time
+from datetime import UTC, datetime
+from typing import Any
+
+import fakeredis
+import pytest
+from django.test import Client
+from django.urls import reverse
+
+from apps.core import trending
+from apps.core.tasks import update_trending
+from tests.factories import CustomUserFactory, LikeFactory, TweetFactory
+
+HOUR = 60 * 60
+
+
+def ago(now: float, seconds: float) -> datetime:
+    return datetime.fromtimestamp(now - seconds, UTC)
+
+
+def scores(fake_redis: fakeredis.FakeRedis) -> dict[int, float]:
+    return {int(tweet_id): score for tweet_id, score in fake_redis.zrange(trending.SCORES_KEY, 0, -1, withscores=True)}
+
+
+@pytest.mark.django_db()
+class TestTrending:
+    @pytest.fixture(autouse=True)
+    def half_life(self, settings: Any) -> None:
+        settings.TRENDING_HALF_LIFE = HOUR
+
+    def test_update__ranks_by_decayed_engagement(self) -> None:
+        now = time.time()
+        fresh, stale = TweetFactory(), TweetFactory()
+        LikeFactory.create_batch(2, tweet=fresh, created_at=ago(now, 60))
+        # Worth 3 / 2 ** 2 likes now
+        LikeFactory.create_batch(3, tweet=stale, created_at=ago(now, 2 * HOUR))
+
+        trending.update(now)
+
+        assert trending.top_tweet_ids() == [fresh.id, stale.id]
+
+    def test_update__scores_retweets_and_likes_of_retweets_for_the_original(
+        self, fake_redis: fakeredis.FakeRedis
+    ) -> None:
+        now = time.time()
+        tweet = TweetFactory()
+        retweet = TweetFactory(parent=tweet, created_at=ago(now, 60))
+        LikeFactory(tweet=retweet, created_at=ago(now, 60))
+
+        trending.update(now)
+
+        assert scores(fake_redis) == {tweet.id: pytest.approx(3, rel=0.05)}
+
+    def test_update__only_scores_engagement_since_the_previous_run(self, fake_redis: fakeredis.FakeRedis) -> None:
+        now = time.time()
+        tweet = TweetFactory()
+        LikeFactory(tweet=tweet, created_at=ago(now, 60))
+        trending.update(now)
+        LikeFactory(tweet=tweet, created_at=ago(now, -30))
+
+        trending.update(now)
+        assert scores(fake_redis)[tweet.id] == pytest.approx(1, rel=0.05)
+        trending.update(now + 60)
+        assert scores(fake_redis)[tweet.id] == pytest.approx(2, rel=0.05)
+
+    def test_update__rebases_old_scores(self, fake_redis: fakeredis.FakeRedis) -> None:
+        now = time.time()
+        old_base = now - (trending.REBASE_HALF_LIVES + 1) * HOUR
+        fake_redis.set(trending.BASE_KEY, old_base)
+        fake_redis.zadd(trending.SCORES_KEY, {"1": 2.0**trending.REBASE_HALF_LIVES, "2": 1.0})
+
+        trending.update(now)
+
+        assert float(fake_redis.get(trending.BASE_KEY)) == now
+        assert scores(fake_redis) == {1: pytest.approx(0.5), 2: pytest.approx(2.0 ** -(trending.REBASE_HALF_LIVES + 1))}
+
+    def test_update__keeps_best_candidates(self, settings: Any, fake_redis: fakeredis.FakeRedis) -> None:
+        settings.TRENDING_SIZE = 1
+        now = time.time()
+        users = CustomUserFactory.create_batch(12)
+        tweets = TweetFactory.create_batch(12, user=users[0])
+        for count, tweet in enumerate(tweets, start=1):
+            for user in users[:count]:
+                LikeFactory(user=user, tweet=tweet, created_at=ago(now, 60))
+
+        update_trending()
+
+        assert set(scores(fake_redis)) == {tweet.id for tweet in tweets[2:]}
+        assert trending.top_tweet_ids() == [tweets[-1].id]
+
+    def test_deleting_tweet__forgets_its_score(self, fake_redis: fakeredis.FakeRedis) -> None:
+        tweet = TweetFactory()
+        fake_redis.zadd(trending.SCORES_KEY, {str(tweet.id): 1.0})
+
+        tweet.delete()
+
+        assert scores(fake_redis) == {}
+
+    def test_explore_top__pages_through_trending_tweets(
+        self, logged_in_client: Client, fake_redis: fakeredis.FakeRedis
+    ) -> None:
+        tweets = TweetFactory.create_batch(8)
+        fake_redis.zadd(trending.SCORES_KEY, {str(tweet.id): i for i, tweet in enumerate(tweets)})
+        ranked = [tweet.id for tweet in reversed(tweets)]
+
+        first = logged_in_client.get(reverse("explore"), {"mode": "top"})
+        cursor = first.context["page_obj"].next_cursor
+        second = logged_in_client.get(reverse("explore"), {"mode": "top", "cursor": cursor}, HTTP_HX_REQUEST="true")
+
+        assert first.context["explore_mode"] == "top"
+        assert [tweet.id for tweet in first.context["tweets"]] == ranked[:6]
+        assert [tweet.id for tweet in second.context["tweets"]] == ranked[6:]
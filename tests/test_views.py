@@ -1,31 +1,61 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
+from django.db import IntegrityError, connection
 from django.http import HttpResponse
 from django.test import Client
 from django.urls import reverse
 
-from apps.core.models import Tweet
-from tests.factories import LikeFactory, TweetFactory
+from apps.core.models import CustomUser, Follow, Tweet
+from apps.core.views import write_retweet
+from tests.factories import CustomUserFactory, FollowFactory, LikeFactory, TweetFactory
 
 
 @pytest.mark.django_db()
 class TestLikeTweetView:
     def test_like_tweet__creates_like(self, logged_in_client: Client, tweet: Tweet) -> None:
-        response: HttpResponse = logged_in_client.get(reverse("like_tweet", kwargs={"tweet_id": tweet.id}))
+        response: HttpResponse = logged_in_client.post(reverse("like_tweet", kwargs={"tweet_id": tweet.id}))
 
         assert response.status_code == 200
         assert tweet.likes.filter(user=logged_in_client.user).exists()
         assert response.context["tweet"] == tweet
-        assert tweet.id in response.context["liked_tweets"]
+        assert response.context["tweet"].liked_by_viewer is True
+        assert reverse("unlike_tweet", kwargs={"tweet_id": tweet.id}) in response.content.decode()
+
+    def test_like_tweet__is_idempotent(self, logged_in_client: Client, tweet: Tweet) -> None:
+        url = reverse("like_tweet", kwargs={"tweet_id": tweet.id})
+
+        logged_in_client.post(url)
+        response: HttpResponse = logged_in_client.post(url)
+
+        assert tweet.likes.count() == 1
+        assert response.context["tweet"].likes_count == 1
 
-    def test_like_tweet__removes_existing_like(self, logged_in_client: Client, tweet: Tweet) -> None:
+    def test_unlike_tweet__removes_existing_like(self, logged_in_client: Client, tweet: Tweet) -> None:
         LikeFactory(user=logged_in_client.user, tweet=tweet)
+        url = reverse("unlike_tweet", kwargs={"tweet_id": tweet.id})
 
-        response: HttpResponse = logged_in_client.get(reverse("like_tweet", kwargs={"tweet_id": tweet.id}))
+        response: HttpResponse = logged_in_client.post(url)
+        repeated: HttpResponse = logged_in_client.post(url)
 
         assert response.status_code == 200
         assert not tweet.likes.filter(user=logged_in_client.user).exists()
-        assert response.context["tweet"] == tweet
-        assert tweet.id not in response.context["liked_tweets"]
+        assert response.context["tweet"].liked_by_viewer is False
+        assert response.context["tweet"].likes_count == 0
+        assert repeated.context["tweet"].likes_count == 0
+
+    def test_like_tweet__renders_only_the_button(self, logged_in_client: Client, tweet: Tweet) -> None:
+        response: HttpResponse = logged_in_client.post(reverse("like_tweet", kwargs={"tweet_id": tweet.id}))
+
+        assert f'id="tweet-card-{tweet.id}"' not in response.content.decode()
+        assert [template.name for template in response.templates] == ["core/like_button.html"]
+
+    def test_like_tweet__rejects_get(self, logged_in_client: Client, tweet: Tweet) -> None:
+        response: HttpResponse = logged_in_client.get(reverse("like_tweet", kwargs={"tweet_id": tweet.id}))
+
+        assert response.status_code == 405
+        assert not tweet.likes.exists()
 
 
 @pytest.mark.django_db()
@@ -34,22 +64,107 @@ class TestRetweetView:
         url = reverse("retweet", kwargs={"tweet_id": tweet.id})
         response: HttpResponse = logged_in_client.post(url)
 
-        assert response.status_code == 302
+        assert response.status_code == 200
         # Check that a retweet was created
         retweet = Tweet.objects.filter(parent=tweet, user=logged_in_client.user).first()
         assert retweet is not None
         assert tweet.get_retweets_count() == 1
+        assert response.context["tweet"].retweets_count == 1
+        assert response.context["tweet"].retweeted_by_viewer is True
+        # The content and image are read from the parent rather than copied
+        assert retweet.content == ""
+        assert not retweet.image
+
+    def test_retweet__is_idempotent(self, logged_in_client: Client, tweet: Tweet) -> None:
+        url = reverse("retweet", kwargs={"tweet_id": tweet.id})
+
+        logged_in_client.post(url)
+        response: HttpResponse = logged_in_client.post(url)
+
+        assert tweet.get_retweets_count() == 1
+        assert response.context["tweet"].retweets_count == 1
+
+    def test_retweet__of_a_retweet_retweets_its_original(self, logged_in_client: Client, tweet: Tweet) -> None:
+        retweet = TweetFactory(parent=tweet)
 
-    def test_retweet__removes_existing_retweet(self, logged_in_client: Client, tweet: Tweet) -> None:
+        response: HttpResponse = logged_in_client.post(reverse("retweet", kwargs={"tweet_id": retweet.id}))
+
+        assert Tweet.objects.filter(user=logged_in_client.user, parent=tweet).exists()
+        assert not Tweet.objects.filter(parent=retweet).exists()
+        assert response.context["tweet"] == tweet
+        assert response.context["tweet"].retweets_count == 2
+
+    @pytest.mark.django_db(transaction=True)
+    def test_write_retweet__concurrent_retweets_create_one(self, user: CustomUser, tweet: Tweet) -> None:
+        barrier = threading.Barrier(2)
+
+        def retweet(_: int) -> int | None:
+            barrier.wait()
+            try:
+                return write_retweet(user, tweet, True)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(2) as executor:
+            retweet_ids = list(executor.map(retweet, range(2)))
+
+        assert len([retweet_id for retweet_id in retweet_ids if retweet_id is not None]) == 1
+        assert Tweet.objects.filter(user=user, parent=tweet).count() == 1
+
+    def test_retweet__cannot_store_a_copy(self, tweet: Tweet) -> None:
+        with pytest.raises(IntegrityError):
+            TweetFactory(parent=tweet, content=tweet.content)
+
+    def test_undo_retweet__removes_existing_retweet(self, logged_in_client: Client, tweet: Tweet) -> None:
         # Create an existing retweet
         TweetFactory(user=logged_in_client.user, parent=tweet)
 
-        response: HttpResponse = logged_in_client.post(reverse("retweet", kwargs={"tweet_id": tweet.id}))
+        response: HttpResponse = logged_in_client.post(reverse("undo_retweet", kwargs={"tweet_id": tweet.id}))
 
-        assert response.status_code == 302
+        assert response.status_code == 200
         # Check that the retweet was removed
         assert not Tweet.objects.filter(parent=tweet, user=logged_in_client.user).exists()
         assert tweet.get_retweets_count() == 0
+        assert response.context["tweet"].retweets_count == 0
+        assert response.context["tweet"].retweeted_by_viewer is False
+
+
+@pytest.mark.django_db()
+class TestFollowUserView:
+    def test_follow_user__from_profile_updates_follower_count_out_of_band(self, logged_in_client: Client) -> None:
+        other = CustomUserFactory()
+        profile_url = reverse("profile", kwargs={"username": other.username})
+
+        response: HttpResponse = logged_in_client.post(
+            reverse("follow_user", kwargs={"username": other.username}),
+            HTTP_HX_REQUEST="true",
+            HTTP_HX_CURRENT_URL=f"http://testserver{profile_url}",
+        )
+
+        content = response.content.decode()
+        assert reverse("unfollow_user", kwargs={"username": other.username}) in content
+        assert 'id="followers-count" hx-swap-oob="true"' in content
+        assert response.context["followers_count"] == 1
+
+    def test_unfollow_user__from_users_list_renders_only_the_button(self, logged_in_client: Client) -> None:
+        other = FollowFactory(follower=logged_in_client.user).following
+        url = reverse("unfollow_user", kwargs={"username": other.username})
+        headers = {"HTTP_HX_REQUEST": "true", "HTTP_HX_CURRENT_URL": f"http://testserver{reverse('users_list')}"}
+
+        response: HttpResponse = logged_in_client.post(url, **headers)
+        logged_in_client.post(url, **headers)
+
+        assert not Follow.objects.exists()
+        assert reverse("follow_user", kwargs={"username": other.username}) in response.content.decode()
+        assert "followers-count" not in response.content.decode()
+
+    def test_follow_user__redirects_plain_form_posts(self, logged_in_client: Client) -> None:
+        other = CustomUserFactory()
+
+        response: HttpResponse = logged_in_client.post(reverse("follow_user", kwargs={"username": other.username}))
+
+        assert response.status_code == 302
+        assert Follow.objects.filter(follower=logged_in_client.user, following=other).exists()
 
 
 @pytest.mark.django_db()